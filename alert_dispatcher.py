@@ -0,0 +1,268 @@
+"""
+Alert delivery for the price watcher
+
+The watcher only calls submit(), which puts the alert on a bounded asyncio queue
+and returns right away. A background task takes alerts off the queue and hands
+them to the sinks, so a burst of alerts (or a slow sink) never holds up price
+polling:
+
+- alerts arriving within `coalesce` seconds of each other are delivered
+  together, one sound and one notification for the whole burst,
+- a ticker is delivered at most once every `rate_limit` seconds, later alerts
+  inside that window are dropped (and counted in `suppressed`),
+- every sink runs concurrently with a timeout, a failing sink is reported and
+  the others still get the alerts.
+
+Sinks:
+    SoundSink    plays an audio file with afplay (macOS), paplay/aplay/ffplay (Linux)
+    DesktopSink  desktop notification with notify-send (Linux) or osascript (macOS)
+    WebhookSink  POSTs the alerts as JSON, e.g. to a local http://127.0.0.1:8000/alerts
+    LogSink      appends one line per alert to a file
+
+    dispatcher = AlertDispatcher(default_sinks(sound='./Alarm-Clock-Short-chosic.com_.mp3'))
+    await dispatcher.start()
+    dispatcher.submit('RVNL.NS', 'Alert: RVNL.NS has crossed above ...', price=615.2)
+    await dispatcher.close()
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import asyncio
+import subprocess
+import urllib.request
+from typing import NamedTuple, Optional
+
+DEFAULT_SOUND = './Alarm-Clock-Short-chosic.com_.mp3'
+SINK_TIMEOUT = 30.0  # seconds
+
+# Audio players in order of preference, with the arguments placed before the file
+SOUND_PLAYERS = [
+    ('afplay', []),
+    ('paplay', []),
+    ('aplay', ['-q']),
+    ('ffplay', ['-nodisp', '-autoexit', '-loglevel', 'quiet']),
+]
+
+
+class Alert(NamedTuple):
+    ticker: str
+    message: str
+    price: Optional[float]
+    time: float  # time.time() when submitted
+
+
+def sound_command(path: str) -> Optional[list]:
+    """Command playing `path` with the first audio player found, None when there is none."""
+    for player, arguments in SOUND_PLAYERS:
+        executable = shutil.which(player)
+        if executable:
+            return [executable] + arguments + [path]
+    return None
+
+
+def play_sound(path: str) -> Optional[subprocess.Popen]:
+    """Start playing `path` in the background (the caller doesn't wait for the clip)."""
+    command = sound_command(path)
+    if command is None:
+        print(f"No audio player found for {path}")
+        return None
+    return subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def summary(alerts: list) -> str:
+    if len(alerts) == 1:
+        return alerts[0].message
+    return f"{len(alerts)} alerts: " + ", ".join(sorted({alert.ticker for alert in alerts}))
+
+
+class SoundSink:
+    """One clip per delivery, alerts arriving while it plays are coalesced into the next one."""
+
+    name = 'sound'
+
+    def __init__(self, path: str = DEFAULT_SOUND):
+        self.path = path
+        self.command = sound_command(path)
+
+    async def send(self, alerts: list) -> None:
+        if self.command is None:
+            return
+        process = await asyncio.create_subprocess_exec(*self.command, stdout=asyncio.subprocess.DEVNULL,
+                                                       stderr=asyncio.subprocess.DEVNULL)
+        await process.wait()
+
+
+class DesktopSink:
+    name = 'desktop'
+
+    def __init__(self, title: str = 'Stock alert'):
+        self.title = title
+
+    def command(self, text: str) -> Optional[list]:
+        if sys.platform == 'darwin' and shutil.which('osascript'):
+            return ['osascript', '-e', f"display notification {json.dumps(text)} with title {json.dumps(self.title)}"]
+        if shutil.which('notify-send'):
+            return ['notify-send', self.title, text]
+        return None
+
+    async def send(self, alerts: list) -> None:
+        text = "\n".join(alert.message for alert in alerts) if len(alerts) <= 5 else summary(alerts)
+        command = self.command(text)
+        if command is None:
+            return
+        process = await asyncio.create_subprocess_exec(*command, stdout=asyncio.subprocess.DEVNULL,
+                                                       stderr=asyncio.subprocess.DEVNULL)
+        await process.wait()
+
+
+class WebhookSink:
+    """POSTs {"alerts": [{ticker, message, price, time}, ...]} as JSON."""
+
+    name = 'webhook'
+
+    def __init__(self, url: str = 'http://127.0.0.1:8000/alerts', timeout: float = 5.0):
+        self.url = url
+        self.timeout = timeout
+
+    def _post(self, body: bytes) -> int:
+        request = urllib.request.Request(self.url, data=body, headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return response.status
+
+    async def send(self, alerts: list) -> None:
+        body = json.dumps({'alerts': [alert._asdict() for alert in alerts]}).encode()
+        await asyncio.to_thread(self._post, body)
+
+
+class LogSink:
+    name = 'log'
+
+    def __init__(self, path: str = './stock_data/alerts.log'):
+        self.path = path
+
+    def _write(self, lines: list) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, 'a') as file:
+            file.writelines(lines)
+
+    async def send(self, alerts: list) -> None:
+        lines = [f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(alert.time))}\t{alert.ticker}\t"
+                 f"{'' if alert.price is None else f'{alert.price:.2f}'}\t{alert.message}\n" for alert in alerts]
+        await asyncio.to_thread(self._write, lines)
+
+
+def default_sinks(sound: Optional[str] = DEFAULT_SOUND, desktop: bool = False, webhook: Optional[str] = None,
+                  log_path: Optional[str] = None) -> list:
+    sinks = []
+    if sound:
+        sinks.append(SoundSink(sound))
+    if desktop:
+        sinks.append(DesktopSink())
+    if webhook:
+        sinks.append(WebhookSink(webhook))
+    if log_path:
+        sinks.append(LogSink(log_path))
+    return sinks
+
+
+class AlertDispatcher:
+    def __init__(self, sinks, rate_limit: float = 60.0, coalesce: float = 2.0, max_queue: int = 1000,
+                 sink_timeout: float = SINK_TIMEOUT, clock=time.monotonic):
+        self.sinks = list(sinks)
+        self.rate_limit = rate_limit
+        self.coalesce = coalesce
+        self.sink_timeout = sink_timeout
+        self.clock = clock
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.last_delivered = {}  # ticker -> clock() of its last delivery
+        self.delivered = 0
+        self.suppressed = 0
+        self.dropped = 0
+        self._task = None
+
+    async def start(self) -> 'AlertDispatcher':
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        return self
+
+    def submit(self, ticker: str, message: str, price: float = None) -> None:
+        """Queue an alert without waiting; when the queue is full the oldest alert makes room."""
+        alert = Alert(ticker, message, price, time.time())
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.queue.task_done()
+            self.dropped += 1
+        self.queue.put_nowait(alert)
+
+    def _admit(self, alerts: list) -> list:
+        """Alerts grouped by ticker with repeated messages folded, minus the tickers still inside their rate limit."""
+        latest = {}
+        for alert in alerts:
+            latest.setdefault(alert.ticker, []).append(alert)
+        now = self.clock()
+        admitted = []
+        for ticker, ticker_alerts in latest.items():
+            last = self.last_delivered.get(ticker)
+            if last is not None and now - last < self.rate_limit:
+                self.suppressed += len(ticker_alerts)
+                continue
+            self.last_delivered[ticker] = now
+            # Levels crossed in the same burst are all kept, repeats of a message are not
+            admitted.extend({alert.message: alert for alert in ticker_alerts}.values())
+            self.suppressed += len(ticker_alerts) - len({alert.message for alert in ticker_alerts})
+        return admitted
+
+    async def _collect(self) -> list:
+        """First alert from the queue plus everything that arrives within the coalescing window."""
+        alerts = [await self.queue.get()]
+        deadline = self.clock() + self.coalesce
+        while True:
+            remaining = deadline - self.clock()
+            if remaining <= 0:
+                break
+            try:
+                alerts.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return alerts
+
+    async def _deliver(self, alerts: list) -> None:
+        async def send(sink):
+            try:
+                await asyncio.wait_for(sink.send(alerts), self.sink_timeout)
+            except Exception as error:
+                print(f"Alert sink {getattr(sink, 'name', sink)} failed: {type(error).__name__}: {error}")
+
+        await asyncio.gather(*(send(sink) for sink in self.sinks))
+        self.delivered += len(alerts)
+
+    async def _run(self) -> None:
+        while True:
+            alerts = await self._collect()
+            try:
+                admitted = self._admit(alerts)
+                if admitted:
+                    await self._deliver(admitted)
+            finally:
+                for _ in alerts:
+                    self.queue.task_done()
+
+    async def flush(self) -> None:
+        """Wait until every queued alert has been delivered (or suppressed)."""
+        await self.queue.join()
+
+    async def close(self) -> None:
+        if self._task is None:
+            return
+        await self.flush()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
@@ -0,0 +1,456 @@
+"""
+Alert rules over the indicator columns
+
+Rules are written over the columns calculate_indicators produces (plus Open,
+High, Low, Close, Volume):
+
+    RSI crosses 30                       either direction (crosses above / crosses below)
+    Close > UpperBand
+    Volume_Spike and MACD crossover      MACD crosses above Signal_Line
+    not (RSI < 50) or Close < 0.98 * EMA_20
+
+Shorthands: `MACD crossover/crossunder` (against Signal_Line), `EMA crossover`
+(EMA_20 against EMA_50) and `SMA crossover` (SMA_20 against SMA_50). `crosses`
+uses the same convention as the price thresholds: up when prev < level <= now.
+
+A RuleSet compiles all rule texts once. Every distinct comparison (literal) is
+evaluated once per cycle for all tickers; literals comparing the same column
+against constants are one broadcast comparison however many rules use them.
+The and/or/not structure is brought into disjunctive normal form, evaluated as
+two gathers (conjunctions over their literals, rules over their conjunctions),
+so a cycle costs a fixed number of array operations, linear in the terms. A
+rule is rejected when it expands to more than MAX_CONJUNCTIONS conjunctions
+(an `and` of `or`s multiplies out):
+
+    rules = RuleSet(["RSI crosses 30", "Close > UpperBand"])
+    current, previous = indicator_rows(buffers, tickers)    # column -> array over tickers
+    fired = rules.evaluate(current, previous)               # (rules x tickers) booleans
+
+A literal whose inputs are NaN (not enough bars yet) makes its conjunction false.
+RuleMonitor assigns rules to tickers and alerts when a rule becomes true;
+check_buffers() can be limited to the tickers whose bars changed.
+"""
+
+import re
+import operator
+
+import numpy as np
+
+from indicator_kernels import INDICATORS, indicator_arrays
+
+COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume'] + INDICATORS
+# Case-insensitive column lookup, e.g. "close" or "upperband"
+COLUMN_NAMES = {column.lower(): column for column in COLUMNS}
+
+CROSSOVER_PAIRS = {
+    'macd': ('MACD', 'Signal_Line'),
+    'ema': ('EMA_20', 'EMA_50'),
+    'sma': ('SMA_20', 'SMA_50'),
+}
+
+COMPARISONS = {'>': operator.gt, '>=': operator.ge, '<': operator.lt, '<=': operator.le,
+               '==': operator.eq, '!=': operator.ne}
+FLIPPED = {'>': '<', '>=': '<=', '<': '>', '<=': '>=', '==': '==', '!=': '!='}
+ARITHMETIC = {'+': operator.add, '-': operator.sub, '*': operator.mul, '/': operator.truediv}
+
+TOKEN = re.compile(r"\s*(?:(\d+\.?\d*(?:[eE][-+]?\d+)?|\.\d+)|([A-Za-z_][A-Za-z_0-9]*)|(>=|<=|==|!=|[<>()+\-*/]))")
+KEYWORDS = {'and', 'or', 'not', 'crosses', 'above', 'below', 'crossover', 'crossunder'}
+# Most conjunctions one rule may expand to in disjunctive normal form
+MAX_CONJUNCTIONS = 256
+
+
+def tokenize(text: str) -> list:
+    tokens = []
+    position = 0
+    text = text.strip()
+    while position < len(text):
+        match = TOKEN.match(text, position)
+        if match is None or match.end() == position:
+            raise ValueError(f"Unexpected {text[position:]!r} in rule {text!r}")
+        number, name, symbol = match.groups()
+        if number is not None:
+            tokens.append(('num', float(number)))
+        elif name is not None:
+            tokens.append(('kw', name.lower()) if name.lower() in KEYWORDS else ('name', name))
+        else:
+            tokens.append(('op', symbol))
+        position = match.end()
+    return tokens
+
+
+CONDITIONS = {'and', 'or', 'not', 'cmp', 'cross', 'truthy'}
+
+
+class _Parser:
+    """
+    rule       := or ;  or := and ('or' and)* ;  and := not ('and' not)*
+    not        := 'not' not | comparison
+    comparison := sum [(op sum) | ('crosses' ['above'|'below'] sum)] | name ('crossover'|'crossunder')
+    sum        := product (('+'|'-') product)* ;  product := unary (('*'|'/') unary)*
+    unary      := '-' unary | number | column | '(' or ')'
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.tokens = tokenize(text)
+        self.position = 0
+
+    def error(self, message: str):
+        return ValueError(f"{message} in rule {self.text!r}")
+
+    def peek(self, offset: int = 0):
+        index = self.position + offset
+        return self.tokens[index] if index < len(self.tokens) else (None, None)
+
+    def take(self):
+        token = self.peek()
+        self.position += 1
+        return token
+
+    def accept(self, kind: str, value=None) -> bool:
+        token_kind, token_value = self.peek()
+        if token_kind == kind and (value is None or token_value == value):
+            self.position += 1
+            return True
+        return False
+
+    def condition(self, node):
+        if node[0] in CONDITIONS:
+            return node
+        # Volume_Spike is the one boolean column
+        if node == ('col', 'Volume_Spike'):
+            return ('truthy', node)
+        raise self.error("Expected a condition")
+
+    def parse(self):
+        node = self.condition(self.parse_or())
+        if self.position != len(self.tokens):
+            raise self.error(f"Unexpected {self.peek()[1]!r}")
+        return node
+
+    def parse_or(self):
+        node = self.parse_and()
+        while self.accept('kw', 'or'):
+            node = ('or', self.condition(node), self.condition(self.parse_and()))
+        return node
+
+    def parse_and(self):
+        node = self.parse_not()
+        while self.accept('kw', 'and'):
+            node = ('and', self.condition(node), self.condition(self.parse_not()))
+        return node
+
+    def parse_not(self):
+        if self.accept('kw', 'not'):
+            return ('not', self.condition(self.parse_not()))
+        return self.parse_comparison()
+
+    def parse_comparison(self):
+        kind, value = self.peek()
+        if kind == 'name' and self.peek(1)[0] == 'kw' and self.peek(1)[1] in ('crossover', 'crossunder'):
+            pair = CROSSOVER_PAIRS.get(value.lower())
+            if pair is None:
+                raise self.error(f"No crossover pair for {value!r} (use {', '.join(CROSSOVER_PAIRS)})")
+            direction = 'above' if self.peek(1)[1] == 'crossover' else 'below'
+            self.position += 2
+            return ('cross', direction, ('col', pair[0]), ('col', pair[1]))
+
+        left = self.parse_sum()
+        kind, value = self.peek()
+        if kind == 'op' and value in COMPARISONS:
+            self.position += 1
+            return ('cmp', value, left, self.parse_sum())
+        if self.accept('kw', 'crosses'):
+            direction = 'both'
+            for word in ('above', 'below'):
+                if self.accept('kw', word):
+                    direction = word
+            return ('cross', direction, left, self.parse_sum())
+        # A bare value, the caller decides whether it can stand as a condition
+        return left
+
+    def parse_sum(self):
+        node = self.parse_product()
+        while self.peek() in (('op', '+'), ('op', '-')):
+            node = ('arith', self.take()[1], node, self.parse_product())
+        return node
+
+    def parse_product(self):
+        node = self.parse_unary()
+        while self.peek() in (('op', '*'), ('op', '/')):
+            node = ('arith', self.take()[1], node, self.parse_unary())
+        return node
+
+    def parse_unary(self):
+        kind, value = self.take()
+        if (kind, value) == ('op', '-'):
+            operand = self.parse_unary()
+            return ('num', -operand[1]) if operand[0] == 'num' else ('arith', '-', ('num', 0.0), operand)
+        if kind == 'num':
+            return ('num', value)
+        if kind == 'name':
+            column = COLUMN_NAMES.get(value.lower())
+            if column is None:
+                raise self.error(f"Unknown column {value!r}")
+            return ('col', column)
+        if (kind, value) == ('op', '('):
+            node = self.parse_or()
+            if not self.accept('op', ')'):
+                raise self.error("Missing ')'")
+            return node
+        raise self.error(f"Unexpected {value!r}" if kind else "Unexpected end")
+
+
+def parse(text: str):
+    """Rule text -> condition tree (raises ValueError for invalid rules)."""
+    node = _Parser(text).parse()
+    conjunctions = _conjunction_count(node)
+    if conjunctions > MAX_CONJUNCTIONS:
+        raise ValueError(f"Rule expands to {conjunctions} and-terms (at most {MAX_CONJUNCTIONS}), "
+                         f"simplify it or split it into several rules: {text!r}")
+    return node
+
+
+def _conjunction_count(node, negate: bool = False) -> int:
+    """len(_dnf(node)) without expanding it."""
+    kind = node[0]
+    if kind == 'not':
+        return _conjunction_count(node[1], not negate)
+    if kind in ('and', 'or'):
+        left, right = _conjunction_count(node[1], negate), _conjunction_count(node[2], negate)
+        return left * right if (kind == 'and') != negate else left + right
+    return 1
+
+
+def _key(node) -> str:
+    return repr(node)
+
+
+def _dnf(node, negate: bool = False) -> list:
+    """Conjunctions (frozensets of (literal, positive)) whose union is the condition."""
+    kind = node[0]
+    if kind == 'not':
+        return _dnf(node[1], not negate)
+    if kind in ('and', 'or'):
+        left, right = _dnf(node[1], negate), _dnf(node[2], negate)
+        if (kind == 'and') != negate:
+            return [a | b for a in left for b in right]
+        return left + right
+    return [frozenset({(node, not negate)})]
+
+
+def _operand(node):
+    """Compiled operand: function(values, cache) -> array or number."""
+    kind = node[0]
+    if kind == 'num':
+        value = node[1]
+        return lambda values, cache: value
+    if kind == 'col':
+        column = node[1]
+        return lambda values, cache: values[column]
+    if kind == 'arith':
+        function, left, right = ARITHMETIC[node[1]], _operand(node[2]), _operand(node[3])
+        key = _key(node)
+
+        def arith(values, cache):
+            # Shared subexpressions are computed once per evaluation
+            cache_key = (id(values), key)
+            if cache_key not in cache:
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    cache[cache_key] = function(left(values, cache), right(values, cache))
+            return cache[cache_key]
+        return arith
+    raise ValueError(f"Expected a value, got a condition ({kind})")
+
+
+class RuleSet:
+    def __init__(self, rules):
+        self.rules = list(dict.fromkeys(rules))
+        literals = {}
+        conjunctions = {}
+        rule_conjunctions = []
+        for text in self.rules:
+            indices = []
+            for conjunction in _dnf(parse(text)):
+                terms = frozenset((literals.setdefault(_key(literal), (len(literals), literal))[0], positive)
+                                  for literal, positive in conjunction)
+                indices.append(conjunctions.setdefault(terms, len(conjunctions)))
+            rule_conjunctions.append(indices)
+
+        self.literals = [literal for _, literal in sorted(literals.values(), key=lambda item: item[0])]
+        count = len(self.literals)
+        # Rows of the signed literal table: i = literal i, count + i = its negation, 2 * count = always true
+        self.terms = _padded([[literal if positive else count + literal for literal, positive in terms]
+                              for terms in sorted(conjunctions, key=conjunctions.get)], 2 * count)
+        # Rows of the conjunction table, len(conjunctions) = always false
+        self.rule_terms = _padded(rule_conjunctions, len(conjunctions))
+        self._compile_literals()
+
+    def _compile_literals(self):
+        """Group `operand <op> constant` literals per (operand, op); the rest are evaluated one by one."""
+        groups = {}
+        self.single = []
+        for index, literal in enumerate(self.literals):
+            kind = literal[0]
+            if kind == 'truthy':
+                self.single.append((index, kind, None, [_operand(literal[1])]))
+                continue
+            op, left, right = literal[1:]
+            if left[0] == 'num' and right[0] != 'num':
+                left, right = right, left
+                op = FLIPPED[op] if kind == 'cmp' else {'above': 'below', 'below': 'above', 'both': 'both'}[op]
+            if right[0] == 'num' and left[0] != 'num':
+                group = groups.setdefault((kind, op, _key(left)), (_operand(left), [], []))
+                group[1].append(index)
+                group[2].append(right[1])
+            else:
+                self.single.append((index, kind, op, [_operand(left), _operand(right)]))
+        self.groups = [(kind, op, operand, np.array(indices), np.array(constants)[:, None])
+                       for (kind, op, _), (operand, indices, constants) in groups.items()]
+
+    def evaluate(self, current: dict, previous: dict = None) -> np.ndarray:
+        """(rules x tickers) booleans from column -> array-over-tickers dicts of the last and the bar before."""
+        previous = current if previous is None else previous
+        tickers = len(next(iter(current.values())))
+        count = len(self.literals)
+        signed = np.ones((2 * count + 1, tickers), dtype=bool)
+        values, negated = signed[:count], signed[count:2 * count]
+        unknown = np.zeros((count, tickers), dtype=bool)
+        cache = {}
+
+        def column(operand, row):
+            return np.broadcast_to(np.asarray(operand(row, cache), dtype=float), (tickers,))
+
+        # Every rule comparing one operand with constants: one (constants x tickers) comparison
+        for kind, op, operand, indices, constants in self.groups:
+            now = column(operand, current)[None, :]
+            missing = np.isnan(now)
+            if kind == 'cmp':
+                result = _compare(COMPARISONS[op], now, constants)
+            else:
+                before = column(operand, previous)[None, :]
+                result = _cross(op, before, constants, now, constants)
+                missing = missing | np.isnan(before)
+            values[indices] = result
+            unknown[indices] = missing
+
+        for index, kind, op, operands in self.single:
+            now = [column(operand, current) for operand in operands]
+            missing = np.logical_or.reduce([np.isnan(value) for value in now])
+            if kind == 'truthy':
+                result = now[0] != 0
+            elif kind == 'cmp':
+                result = _compare(COMPARISONS[op], *now)
+            else:
+                before = [column(operand, previous) for operand in operands]
+                result = _cross(op, before[0], before[1], now[0], now[1])
+                missing = missing | np.logical_or.reduce([np.isnan(value) for value in before])
+            values[index] = result
+            unknown[index] = missing
+
+        # A conjunction is true where all its signed literals hold and none of them is unknown,
+        # a rule where any of its conjunctions is
+        np.logical_not(values, out=negated)
+        unknown_signed = np.concatenate([unknown, unknown, np.zeros((1, tickers), dtype=bool)])
+        conjunctions = np.zeros((len(self.terms) + 1, tickers), dtype=bool)
+        conjunctions[:-1] = signed[self.terms].all(axis=1) & ~unknown_signed[self.terms].any(axis=1)
+        return conjunctions[self.rule_terms].any(axis=1)
+
+
+def _padded(rows: list, fill: int) -> np.ndarray:
+    """Ragged index lists as one (rows x longest) array padded with `fill`."""
+    width = max((len(row) for row in rows), default=0)
+    table = np.full((len(rows), max(width, 1)), fill, dtype=np.intp)
+    for index, row in enumerate(rows):
+        table[index, :len(row)] = row
+    return table
+
+
+def _compare(function, left, right) -> np.ndarray:
+    with np.errstate(invalid='ignore'):
+        return function(np.asarray(left, dtype=float), np.asarray(right, dtype=float))
+
+
+def _cross(direction: str, left_before, right_before, left_now, right_now) -> np.ndarray:
+    with np.errstate(invalid='ignore'):
+        up = (left_before < right_before) & (left_now >= right_now)
+        down = (left_before > right_before) & (left_now <= right_now)
+    if direction == 'above':
+        return up
+    if direction == 'below':
+        return down
+    return up | down
+
+
+def indicator_rows(buffers, tickers) -> tuple:
+    """
+    Latest and previous indicator rows of every ticker from their ring buffers, as
+    column -> array-over-tickers dicts. All tickers go through one 2-D kernel call.
+    """
+    rings = [buffers.get(ticker) for ticker in tickers]
+    length = max((len(ring) for ring in rings if ring is not None), default=0)
+    fields = np.full((5, max(length, 2), len(tickers)), np.nan)
+    for column, ring in enumerate(rings):
+        if ring is not None and len(ring):
+            # Shorter histories are padded at the top, the kernel skips NaN bars
+            fields[:, fields.shape[1] - len(ring):, column] = ring.window()
+    open_, high, low, close, volume = fields
+    indicators = indicator_arrays(high, low, close, volume)
+    indicators.update({'Open': open_, 'High': high, 'Low': low, 'Close': close, 'Volume': volume})
+    current = {column: values[-1] for column, values in indicators.items()}
+    previous = {column: values[-2] for column, values in indicators.items()}
+    return current, previous
+
+
+class RuleMonitor:
+    """Rules per ticker; check() returns the (ticker, rule) pairs that just became true."""
+
+    def __init__(self):
+        self.set_rules({})
+
+    def set_rules(self, rules: dict) -> None:
+        """ticker -> list of rule texts (tickers without rules are left out). Rules kept keep their state."""
+        was_active = set(self.check_active()) if hasattr(self, 'active') else set()
+        self.tickers = [ticker for ticker, texts in rules.items() if texts]
+        self.columns = {ticker: column for column, ticker in enumerate(self.tickers)}
+        self.ruleset = RuleSet([text for ticker in self.tickers for text in rules[ticker]])
+        self.assigned = np.zeros((len(self.ruleset.rules), len(self.tickers)), dtype=bool)
+        positions = {text: index for index, text in enumerate(self.ruleset.rules)}
+        for column, ticker in enumerate(self.tickers):
+            for text in rules[ticker]:
+                self.assigned[positions[text], column] = True
+        self.active = np.zeros_like(self.assigned)
+        for column, ticker in enumerate(self.tickers):
+            for text in rules[ticker]:
+                if (ticker, text) in was_active:
+                    self.active[positions[text], column] = True
+
+    def check_active(self) -> list:
+        """(ticker, rule) pairs currently true."""
+        rules, columns = np.nonzero(self.active)
+        return [(self.tickers[column], self.ruleset.rules[rule]) for rule, column in zip(rules, columns)]
+
+    def check(self, current: dict, previous: dict = None, columns=None) -> list:
+        """
+        Rows over all tickers, or over the tickers at `columns` (positions in self.tickers)
+        only; the other tickers keep their state.
+        """
+        if not self.tickers:
+            return []
+        columns = np.arange(len(self.tickers)) if columns is None else np.asarray(columns, dtype=np.intp)
+        state = self.ruleset.evaluate(current, previous) & self.assigned[:, columns]
+        fired = state & ~self.active[:, columns]
+        self.active[:, columns] = state
+        rules, positions = np.nonzero(fired)
+        return [(self.tickers[columns[position]], self.ruleset.rules[rule]) for rule, position in zip(rules, positions)]
+
+    def check_buffers(self, buffers, tickers=None) -> list:
+        """Evaluate the rules on the rings of all tickers, or only of `tickers` (e.g. the ones just updated)."""
+        if tickers is not None:
+            tickers = [ticker for ticker in tickers if ticker in self.columns]
+        else:
+            tickers = self.tickers
+        if not tickers:
+            return []
+        columns = [self.columns[ticker] for ticker in tickers]
+        return self.check(*indicator_rows(buffers, tickers), columns=columns)
@@ -0,0 +1,171 @@
+"""
+Backtest of the stock_trend.py signals
+
+determine_trend and identify_breakout only judge the last bar. Here the exact same
+rules (trend_conditions / breakout_conditions) are evaluated on every bar of every
+symbol at once, on an indicator panel whose columns are (indicator, symbol):
+
+    trend     long while the 7-indicator vote says Uptrend (short on Downtrend
+              unless long_only)
+    breakout  long for `hold` bars after any breakout signal
+
+Positions are taken at the close of the signal bar and earn the next bar's
+return. Reported per symbol and for the equal-weight portfolio: total and
+annualized return, hit rate (share of invested bars with a positive return),
+max drawdown, turnover (position changes per year) and exposure.
+
+    python backtest.py NSE_large_midcap_250 --period 5y --strategy trend
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import timed
+from ohlcv_store import FIELDS
+from data_provider import load_period_panel, field_matrix
+from indicator_kernels import indicator_arrays
+from stock_trend import trend_conditions, breakout_conditions
+
+BARS_PER_YEAR = 252
+
+
+@timed('compute.indicator_panel')
+def indicator_panel(price_panel: pd.DataFrame) -> pd.DataFrame:
+    """
+    calculate_indicators for every symbol in one 2-D kernel call, as a frame with
+    (indicator, symbol) columns, so `panel['RSI']` is a date x symbol matrix.
+    """
+    fields = {field: field_matrix(price_panel, field) for field in FIELDS}
+    index, columns = fields['Close'].index, fields['Close'].columns
+    indicators = indicator_arrays(*(fields[field].to_numpy(dtype=float) for field in ['High', 'Low', 'Close', 'Volume']))
+    frames = dict(fields)
+    frames.update({name: pd.DataFrame(values, index=index, columns=columns) for name, values in indicators.items()})
+    return pd.concat(frames, axis=1, names=['Field', 'Symbol'])
+
+# Columns trend_conditions reads, no position is taken on a bar where one of them is NaN
+TREND_INPUTS = ['Close', 'SMA_20', 'SMA_50', 'EMA_20', 'EMA_50', 'MiddleBand', 'RSI', 'MACD', 'Signal_Line',
+                'OBV', 'Plus_DI', 'Minus_DI', 'ADX']
+
+
+def previous_bars(valid: np.ndarray) -> np.ndarray:
+    """Row of every symbol's last bar before each row (-1 before its first bar), `valid` marks its bars."""
+    rows = np.where(valid, np.arange(len(valid))[:, None], -1)
+    last = np.maximum.accumulate(rows, axis=0)
+    previous = np.full_like(last, -1)
+    previous[1:] = last[:-1]
+    return previous
+
+
+def trend_positions(panel: pd.DataFrame, long_only: bool = True) -> pd.DataFrame:
+    # Forward filled, the OBV rule's shift(1) compares with the symbol's own previous bar
+    conditions = trend_conditions(panel.ffill())
+    votes = sum(condition.astype(int) for condition in conditions.values())
+    rules = len(conditions)
+    positions = (2 * votes > rules).astype(float)
+    if not long_only:
+        positions -= (2 * votes < rules).astype(float)
+    # A NaN compares as False and would count as a Downtrend vote (warm-up, missing bars)
+    known = np.logical_and.reduce([panel[field].notna().to_numpy() for field in TREND_INPUTS])
+    return positions.where(known, 0.0)
+
+
+def breakout_positions(panel: pd.DataFrame, hold: int = 5) -> pd.DataFrame:
+    signal = None
+    for condition in breakout_conditions(panel.ffill()).values():
+        signal = condition if signal is None else signal | condition
+    # Stay long for `hold` of the symbol's own bars after its latest signal
+    valid = panel['Close'].notna().to_numpy()
+    bars = np.cumsum(valid, axis=0)
+    last_signal = np.maximum.accumulate(np.where(signal.to_numpy(dtype=bool) & valid, bars, -hold), axis=0)
+    return pd.DataFrame((bars - last_signal < hold).astype(float), index=signal.index, columns=signal.columns)
+
+
+def max_drawdown(returns: pd.DataFrame) -> pd.Series:
+    equity = (1 + returns.fillna(0)).cumprod()
+    return (equity / equity.cummax() - 1).min()
+
+
+@timed('compute.backtest')
+def run_backtest(positions: pd.DataFrame, prices: pd.DataFrame, cost: float = 0.0) -> dict:
+    """
+    Strategy returns and statistics for a date x symbol position matrix.
+    `cost` is charged per unit of position change (e.g. 0.001 = 10 bps).
+    """
+    prices = prices.reindex_like(positions)
+    # Every symbol on its own bars: the return from its previous price, held with the
+    # position taken at its previous bar (dates other symbols traded on are skipped)
+    values = prices.to_numpy(dtype=float)
+    previous = previous_bars(~np.isnan(values))
+    columns = np.arange(values.shape[1])
+    started = previous >= 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        asset_returns = pd.DataFrame(np.where(started, values / values[previous, columns] - 1, np.nan),
+                                     index=prices.index, columns=prices.columns)
+    held = pd.DataFrame(np.where(started, np.nan_to_num(positions.to_numpy(dtype=float))[previous, columns], 0.0),
+                        index=positions.index, columns=positions.columns)
+    trades = held.diff().abs().fillna(held.abs())
+    returns = held * asset_returns.fillna(0) - cost * trades
+    returns = returns.where(prices.notna())
+
+    invested = held != 0
+    years = returns.notna().sum() / BARS_PER_YEAR
+    total = (1 + returns.fillna(0)).prod() - 1
+    with np.errstate(divide='ignore', invalid='ignore'):
+        stats = pd.DataFrame({
+            'Total Return': total,
+            'Annual Return': (1 + total) ** (1 / years) - 1,
+            'Hit Rate': (invested & (returns > 0)).sum() / invested.sum(),
+            'Max Drawdown': max_drawdown(returns),
+            'Turnover': trades.sum() / years,
+            'Exposure': invested.sum() / returns.notna().sum(),
+            'Buy & Hold': prices.ffill().iloc[-1] / prices.bfill().iloc[0] - 1,
+        })
+
+    portfolio = returns.mean(axis=1)
+    portfolio_total = (1 + portfolio.fillna(0)).prod() - 1
+    portfolio_years = len(portfolio) / BARS_PER_YEAR
+    portfolio_invested = invested.mean(axis=1)
+    stats.loc['Portfolio'] = {
+        'Total Return': portfolio_total,
+        'Annual Return': (1 + portfolio_total) ** (1 / portfolio_years) - 1 if portfolio_years else np.nan,
+        'Hit Rate': ((portfolio > 0) & (portfolio_invested > 0)).sum() / max((portfolio_invested > 0).sum(), 1),
+        'Max Drawdown': max_drawdown(portfolio.to_frame()).iloc[0],
+        'Turnover': trades.mean(axis=1).sum() / portfolio_years if portfolio_years else np.nan,
+        'Exposure': portfolio_invested.mean(),
+        'Buy & Hold': stats['Buy & Hold'].mean(),
+    }
+    return {'returns': returns, 'portfolio': portfolio, 'stats': stats}
+
+
+def backtest_universe(symbols, period: str = '5y', strategy: str = 'trend', hold: int = 5,
+                      long_only: bool = True, cost: float = 0.0, provider=None) -> dict:
+    price_panel = load_period_panel(symbols, period, provider=provider)
+    panel = indicator_panel(price_panel)
+    if strategy == 'trend':
+        positions = trend_positions(panel, long_only=long_only)
+    elif strategy == 'breakout':
+        positions = breakout_positions(panel, hold=hold)
+    else:
+        raise ValueError(f"Unknown strategy: {strategy}")
+    return run_backtest(positions, field_matrix(price_panel, 'Adj Close'), cost=cost)
+
+
+if __name__ == "__main__":
+    from universe import load_universe, to_yahoo
+
+    parser = argparse.ArgumentParser(description="Backtest the determine_trend / identify_breakout rules")
+    parser.add_argument('csv_files', nargs='*', default=["NSE_large_midcap_250"])
+    parser.add_argument('--period', default="5y")
+    parser.add_argument('--strategy', choices=['trend', 'breakout'], default='trend')
+    parser.add_argument('--hold', type=int, default=5)
+    parser.add_argument('--long-short', action='store_true')
+    parser.add_argument('--cost', type=float, default=0.0)
+    args = parser.parse_args()
+
+    universe = load_universe(args.csv_files)
+    result = backtest_universe(to_yahoo(universe['Symbol']).tolist(), period=args.period,
+                               strategy=args.strategy, hold=args.hold, long_only=not args.long_short,
+                               cost=args.cost)
+    print(result['stats'].sort_values('Total Return').to_string())
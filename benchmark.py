@@ -0,0 +1,287 @@
+"""
+Benchmarks for the analytics hot paths
+
+Every case runs on synthetic bars (synthetic_data.py) so no Yahoo download or
+input() is involved and the numbers are repeatable:
+
+    symbols  100 / 1000 / 10000
+    length   1y (252 daily bars), 5y (1260 daily bars), intraday (5 sessions of 1m bars)
+
+Stages:
+    calculate_indicators, determine_trend, find_price_patterns   per symbol (stock_trend.py)
+    indicator_kernels                                             the same indicators for all sampled
+                                                                  symbols in one 2-D call (indicator_kernels.py)
+    calculate_metrics+vis                                         per symbol (vis_engine.py)
+    calculate_vis_panel                                           whole date x symbol matrix
+    sqlite_write, sqlite_read                                     OHLCV store on a temporary database
+    startup                                                       fresh interpreter running cli.py --help,
+                                                                  importing stock_trend, ... (--no-startup skips)
+
+Per-symbol stages run on the first `--sample` symbols of a case and report the
+cost per symbol plus the projected time for the whole case, whole-universe stages
+always run on every symbol. Wall time is the best of `--repeat` runs; peak memory
+comes from a separate tracemalloc run (skip with --no-memory). For per-symbol
+stages that run only covers the sample and goes in 'Sample Peak MB' (it does not
+scale with the symbol count, so it is not projected), 'Peak MB' is left for the
+stages that ran on the whole case.
+
+    python benchmark.py --save benchmark_baseline.json
+    python benchmark.py --compare benchmark_baseline.json     # flags stages that got slower
+"""
+
+import gc
+import os
+import sys
+import subprocess
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from synthetic_data import synthetic_arrays, synthetic_panel, bar_dates
+
+SYMBOL_COUNTS = [100, 1000, 10000]
+LENGTHS = {
+    '1y': ('1d', 252),
+    '5y': ('1d', 1260),
+    'intraday': ('1m', 5 * 375),
+}
+STAGES = ['calculate_indicators', 'determine_trend', 'find_price_patterns', 'indicator_kernels',
+          'calculate_metrics+vis', 'calculate_vis_panel', 'sqlite_write', 'sqlite_read']
+PER_SYMBOL_STAGES = {'calculate_indicators', 'determine_trend', 'find_price_patterns', 'indicator_kernels',
+                     'calculate_metrics+vis', 'sqlite_write', 'sqlite_read'}
+REGRESSION_TOLERANCE = 1.25
+
+# Startup cost of a fresh interpreter, measured as the time until the command exits
+STARTUP_COMMANDS = {
+    'python': ['-c', 'pass'],
+    'cli --help': ['cli.py', '--help'],
+    'cli trend --help': ['cli.py', 'trend', '--help'],
+    'import stock_trend': ['-c', 'import stock_trend'],
+    'import trend_scanner': ['-c', 'import trend_scanner'],
+}
+
+
+def price_matrix(n_symbols: int, n_bars: int, interval: str = '1d', seed: int = 0, chunk: int = 1000) -> pd.DataFrame:
+    """Date x symbol Adj Close matrix, generated in chunks of symbols to keep memory flat."""
+    columns = []
+    for first in range(0, n_symbols, chunk):
+        size = min(chunk, n_symbols - first)
+        columns.append(synthetic_arrays(size, n_bars, interval, seed=seed + first)['Adj Close'])
+    symbols = [f"SYN{i:05d}.NS" for i in range(n_symbols)]
+    return pd.DataFrame(np.hstack(columns), index=bar_dates(n_bars, interval), columns=symbols)
+
+
+def make_stages(frames: dict, prices: pd.DataFrame, interval: str) -> dict:
+    """Cleanup callable and stage name -> zero-argument callable (sharing the state later stages need)."""
+    from stock_trend import calculate_indicators, determine_trend, find_price_patterns
+    from indicator_kernels import indicator_arrays
+    from vis_engine import calculate_metrics, calculate_vis, calculate_vis_panel
+    from ohlcv_store import init_store, write_bars, read_bars
+    from sqlalchemy import create_engine
+
+    state = {'directory': tempfile.mkdtemp(prefix='benchmark_')}
+
+    def indicators():
+        state['indicators'] = {symbol: calculate_indicators(df.copy()) for symbol, df in frames.items()}
+
+    def trend():
+        for df in state['indicators'].values():
+            determine_trend(df, verbose=False)
+
+    def patterns():
+        for symbol, df in state['indicators'].items():
+            find_price_patterns(df, symbol, plot=False, verbose=False)
+
+    def kernels():
+        indicator_arrays(*(np.column_stack([df[field].to_numpy() for df in frames.values()])
+                           for field in ['High', 'Low', 'Close', 'Volume']))
+
+    def metrics_vis():
+        for df in frames.values():
+            calculate_vis(calculate_metrics(df['Adj Close']))
+
+    def vis_panel():
+        calculate_vis_panel(prices)
+
+    def sqlite_write():
+        # A fresh database on every run so repeats measure the same work
+        if 'engine' in state:
+            state['engine'].dispose()
+            os.remove(os.path.join(state['directory'], 'bench.db'))
+        state['engine'] = create_engine(f"sqlite:///{os.path.join(state['directory'], 'bench.db')}")
+        init_store(state['engine'])
+        for symbol, df in frames.items():
+            write_bars(symbol, interval, df, engine=state['engine'])
+
+    def sqlite_read():
+        read_bars(list(frames), interval, engine=state['engine'])
+
+    def cleanup():
+        if 'engine' in state:
+            state['engine'].dispose()
+        shutil.rmtree(state['directory'], ignore_errors=True)
+
+    return cleanup, {
+        'calculate_indicators': indicators,
+        'determine_trend': trend,
+        'find_price_patterns': patterns,
+        'indicator_kernels': kernels,
+        'calculate_metrics+vis': metrics_vis,
+        'calculate_vis_panel': vis_panel,
+        'sqlite_write': sqlite_write,
+        'sqlite_read': sqlite_read,
+    }
+
+
+def measure(function, repeat: int = 1, memory: bool = True):
+    """Best wall time over `repeat` runs and the peak traced memory (MB) of one more run."""
+    best = float('inf')
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - started)
+    peak = np.nan
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            function()
+            peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        finally:
+            tracemalloc.stop()
+    return best, peak
+
+
+def run_case(n_symbols: int, length: str, stages=None, sample: int = 100, repeat: int = 1,
+             memory: bool = True, seed: int = 0) -> list:
+    interval, n_bars = LENGTHS[length]
+    stages = stages or STAGES
+    case = f"{n_symbols} x {length}"
+    sample = min(sample, n_symbols)
+
+    frames = {symbol: df.droplevel('Symbol') for symbol, df in
+              synthetic_panel(sample, n_bars, interval, seed=seed).groupby(level='Symbol', sort=False)}
+    prices = price_matrix(n_symbols, n_bars, interval, seed=seed) if 'calculate_vis_panel' in stages else None
+    cleanup, functions = make_stages(frames, prices, interval)
+
+    # Earlier stages provide the state of later ones, they run even when not reported
+    needed = set(stages)
+    if {'determine_trend', 'find_price_patterns'} & needed:
+        needed.add('calculate_indicators')
+    if 'sqlite_read' in needed:
+        needed.add('sqlite_write')
+
+    rows = []
+    try:
+        for stage in STAGES:
+            if stage in needed:
+                rows += _measure_stage(stage, functions[stage], case, n_symbols, n_bars, sample,
+                                       repeat, memory, report=stage in stages)
+    finally:
+        cleanup()
+    return rows
+
+
+def _measure_stage(stage, function, case, n_symbols, n_bars, sample, repeat, memory, report=True) -> list:
+    seconds, peak = measure(function, repeat=repeat, memory=memory)
+    if not report:
+        return []
+    per_symbol = stage in PER_SYMBOL_STAGES
+    symbols_run = sample if per_symbol else n_symbols
+    row = {
+        'Case': case,
+        'Stage': stage,
+        'Symbols': n_symbols,
+        'Bars': n_bars,
+        'Symbols Run': symbols_run,
+        'Seconds': seconds,
+        'ms/Symbol': seconds / symbols_run * 1000,
+        'Projected Seconds': seconds / symbols_run * n_symbols,
+        # The traced run of a per-symbol stage only held the sample
+        'Peak MB': np.nan if per_symbol else peak,
+        'Sample Peak MB': peak if per_symbol else np.nan,
+    }
+    print(f"{case:>18}  {stage:<22} {seconds:9.3f}s  {row['ms/Symbol']:9.3f} ms/symbol  {peak:9.1f} MB"
+          f"{f' ({symbols_run} symbol sample)' if per_symbol else ''}")
+    return [row]
+
+
+def run_startup(repeat: int = 5) -> list:
+    """Best wall time of every STARTUP_COMMANDS entry in a new interpreter."""
+    directory = os.path.dirname(os.path.abspath(__file__))
+    rows = []
+    for name, command in STARTUP_COMMANDS.items():
+        best = float('inf')
+        for _ in range(repeat):
+            started = time.perf_counter()
+            subprocess.run([sys.executable] + command, cwd=directory, check=True,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            best = min(best, time.perf_counter() - started)
+        rows.append({'Case': 'startup', 'Stage': name, 'Symbols': 1, 'Bars': 0, 'Symbols Run': 1,
+                     'Seconds': best, 'ms/Symbol': best * 1000, 'Projected Seconds': best, 'Peak MB': np.nan,
+                     'Sample Peak MB': np.nan})
+        print(f"{'startup':>18}  {name:<22} {best:9.3f}s")
+    return rows
+
+
+def run_benchmarks(symbol_counts=None, lengths=None, stages=None, sample: int = 100, repeat: int = 1,
+                   memory: bool = True, seed: int = 0) -> pd.DataFrame:
+    rows = []
+    for length in lengths or LENGTHS:
+        for n_symbols in symbol_counts or SYMBOL_COUNTS:
+            rows += run_case(n_symbols, length, stages=stages, sample=sample, repeat=repeat,
+                             memory=memory, seed=seed)
+    return pd.DataFrame(rows)
+
+
+def save_baseline(results: pd.DataFrame, path: str) -> None:
+    with open(path, 'w') as file:
+        json.dump({'created': time.strftime('%Y-%m-%d %H:%M:%S'), 'results': results.to_dict(orient='records')},
+                  file, indent=2)
+
+
+def compare(results: pd.DataFrame, path: str, tolerance: float = REGRESSION_TOLERANCE) -> pd.DataFrame:
+    """Per-stage cost against a saved baseline; Regression when ms/symbol grew by more than `tolerance`."""
+    with open(path, 'r') as file:
+        baseline = pd.DataFrame(json.load(file)['results'])
+    merged = results.merge(baseline[['Case', 'Stage', 'ms/Symbol', 'Peak MB']], on=['Case', 'Stage'],
+                           how='left', suffixes=('', ' Baseline'))
+    merged['Ratio'] = merged['ms/Symbol'] / merged['ms/Symbol Baseline']
+    merged['Regression'] = merged['Ratio'] > tolerance
+    return merged
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the analytics hot paths on synthetic data")
+    parser.add_argument('--symbols', nargs='+', type=int, default=SYMBOL_COUNTS)
+    parser.add_argument('--lengths', nargs='+', choices=list(LENGTHS), default=list(LENGTHS))
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES)
+    parser.add_argument('--sample', type=int, default=100, help='symbols to run the per-symbol stages on')
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--no-memory', action='store_true')
+    parser.add_argument('--no-startup', action='store_true', help='skip the interpreter startup timings')
+    parser.add_argument('--save', default=None, help='write the results as a baseline JSON')
+    parser.add_argument('--compare', default=None, help='compare against a baseline JSON')
+    parser.add_argument('--tolerance', type=float, default=REGRESSION_TOLERANCE)
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.symbols, args.lengths, args.stages, sample=args.sample, repeat=args.repeat,
+                             memory=not args.no_memory)
+    if not args.no_startup:
+        results = pd.concat([results, pd.DataFrame(run_startup(max(args.repeat, 5)))], ignore_index=True)
+    print(results.to_string(index=False))
+    if args.save:
+        save_baseline(results, args.save)
+    if args.compare:
+        comparison = compare(results, args.compare, tolerance=args.tolerance)
+        print(comparison[['Case', 'Stage', 'ms/Symbol', 'ms/Symbol Baseline', 'Ratio', 'Regression']]
+              .to_string(index=False))
+        if comparison['Regression'].any():
+            raise SystemExit(1)
@@ -0,0 +1,171 @@
+"""
+Pattern charts rendered in the background
+
+plot_stock_data used to draw with the pyplot state machine, never closed its
+figures (a universe scan leaked one per pattern) and named files with
+time.ctime(). Charts are now drawn with the Agg backend on an object oriented
+Figure that every worker process reuses, and written to a deterministic path:
+
+    plots/{symbol}/{pattern}_{date}.png      e.g. plots/SBIN.NS/ascending_triangle_2024-06-28.png
+
+`date` is the last bar of the data. Next to every chart a .sha1 file holds a
+digest of its inputs (bars, extrema, title); a chart whose digest is unchanged
+is not drawn again, so rerunning a scan only renders what moved.
+
+    with ChartRenderer() as renderer:          # process pool, Agg in every worker
+        renderer.submit(stock_data, 'SBIN.NS', 'Ascending Triangle')
+    # leaving the block waits for the queued charts
+
+render_chart() draws one chart in the calling process (used by plot_stock_data).
+"""
+
+import os
+import re
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+PLOT_DIRECTORY = './plots'
+FIGURE_SIZE = (12, 6)
+DPI = 100
+
+# One Figure per process, cleared and drawn again for every chart
+_figure = None
+
+
+def _slug(text: str) -> str:
+    return re.sub(r'[^a-z0-9]+', '_', str(text).lower()).strip('_') or 'chart'
+
+
+def chart_path(symbol: str, pattern=None, date=None, directory: str = PLOT_DIRECTORY) -> str:
+    """plots/{symbol}/{pattern}_{date}.png with file system safe names."""
+    symbol = re.sub(r'[^A-Za-z0-9.&_-]+', '_', str(symbol).upper())
+    name = _slug(pattern or 'close')
+    if date is not None:
+        name += f"_{pd.Timestamp(date):%Y-%m-%d}"
+    return os.path.join(directory, symbol, f"{name}.png")
+
+
+class ChartJob:
+    """What a worker needs to draw a chart: plain arrays, cheap to pickle."""
+
+    __slots__ = ('path', 'title', 'dates', 'close', 'minima', 'maxima', 'digest')
+
+    def __init__(self, stock_data: pd.DataFrame, symbol: str, pattern=None, directory: str = PLOT_DIRECTORY):
+        index = stock_data.index
+        self.path = chart_path(symbol, pattern, index[-1] if len(index) else None, directory)
+        self.title = f'{symbol} - {pattern}' if pattern else str(symbol)
+        self.dates = np.asarray(index)
+        self.close = stock_data['Close'].to_numpy(dtype=float)
+        # Extrema marked by find_extrema, when present
+        self.minima = stock_data['min'].to_numpy(dtype=float) if 'min' in stock_data else None
+        self.maxima = stock_data['max'].to_numpy(dtype=float) if 'max' in stock_data else None
+        self.digest = self._digest()
+
+    def _digest(self) -> str:
+        digest = hashlib.sha1(self.title.encode())
+        digest.update(repr((FIGURE_SIZE, DPI)).encode())
+        for values in (self.dates.astype(str), self.close, self.minima, self.maxima):
+            if values is not None:
+                digest.update(np.ascontiguousarray(values).tobytes())
+        return digest.hexdigest()
+
+    @property
+    def digest_path(self) -> str:
+        return self.path + '.sha1'
+
+    def is_current(self) -> bool:
+        """True when the chart on disk was drawn from the same inputs."""
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.digest_path) as file:
+                return file.read().strip() == self.digest
+        except OSError:
+            return False
+
+
+def _get_figure():
+    global _figure
+    if _figure is None:
+        # Figure + Agg canvas directly, no pyplot and no GUI backend
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        _figure = Figure(figsize=FIGURE_SIZE, dpi=DPI)
+        FigureCanvasAgg(_figure)
+    _figure.clear()
+    return _figure
+
+
+def render_chart(job: ChartJob) -> str:
+    """Draw `job` and write it (and its digest) atomically. Returns the chart path."""
+    figure = _get_figure()
+    axes = figure.add_subplot()
+    axes.plot(job.dates, job.close, label='Close Price')
+    if job.minima is not None:
+        axes.scatter(job.dates, job.minima, s=12, color='tab:green', label='Minima')
+    if job.maxima is not None:
+        axes.scatter(job.dates, job.maxima, s=12, color='tab:red', label='Maxima')
+    axes.set_title(job.title)
+    axes.set_xlabel('Date')
+    axes.set_ylabel('Price')
+    axes.legend()
+
+    os.makedirs(os.path.dirname(job.path), exist_ok=True)
+    # Write next to the target and rename, a reader never sees half a chart
+    partial = f"{job.path}.{os.getpid()}.tmp"
+    figure.savefig(partial, format='png')
+    os.replace(partial, job.path)
+    with open(job.digest_path, 'w') as file:
+        file.write(job.digest)
+    figure.clear()
+    return job.path
+
+
+class ChartRenderer:
+    """Queues chart jobs on a process pool; the caller only pays for building the job."""
+
+    def __init__(self, max_workers: int = None, directory: str = PLOT_DIRECTORY):
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self.directory = directory
+        self.futures = []
+        self.skipped = 0
+        self._executor = None
+
+    def submit(self, stock_data: pd.DataFrame, symbol: str, pattern=None):
+        """Queue one chart. Returns its Future, or None when the chart is already up to date."""
+        job = ChartJob(stock_data, symbol, pattern, self.directory)
+        if job.is_current():
+            self.skipped += 1
+            return None
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        future = self._executor.submit(render_chart, job)
+        self.futures.append(future)
+        return future
+
+    def wait(self) -> list:
+        """Wait for the queued charts. Returns the paths written; failures are printed."""
+        paths = []
+        for future in self.futures:
+            try:
+                paths.append(future.result())
+            except Exception as error:
+                print(f"Chart failed: {type(error).__name__}: {error}")
+        self.futures = []
+        return paths
+
+    def close(self) -> list:
+        paths = self.wait()
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        return paths
+
+    def __enter__(self) -> 'ChartRenderer':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -0,0 +1,249 @@
+"""
+One command line for the scripts
+
+    python cli.py trend TITAGARH.NS --period 1y
+    python cli.py scan NSE_large_midcap_250 --period 1y
+    python cli.py vis NSE_small_cap_list NSE_large_midcap_250 --start 2024-06-01 --end 2024-07-20
+    python cli.py movers NSE_large_midcap_250 --windows 1d 5d 1mo
+    python cli.py sectors NSE_large_midcap_250 NSE_small_cap_list --period 1y
+    python cli.py regimes NSE_large_midcap_250 --period 2y --window 20
+    python cli.py levels NSE_large_midcap_250 --near-resistance 2
+    python cli.py watch --config stock_price_thresholds.json
+
+Only argparse is imported up front. Every subcommand imports what it uses when
+it runs, and stock_trend.py itself loads scipy, matplotlib and yfinance only
+inside the functions that need them, so `--help` or a lookup that draws no plot
+doesn't pay for them. `--profile` turns on the stage timings of
+instrumentation.py for the run.
+"""
+
+import os
+import sys
+import argparse
+
+DATA_DIRECTORY = './stock_data/'
+
+
+def cmd_trend(args) -> int:
+    from stock_trend import get_stock_data, get_stock_trend, summarize_support_resistance, \
+        identify_breakout, find_price_patterns
+
+    stock_data = get_stock_data(args.symbol.upper(), period=args.period, interval=args.interval)
+    if stock_data is None:
+        return 1
+    get_stock_trend(stock_data=stock_data, stock_symbol=args.symbol)
+    summarize_support_resistance(stock_data=stock_data, stock_symbol=args.symbol)
+    identify_breakout(stock_data=stock_data)
+    find_price_patterns(stock_data=stock_data, stock_symbol=args.symbol, plot=args.plot)
+    return 0
+
+
+def cmd_scan(args) -> int:
+    from trend_scanner import scan
+
+    results = scan(args.csv_files, period=args.period, interval=args.interval, max_workers=args.workers,
+                   from_1m=args.from_1m, plot=args.plot)
+    print(results.to_string(index=False))
+    os.makedirs(DATA_DIRECTORY, exist_ok=True)
+    results.to_html(f"{DATA_DIRECTORY}{'-'.join(args.csv_files)}trend_scan.html", index=False)
+    return 0
+
+
+def cmd_vis(args) -> int:
+    import pandas as pd
+    from universe import load_universe, to_yahoo
+    from data_provider import load_panel, field_matrix
+    from vis_engine import calculate_vis_panel
+
+    universe = load_universe(args.csv_files)
+    symbols = to_yahoo(universe['Symbol'])
+    panel = load_panel(symbols.tolist(), args.start, args.end)
+    vis_data = calculate_vis_panel(field_matrix(panel, 'Adj Close'))
+
+    volatility_data = pd.DataFrame({
+        'Company Name': universe.get('Company Name', symbols),
+        'VIS': symbols.map(vis_data['VIS']),
+        'Trend': symbols.map(vis_data['Trend']),
+        'Start Date': args.start,
+        'End Date': args.end,
+    }).sort_values(by='VIS')
+    print(volatility_data.to_string(index=False))
+    os.makedirs(DATA_DIRECTORY, exist_ok=True)
+    volatility_data.to_html(f"{DATA_DIRECTORY}{'-'.join(args.csv_files)}volatility_data.html")
+    return 0
+
+
+def cmd_movers(args) -> int:
+    from universe import load_universe, to_yahoo
+    from period_returns import rank_returns, write_report
+
+    universe = load_universe(args.csv_files)
+    report = rank_returns(to_yahoo(universe['Symbol']).tolist(), windows=args.windows,
+                          sort_by=f"{args.sort_by} %" if args.sort_by else None,
+                          ascending=not args.descending)
+    print(report.to_string(index=False))
+    write_report(report, args.output)
+    return 0
+
+
+def cmd_sectors(args) -> int:
+    from sector_analytics import sector_report
+    from period_returns import write_report
+
+    sectors, symbols = sector_report(args.csv_files, period=args.period, windows=args.windows)
+    print(sectors.to_string(index=False))
+    os.makedirs(DATA_DIRECTORY, exist_ok=True)
+    write_report(sectors, args.output or f"{DATA_DIRECTORY}{'-'.join(args.csv_files)}sectors.html")
+    return 0
+
+
+def cmd_regimes(args) -> int:
+    from rolling_vis import RollingVIS
+
+    if args.cached and os.path.exists(args.state):
+        # Ranges and regimes come from the stored sums, no bars are read
+        rolling = RollingVIS.load(args.state)
+    else:
+        from universe import load_universe, to_yahoo
+        from data_provider import load_period_panel, field_matrix
+
+        universe = load_universe(args.csv_files)
+        panel = load_period_panel(to_yahoo(universe['Symbol']).tolist(), args.period)
+        rolling = RollingVIS(field_matrix(panel, 'Adj Close'))
+        rolling.save(args.state)
+    if not len(rolling):
+        return 1
+
+    if args.start or args.end:
+        print(rolling.range(args.start, args.end).sort_values('VIS').to_string())
+    since = args.since or rolling.dates[max(0, len(rolling) - 5)]
+    changes = rolling.regime_changes(args.window, args.long_window, since=since)
+    print(changes.to_string(index=False))
+    os.makedirs(DATA_DIRECTORY, exist_ok=True)
+    changes.to_html(f"{DATA_DIRECTORY}{'-'.join(args.csv_files)}regime_changes.html", index=False)
+    return 0
+
+
+def cmd_levels(args) -> int:
+    from universe import load_universe, to_yahoo
+    from data_provider import load_period_panel
+    from level_index import LevelStore
+
+    symbols = to_yahoo(load_universe(args.csv_files)['Symbol']).tolist()
+    # Stored indexes only take the bars after their last one, unknown symbols are built from the panel
+    store = LevelStore.load(symbols)
+    store.update_panel(load_period_panel(symbols, args.period))
+    store.save()
+    if not len(store):
+        return 1
+
+    if args.near_support is not None:
+        levels = store.near_support(args.near_support)
+    else:
+        levels = store.near_resistance(args.near_resistance)
+    print(levels.to_string(index=False))
+    os.makedirs(DATA_DIRECTORY, exist_ok=True)
+    levels.to_html(f"{DATA_DIRECTORY}{'-'.join(args.csv_files)}levels.html", index=False)
+    return 0
+
+
+def cmd_watch(args) -> int:
+    import asyncio
+    from alert_dispatcher import default_sinks
+    from stock_price_check_play_alarm_async import main as watch
+
+    sinks = default_sinks(sound=None if args.no_sound else args.sound, desktop=args.notify,
+                          webhook=args.webhook, log_path=args.alert_log)
+    try:
+        asyncio.run(watch(config_path=args.config, interval=args.interval, sinks=sinks))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='cli.py', description="Stock trend, scan, VIS, regimes, levels, movers, sectors and price alerts")
+    parser.add_argument('--profile', action='store_true', help='record stage timings (see instrumentation.py)')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    trend = commands.add_parser('trend', help='trend, support/resistance, breakouts and patterns of one symbol')
+    trend.add_argument('symbol')
+    trend.add_argument('--period', default='1y')
+    trend.add_argument('--interval', default='1d')
+    trend.add_argument('--plot', action='store_true', help='save a chart for every pattern found')
+    trend.set_defaults(handler=cmd_trend)
+
+    scan = commands.add_parser('scan', help='rank a CSV universe by trend, breakouts and patterns')
+    scan.add_argument('csv_files', nargs='*', default=["NSE_large_midcap_250"])
+    scan.add_argument('--period', default='1y')
+    scan.add_argument('--interval', default='1d')
+    scan.add_argument('--workers', type=int, default=None)
+    scan.add_argument('--from-1m', action='store_true', help='derive the interval from stored 1m bars')
+    scan.add_argument('--plot', action='store_true', help='save a chart for every pattern found')
+    scan.set_defaults(handler=cmd_scan)
+
+    vis = commands.add_parser('vis', help='Volatility Impact Score of a CSV universe for a date range')
+    vis.add_argument('csv_files', nargs='*', default=["NSE_large_midcap_250"])
+    vis.add_argument('--start', default='2024-06-01')
+    vis.add_argument('--end', default='2024-07-20')
+    vis.set_defaults(handler=cmd_vis)
+
+    movers = commands.add_parser('movers', help='percentage change over several windows')
+    movers.add_argument('csv_files', nargs='*', default=["NSE_large_midcap_250"])
+    movers.add_argument('--windows', nargs='+', default=['1d', '5d', '1mo', '3mo', '1y'])
+    movers.add_argument('--sort-by', default=None)
+    movers.add_argument('--descending', action='store_true')
+    movers.add_argument('--output', default='percentage_changes.html')
+    movers.set_defaults(handler=cmd_movers)
+
+    sectors = commands.add_parser('sectors', help='VIS, trend breadth and returns rolled up by industry')
+    sectors.add_argument('csv_files', nargs='*', default=["NSE_large_midcap_250"])
+    sectors.add_argument('--period', default='1y')
+    sectors.add_argument('--windows', nargs='+', default=['1d', '5d', '1mo', '3mo'])
+    sectors.add_argument('--output', default=None, help='.html, .csv or .parquet')
+    sectors.set_defaults(handler=cmd_sectors)
+
+    regimes = commands.add_parser('regimes', help='rolling VIS and volatility regime changes')
+    regimes.add_argument('csv_files', nargs='*', default=["NSE_large_midcap_250"])
+    regimes.add_argument('--period', default='2y')
+    regimes.add_argument('--window', type=int, default=20)
+    regimes.add_argument('--long-window', type=int, default=120)
+    regimes.add_argument('--since', default=None, help='list regime changes from this date (default: last 5 days)')
+    regimes.add_argument('--start', default=None, help='also print the VIS of start..end')
+    regimes.add_argument('--end', default=None)
+    regimes.add_argument('--state', default='./stock_data/rolling_vis.npz')
+    regimes.add_argument('--cached', action='store_true', help='answer from the saved state, no bars are read')
+    regimes.set_defaults(handler=cmd_regimes)
+
+    levels = commands.add_parser('levels', help='symbols trading close to their nearest resistance or support')
+    levels.add_argument('csv_files', nargs='*', default=["NSE_large_midcap_250"])
+    levels.add_argument('--period', default='1y')
+    side = levels.add_mutually_exclusive_group()
+    side.add_argument('--near-resistance', type=float, default=2.0, metavar='PCT',
+                      help='within PCT%% below the nearest resistance (default 2)')
+    side.add_argument('--near-support', type=float, default=None, metavar='PCT',
+                      help='within PCT%% above the nearest support instead')
+    levels.set_defaults(handler=cmd_levels)
+
+    watch = commands.add_parser('watch', help='poll prices and play an alarm on threshold crossings')
+    watch.add_argument('--config', default='./stock_price_thresholds.json')
+    watch.add_argument('--interval', type=float, default=60)
+    watch.add_argument('--sound', default='./Alarm-Clock-Short-chosic.com_.mp3')
+    watch.add_argument('--no-sound', action='store_true')
+    watch.add_argument('--notify', action='store_true', help='desktop notification for every alert')
+    watch.add_argument('--webhook', default=None, help='POST alerts as JSON to this URL')
+    watch.add_argument('--alert-log', default=None, help='append alerts to this file')
+    watch.set_defaults(handler=cmd_watch)
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.profile:
+        import instrumentation
+        instrumentation.enable()
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
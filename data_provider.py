@@ -0,0 +1,244 @@
+"""
+Data providers for universe scans
+
+Instead of one `yf.download` per ticker, a provider takes the whole symbol list,
+splits it into multi-ticker batches and downloads the batches one after another
+with retries and a rate limit (yf.download keeps its results in module globals,
+so concurrent calls mix up each other's tickers; yfinance threads the tickers of
+one batch itself). Every provider returns a panel: a DataFrame
+indexed by (Symbol, Date) with the usual OHLCV columns.
+
+    panel = YahooProvider().download(symbols, start='2024-06-01', end='2024-07-20')
+    adj_close = field_matrix(panel, 'Adj Close')   # date x symbol
+
+FileProvider reads the same panel from local per-symbol files, so scans can run
+offline and in tests. `load_panel` puts a provider behind the OHLCV store and only
+asks it for the bars that are not stored yet.
+"""
+
+import os
+import time
+import random
+import threading
+from datetime import timedelta
+
+import pandas as pd
+
+from instrumentation import stage, count
+from ohlcv_store import FIELDS, get_engine, normalize_download, write_bars, read_bars, \
+    missing_ranges, record_coverage, non_trading_span, period_range, trim_to_period
+
+
+def empty_panel() -> pd.DataFrame:
+    index = pd.MultiIndex.from_arrays([[], pd.DatetimeIndex([])], names=['Symbol', 'Date'])
+    return pd.DataFrame(columns=list(FIELDS), index=index, dtype=float)
+
+
+def make_panel(frames: dict) -> pd.DataFrame:
+    """Stack {symbol: OHLCV frame} into a (Symbol, Date) panel."""
+    frames = {symbol: normalize_download(df) for symbol, df in frames.items()}
+    frames = {symbol: df for symbol, df in frames.items() if not df.empty}
+    if not frames:
+        return empty_panel()
+    panel = pd.concat(frames, names=['Symbol', 'Date'])
+    return panel.reindex(columns=list(FIELDS))
+
+
+def field_matrix(panel: pd.DataFrame, field: str = 'Adj Close') -> pd.DataFrame:
+    """Wide date x symbol matrix of one field of a panel."""
+    return panel[field].unstack('Symbol').sort_index()
+
+
+def split_panel(panel: pd.DataFrame) -> dict:
+    return {symbol: df.droplevel('Symbol') for symbol, df in panel.groupby(level='Symbol', sort=False)}
+
+
+class RateLimiter:
+    """Allow at most one request every `min_interval` seconds across threads."""
+
+    def __init__(self, min_interval: float):
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next_time = 0.0
+
+    def wait(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next_time - now
+            self._next_time = max(now, self._next_time) + self.min_interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+class YahooProvider:
+    def __init__(self, batch_size: int = 50, max_workers: int = 4, retries: int = 3,
+                 backoff: float = 2.0, min_interval: float = 0.5):
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.retries = retries
+        self.backoff = backoff
+        self.rate_limiter = RateLimiter(min_interval)
+        # Symbols that failed or returned no bars in the last download
+        self.last_failed = set()
+
+    def _download_batch(self, batch, **kwargs) -> dict:
+        import yfinance as yf
+        for attempt in range(self.retries + 1):
+            self.rate_limiter.wait()
+            try:
+                with stage('fetch.yf_download'):
+                    df = yf.download(batch, group_by='ticker', auto_adjust=False, threads=self.max_workers,
+                                     progress=False, **kwargs)
+                break
+            except Exception as error:
+                if attempt == self.retries:
+                    print(f"Giving up on batch {batch[0]}..{batch[-1]}: {error}")
+                    count('fetch.failed_batches')
+                    return None
+                count('fetch.retries')
+                # Exponential backoff with jitter before retrying the batch
+                time.sleep(self.backoff * 2 ** attempt * (1 + random.random()))
+
+        count('fetch.symbols', len(batch))
+        count('fetch.bytes', int(df.memory_usage().sum()))
+        frames = {}
+        for symbol in batch:
+            if isinstance(df.columns, pd.MultiIndex):
+                if symbol not in df.columns.get_level_values(0):
+                    continue
+                symbol_df = df[symbol]
+            else:
+                symbol_df = df
+            symbol_df = symbol_df.dropna(how='all')
+            # yfinance reports a failed ticker as missing or all NaN columns, not as an error
+            if not symbol_df.empty:
+                frames[symbol] = symbol_df
+        return frames
+
+    def download(self, symbols, start=None, end=None, period=None, interval: str = '1d') -> pd.DataFrame:
+        symbols = list(dict.fromkeys(symbols))
+        kwargs = {'interval': interval}
+        if period is not None:
+            kwargs['period'] = period
+        else:
+            kwargs['start'], kwargs['end'] = str(start), str(end)
+
+        batches = [symbols[i:i + self.batch_size] for i in range(0, len(symbols), self.batch_size)]
+        frames = {}
+        self.last_failed = set()
+        for batch in batches:
+            batch_frames = self._download_batch(batch, **kwargs)
+            if batch_frames is None:
+                self.last_failed.update(batch)
+                continue
+            frames.update(batch_frames)
+            # A requested ticker without any rows failed as well
+            empty = [symbol for symbol in batch if symbol not in batch_frames]
+            count('fetch.empty_symbols', len(empty))
+            self.last_failed.update(empty)
+        return make_panel(frames)
+
+
+class FileProvider:
+    """Read bars from `{directory}/{symbol}.csv` (or .parquet) fixture files."""
+
+    def __init__(self, directory: str, file_format: str = 'csv'):
+        self.directory = directory
+        self.file_format = file_format
+
+    def path(self, symbol: str) -> str:
+        return os.path.join(self.directory, f"{symbol}.{self.file_format}")
+
+    def _read(self, symbol: str) -> pd.DataFrame:
+        path = self.path(symbol)
+        if not os.path.exists(path):
+            return pd.DataFrame()
+        with stage('fetch.file'):
+            if self.file_format == 'parquet':
+                df = pd.read_parquet(path)
+            else:
+                df = pd.read_csv(path, index_col=0, parse_dates=True)
+        count('fetch.bytes', os.path.getsize(path))
+        df.index.name = 'Date'
+        return df.sort_index()
+
+    def download(self, symbols, start=None, end=None, period=None, interval: str = '1d') -> pd.DataFrame:
+        if period is not None:
+            start, end = period_range(period)
+        frames = {}
+        for symbol in dict.fromkeys(symbols):
+            df = self._read(symbol)
+            if start is not None and not df.empty:
+                df = df[(df.index >= pd.Timestamp(start)) & (df.index < pd.Timestamp(end))]
+            frames[symbol] = df
+        return make_panel(frames)
+
+
+def save_fixtures(panel: pd.DataFrame, directory: str, file_format: str = 'csv') -> None:
+    """Write a panel as per-symbol files that FileProvider can read back."""
+    os.makedirs(directory, exist_ok=True)
+    provider = FileProvider(directory, file_format)
+    for symbol, df in split_panel(panel).items():
+        if file_format == 'parquet':
+            df.to_parquet(provider.path(symbol))
+        else:
+            df.to_csv(provider.path(symbol))
+
+
+def fetch_missing(symbols, start, end, interval: str = '1d', provider=None, engine=None, max_days: int = None) -> None:
+    """
+    Download into the OHLCV store whatever part of [start, end) is not stored yet.
+    Symbols that miss the same range are downloaded together in one batched provider
+    call, `max_days` splits long ranges for intervals Yahoo limits per request.
+    """
+    provider = provider or YahooProvider()
+    engine = engine or get_engine()
+
+    # Group symbols by the exact range they are missing
+    missing = {}
+    for symbol in dict.fromkeys(symbols):
+        ranges = missing_ranges(symbol, interval, start, end, engine=engine)
+        count('cache.miss' if ranges else 'cache.hit')
+        for missing_start, missing_end in ranges:
+            while missing_start < missing_end:
+                chunk_end = missing_end if max_days is None else min(missing_end, missing_start + timedelta(days=max_days))
+                missing.setdefault((missing_start, chunk_end), []).append(symbol)
+                missing_start = chunk_end
+
+    for (missing_start, missing_end), group in missing.items():
+        # A range without a weekday has no bars to download, mark it like fetch_bars does
+        # (Yahoo would report every ticker as failed for it)
+        if non_trading_span(missing_start, missing_end):
+            for symbol in group:
+                record_coverage(symbol, interval, missing_start, missing_end, engine=engine)
+            continue
+        print(f"Downloading {len(group)} symbols for {missing_start}..{missing_end}...")
+        panel = provider.download(group, start=missing_start, end=missing_end, interval=interval)
+        frames = split_panel(panel)
+        for symbol, df in frames.items():
+            write_bars(symbol, interval, df, engine=engine)
+        # Only symbols that returned bars are marked as downloaded, failed batches and
+        # empty results are asked for again on the next run
+        failed = getattr(provider, 'last_failed', set())
+        for symbol in group:
+            if symbol in frames and symbol not in failed:
+                record_coverage(symbol, interval, missing_start, missing_end, engine=engine)
+
+
+def load_panel(symbols, start, end, interval: str = '1d', provider=None, engine=None) -> pd.DataFrame:
+    """
+    Panel for [start, end) served from the OHLCV store. Symbols that miss the same
+    range are downloaded together in one batched provider call.
+    """
+    engine = engine or get_engine()
+    symbols = list(dict.fromkeys(symbols))
+    fetch_missing(symbols, start, end, interval=interval, provider=provider, engine=engine)
+    return read_bars(symbols, interval, start, end, engine=engine)
+
+
+def load_period_panel(symbols, period: str, interval: str = '1d', provider=None, engine=None) -> pd.DataFrame:
+    start, end = period_range(period)
+    panel = load_panel(symbols, start, end, interval=interval, provider=provider, engine=engine)
+    if panel.empty:
+        return panel
+    return panel.groupby(level='Symbol', group_keys=False).apply(lambda df: trim_to_period(df, period))
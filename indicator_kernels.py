@@ -0,0 +1,207 @@
+"""
+Indicator kernels
+
+Computes the whole calculate_indicators set straight from the OHLCV arrays with
+NumPy, for one symbol (1-D arrays) or a whole universe at once (bars x symbols
+arrays), into one preallocated output block:
+
+    indicators = indicator_arrays(high, low, close, volume)   # name -> array
+    indicators['RSI'][:, j]                                   # RSI of symbol j
+
+The values follow the pandas_ta (0.3.14b) definitions, the same ones
+streaming_indicators.py keeps running state for:
+    SMA / Bollinger Bands : rolling window sums (population std)
+    EMA                   : seeded with the SMA of the first `length` closes, then ewm(adjust=False)
+    RSI / ATR / ADX       : Wilder's smoothing, ewm(alpha=1/length, min_periods=length)
+    MACD signal           : EMA of MACD starting at its first valid value
+    OBV                   : running signed volume, starting at the first volume
+
+The exponential smoothers are linear recursions, so each one is a single
+scipy.signal.lfilter call over all symbols. A symbol with missing bars (NaN
+close in a date x symbol matrix) gets exactly the values it would get from its
+own rows alone: its bars are packed to the top of the column before computing
+and scattered back afterwards.
+"""
+
+import numpy as np
+
+# Same columns (and order) as calculate_indicators adds
+INDICATORS = ['SMA_20', 'SMA_50', 'EMA_20', 'EMA_50', 'MiddleBand', 'UpperBand', 'LowerBand',
+              'RSI', 'MACD', 'Signal_Line', 'ATR', 'OBV', 'Plus_DI', 'Minus_DI', 'ADX', 'Volume_Spike']
+
+
+def _recursion(values: np.ndarray, decay: float, initial=None) -> np.ndarray:
+    """y[t] = values[t] + decay * y[t-1] down every column, starting from y[-1] = initial."""
+    from scipy.signal import lfilter
+
+    state = None if initial is None else (decay * initial)[None, :]
+    if state is None:
+        return lfilter([1.0], [1.0, -decay], values, axis=0)
+    return lfilter([1.0], [1.0, -decay], values, axis=0, zi=state)[0]
+
+
+def _forward_fill(values: np.ndarray, valid: np.ndarray) -> np.ndarray:
+    rows = np.where(valid, np.arange(len(values))[:, None], 0)
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    return np.take_along_axis(values, rows, axis=0)
+
+
+def rolling_sum(values: np.ndarray, length: int) -> np.ndarray:
+    """Sum of the last `length` values, NaN until the window is full."""
+    total = np.cumsum(values, axis=0)
+    result = np.full_like(total, np.nan)
+    if len(values) >= length:
+        result[length - 1] = total[length - 1]
+        result[length:] = total[length:] - total[:-length]
+    return result
+
+
+def sma(values: np.ndarray, length: int) -> np.ndarray:
+    return rolling_sum(values, length) / length
+
+
+def rolling_std(values: np.ndarray, length: int) -> np.ndarray:
+    """Population (ddof=0) standard deviation over the last `length` values."""
+    # Centering on the first value keeps the sum of squares away from cancellation
+    centered = values - values[:1]
+    mean = rolling_sum(centered, length) / length
+    variance = rolling_sum(centered * centered, length) / length - mean * mean
+    std = np.sqrt(np.maximum(variance, 0.0))
+    if length > 1:
+        # A window of one repeated value is exactly 0 as in pandas, the sums leave rounding noise
+        changes = np.zeros(values.shape)
+        changes[1:] = values[1:] != values[:-1]
+        flat = rolling_sum(changes, length - 1) == 0
+        flat[:length - 1] = False
+        std[flat] = 0.0
+    return std
+
+
+def ema(values: np.ndarray, length: int, start: int = 0) -> np.ndarray:
+    """pandas_ta ema of values[start:]: SMA of the first `length` values, then ewm(span=length, adjust=False)."""
+    alpha = 2.0 / (length + 1)
+    result = np.full(values.shape, np.nan)
+    seed_row = start + length - 1
+    if seed_row >= len(values):
+        return result
+    seed = values[start:seed_row + 1].mean(axis=0)
+    result[seed_row] = seed
+    if seed_row + 1 < len(values):
+        result[seed_row + 1:] = _recursion(alpha * values[seed_row + 1:], 1.0 - alpha, initial=seed)
+    return result
+
+
+def rma(values: np.ndarray, length: int) -> np.ndarray:
+    """pandas_ta rma: ewm(alpha=1/length, min_periods=length) with adjust=True, NaN values are gaps."""
+    decay = 1.0 - 1.0 / length
+    valid = ~np.isnan(values)
+    numerator = _recursion(np.where(valid, values, 0.0), decay)
+    denominator = _recursion(valid.astype(float), decay)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result = numerator / denominator
+    # A gap keeps the last value, as pandas does
+    result = _forward_fill(result, valid)
+    result[np.cumsum(valid, axis=0) < length] = np.nan
+    return result
+
+
+def _pack(valid: np.ndarray):
+    """Row order moving every column's valid rows to the top (stable) and the valid row counts."""
+    order = np.argsort(~valid, axis=0, kind='stable')
+    return order, valid.sum(axis=0)
+
+
+def _kernel(high, low, close, volume, out: dict) -> None:
+    out['SMA_20'][:] = sma(close, 20)
+    out['SMA_50'][:] = sma(close, 50)
+    out['EMA_20'][:] = ema(close, 20)
+    out['EMA_50'][:] = ema(close, 50)
+
+    # Bollinger Bands
+    deviation = 2 * rolling_std(close, 20)
+    out['MiddleBand'][:] = out['SMA_20']
+    np.add(out['SMA_20'], deviation, out=out['UpperBand'])
+    np.subtract(out['SMA_20'], deviation, out=out['LowerBand'])
+
+    # RSI
+    change = np.full(close.shape, np.nan)
+    change[1:] = close[1:] - close[:-1]
+    gain = rma(np.where(change > 0, change, np.where(np.isnan(change), np.nan, 0.0)), 14)
+    loss = rma(np.where(change < 0, change, np.where(np.isnan(change), np.nan, 0.0)), 14)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        np.divide(100 * gain, gain + np.abs(loss), out=out['RSI'])
+
+    # MACD, the signal line starts at the first valid MACD value
+    np.subtract(ema(close, 12), ema(close, 26), out=out['MACD'])
+    out['Signal_Line'][:] = ema(out['MACD'], 9, start=25)
+
+    # ATR
+    previous_close = np.full(close.shape, np.nan)
+    previous_close[1:] = close[:-1]
+    with np.errstate(invalid='ignore'):
+        true_range = np.fmax(np.abs(high - low), np.fmax(np.abs(high - previous_close),
+                                                          np.abs(previous_close - low)))
+    true_range[:1] = np.nan
+    out['ATR'][:] = rma(true_range, 14)
+
+    # OBV
+    sign = np.sign(change)
+    sign[:1] = 1
+    np.cumsum(sign * volume, axis=0, out=out['OBV'])
+
+    # ADX, +DI, -DI
+    up_move = np.full(close.shape, np.nan)
+    down_move = np.full(close.shape, np.nan)
+    up_move[1:] = high[1:] - high[:-1]
+    down_move[1:] = low[:-1] - low[1:]
+    with np.errstate(invalid='ignore'):
+        plus_dm = np.where((up_move > down_move) & (up_move > 0), up_move, 0.0)
+        minus_dm = np.where((down_move > up_move) & (down_move > 0), down_move, 0.0)
+    plus_dm[:1] = minus_dm[:1] = np.nan
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scale = 100 / out['ATR']
+        np.multiply(scale, rma(plus_dm, 14), out=out['Plus_DI'])
+        np.multiply(scale, rma(minus_dm, 14), out=out['Minus_DI'])
+        dx = 100 * np.abs(out['Plus_DI'] - out['Minus_DI']) / (out['Plus_DI'] + out['Minus_DI'])
+    out['ADX'][:] = rma(dx, 14)
+
+    # Volume Spike
+    with np.errstate(invalid='ignore'):
+        np.greater(volume, 2 * sma(volume, 20), out=out['Volume_Spike'])
+
+
+def indicator_arrays(high, low, close, volume) -> dict:
+    """
+    Indicator name -> array shaped like `close` (bars, or bars x symbols).
+    Bars where any input is NaN are skipped; their outputs are NaN (False for Volume_Spike).
+    """
+    inputs = [np.asarray(values, dtype=float) for values in (high, low, close, volume)]
+    one_dimensional = inputs[2].ndim == 1
+    if one_dimensional:
+        inputs = [values[:, None] for values in inputs]
+    n, symbols = inputs[2].shape
+
+    # One block for all the float outputs, filled in place by the kernel
+    block = np.full((len(INDICATORS) - 1, n, symbols), np.nan)
+    out = dict(zip(INDICATORS[:-1], block))
+    out['Volume_Spike'] = np.zeros((n, symbols), dtype=bool)
+
+    valid = np.logical_and.reduce([~np.isnan(values) for values in inputs])
+    if n and valid.all():
+        _kernel(*inputs, out)
+    elif n:
+        order, counts = _pack(valid)
+        packed = [np.take_along_axis(values, order, axis=0) for values in inputs]
+        rows = np.arange(n)[:, None] >= counts[None, :]
+        for values in packed:
+            values[rows] = np.nan
+        packed_out = {name: np.empty_like(values) for name, values in out.items()}
+        _kernel(*packed, packed_out)
+        columns = np.broadcast_to(np.arange(symbols), (n, symbols))
+        for name, values in packed_out.items():
+            values[rows] = False if name == 'Volume_Spike' else np.nan
+            out[name][order, columns] = values
+
+    if one_dimensional:
+        return {name: values[:, 0] for name, values in out.items()}
+    return out
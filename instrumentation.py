@@ -0,0 +1,309 @@
+"""
+Stage timing for the scripts
+
+    from instrumentation import stage, count
+
+    with stage('fetch.yf_download'):
+        df = yf.download(...)
+    with stage('scan.symbol', symbol):
+        analyze(symbol)
+    count('cache.hit')
+
+    @timed('indicators')
+    def calculate_indicators(stock_data): ...
+
+Off by default: stage() then returns one shared no-op context manager and
+count() returns right away, so the wrapped code pays a function call and nothing
+else. Turn it on with STOCK_PROFILE=1 (or enable()). The per-stage latency
+histograms (log2 buckets, p50/p90/p99), the slowest symbols per stage, counters
+(cache hits/misses, bytes read) and the wall time are then written as JSON at exit
+to STOCK_PROFILE_OUT (default ./stock_data/profile.json).
+
+STOCK_PROFILE_DUMP=<path> additionally profiles the whole run with cProfile
+(or pyinstrument when the path ends in .html and it is installed).
+
+    STOCK_PROFILE=1 python trend_scanner.py NSE_large_midcap_250
+"""
+
+import os
+import json
+import math
+import time
+import atexit
+import functools
+import threading
+import multiprocessing
+
+DEFAULT_OUTPUT = './stock_data/profile.json'
+BUCKETS = 48  # log2 buckets of microseconds, up to ~9 years
+TOP_SYMBOLS = 10
+
+_enabled = os.environ.get('STOCK_PROFILE', '') not in ('', '0')
+_lock = threading.Lock()
+_started = time.time()
+
+
+class Histogram:
+    __slots__ = ('count', 'total', 'minimum', 'maximum', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.minimum = math.inf
+        self.maximum = 0.0
+        self.buckets = [0] * BUCKETS
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.minimum = min(self.minimum, seconds)
+        self.maximum = max(self.maximum, seconds)
+        micros = seconds * 1e6
+        self.buckets[min(int(math.log2(micros)) + 1 if micros >= 1 else 0, BUCKETS - 1)] += 1
+
+    def merge(self, other: 'Histogram') -> None:
+        self.count += other.count
+        self.total += other.total
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+        self.buckets = [a + b for a, b in zip(self.buckets, other.buckets)]
+
+    def percentile(self, fraction: float) -> float:
+        # Upper bound of the bucket holding the percentile, capped by the largest sample
+        rank = fraction * self.count
+        seen = 0
+        for index, bucket in enumerate(self.buckets):
+            seen += bucket
+            if bucket and seen >= rank:
+                return min(2 ** index / 1e6, self.maximum)
+        return self.maximum
+
+    def summary(self) -> dict:
+        if not self.count:
+            return {'count': 0}
+        return {
+            'count': self.count,
+            'total_s': self.total,
+            'mean_ms': self.total / self.count * 1e3,
+            'min_ms': self.minimum * 1e3,
+            'p50_ms': self.percentile(0.50) * 1e3,
+            'p90_ms': self.percentile(0.90) * 1e3,
+            'p99_ms': self.percentile(0.99) * 1e3,
+            'max_ms': self.maximum * 1e3,
+            'buckets_us': {f"<{2 ** index}": bucket for index, bucket in enumerate(self.buckets) if bucket},
+        }
+
+
+class Metrics:
+    def __init__(self):
+        self.stages = {}     # stage -> Histogram
+        self.symbols = {}    # stage -> {symbol: seconds}
+        self.counters = {}   # name -> number
+
+    def record(self, name: str, seconds: float, symbol=None) -> None:
+        with _lock:
+            histogram = self.stages.get(name)
+            if histogram is None:
+                histogram = self.stages[name] = Histogram()
+            histogram.add(seconds)
+            if symbol is not None:
+                per_symbol = self.symbols.setdefault(name, {})
+                per_symbol[symbol] = per_symbol.get(symbol, 0.0) + seconds
+
+    def count(self, name: str, value=1) -> None:
+        with _lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def merge(self, other: 'Metrics') -> None:
+        with _lock:
+            for name, histogram in other.stages.items():
+                self.stages.setdefault(name, Histogram()).merge(histogram)
+            for name, per_symbol in other.symbols.items():
+                merged = self.symbols.setdefault(name, {})
+                for symbol, seconds in per_symbol.items():
+                    merged[symbol] = merged.get(symbol, 0.0) + seconds
+            for name, value in other.counters.items():
+                self.counters[name] = self.counters.get(name, 0) + value
+
+    def summary(self) -> dict:
+        with _lock:
+            return {
+                'wall_s': time.time() - _started,
+                'stages': {name: histogram.summary() for name, histogram in sorted(self.stages.items())},
+                'slowest_symbols': {
+                    name: dict(sorted(per_symbol.items(), key=lambda item: -item[1])[:TOP_SYMBOLS])
+                    for name, per_symbol in sorted(self.symbols.items())
+                },
+                'counters': dict(sorted(self.counters.items())),
+            }
+
+
+metrics = Metrics()
+
+
+class _Stage:
+    __slots__ = ('name', 'symbol', 'started')
+
+    def __init__(self, name: str, symbol=None):
+        self.name = name
+        self.symbol = symbol
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        metrics.record(self.name, time.perf_counter() - self.started, self.symbol)
+        return False
+
+
+class _NoStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NO_STAGE = _NoStage()
+
+
+def stage(name: str, symbol=None):
+    """Context manager timing one stage (optionally for one symbol)."""
+    if not _enabled:
+        return _NO_STAGE
+    return _Stage(name, symbol)
+
+
+def timed(name: str):
+    """Decorator timing every call of a function as stage `name`."""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return function(*args, **kwargs)
+            with _Stage(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count(name: str, value=1) -> None:
+    """Add to a counter, e.g. count('cache.hit') or count('cache.bytes_read', nbytes)."""
+    if _enabled:
+        metrics.count(name, value)
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def enable() -> None:
+    global _enabled
+    _enabled = True
+    # Worker processes started later read the switch from the environment
+    os.environ['STOCK_PROFILE'] = '1'
+    _register_exit()
+
+
+def disable() -> None:
+    global _enabled
+    _enabled = False
+    os.environ.pop('STOCK_PROFILE', None)
+
+
+def drain() -> Metrics:
+    """Hand over everything recorded so far (used to ship worker-process metrics back)."""
+    global metrics
+    with _lock:
+        drained, metrics = metrics, Metrics()
+    return drained
+
+
+def merge(other: Metrics) -> None:
+    if other is not None:
+        metrics.merge(other)
+
+
+def summary() -> dict:
+    return metrics.summary()
+
+
+def export_json(path: str = None) -> str:
+    path = path or os.environ.get('STOCK_PROFILE_OUT') or DEFAULT_OUTPUT
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w') as file:
+        json.dump(summary(), file, indent=2)
+    return path
+
+
+class Profiler:
+    """Whole-run profile: cProfile stats, or a pyinstrument HTML report for *.html paths."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._profiler = None
+
+    def start(self) -> 'Profiler':
+        if self.path.endswith('.html'):
+            try:
+                from pyinstrument import Profiler as PyinstrumentProfiler
+                self._profiler = PyinstrumentProfiler()
+            except ImportError:
+                print("pyinstrument is not installed, falling back to cProfile")
+                self.path = self.path[:-len('.html')] + '.prof'
+        if self._profiler is None:
+            import cProfile
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        else:
+            self._profiler.start()
+        return self
+
+    def stop(self) -> None:
+        if self._profiler is None:
+            return
+        if self.path.endswith('.html'):
+            self._profiler.stop()
+            with open(self.path, 'w') as file:
+                file.write(self._profiler.output_html())
+        else:
+            self._profiler.disable()
+            self._profiler.dump_stats(self.path)
+        self._profiler = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+        return False
+
+
+def _at_exit(profiler) -> None:
+    if profiler is not None:
+        profiler.stop()
+        print(f"Profile written to {profiler.path}")
+    if _enabled and metrics.stages:
+        print(f"Stage timings written to {export_json()}")
+
+
+_exit_registered = False
+
+
+def _register_exit() -> None:
+    global _exit_registered
+    # Only the main script exports, worker processes hand their metrics back with drain()
+    if _exit_registered or multiprocessing.parent_process() is not None:
+        return
+    _exit_registered = True
+    dump = os.environ.get('STOCK_PROFILE_DUMP')
+    atexit.register(_at_exit, Profiler(dump).start() if dump else None)
+
+
+if _enabled:
+    _register_exit()
@@ -0,0 +1,207 @@
+"""
+Minute bars in, any interval out
+
+Only 1m bars are downloaded and stored (interval '1m' in the OHLCV store). Every
+coarser interval is derived from them on demand:
+
+    5m, 15m, 30m, 1h   bins anchored at the NSE open (09:15, 10:15, ..., 15:15-15:30)
+    1d                 one bar per session
+    1wk                one bar per week, labelled with the Monday like Yahoo
+
+Only bars inside the session (09:15 to 15:30 IST) are used. Open is the first
+open of the bin, High the max, Low the min, Close / Adj Close the last close and
+Volume the sum.
+
+Derived bars are cached in the same store under "<interval>/1m" together with the
+first/last 1m timestamp and the 1m row count they were built from. When new
+minutes arrive only the last bin is rebuilt, anything else (backfilled history)
+rebuilds the symbol.
+
+    ingest(symbols)                                  # last 7 days of 1m bars
+    panel = get_bars(symbols, '15m', start, end)     # (Symbol, Date) panel like read_bars
+
+Yahoo only serves about 30 days of 1m bars and 7 days per request, ingest
+clamps and splits the range accordingly.
+"""
+
+import argparse
+from datetime import date, timedelta
+
+import pandas as pd
+from sqlalchemy import text, bindparam
+
+from data_provider import fetch_missing
+from ohlcv_store import get_engine, read_bars, write_bars
+
+BASE_INTERVAL = '1m'
+
+SESSION_OPEN = pd.Timedelta(hours=9, minutes=15)
+SESSION_CLOSE = pd.Timedelta(hours=15, minutes=30)
+
+INTRADAY_INTERVALS = {
+    '2m': pd.Timedelta(minutes=2),
+    '5m': pd.Timedelta(minutes=5),
+    '15m': pd.Timedelta(minutes=15),
+    '30m': pd.Timedelta(minutes=30),
+    '1h': pd.Timedelta(hours=1),
+}
+INTERVALS = list(INTRADAY_INTERVALS) + ['1d', '1wk']
+
+AGGREGATION = {
+    'Open': 'first',
+    'High': 'max',
+    'Low': 'min',
+    'Close': 'last',
+    'Adj Close': 'last',
+    'Volume': 'sum',
+}
+
+# Yahoo limits for 1m bars
+MAX_HISTORY_DAYS = 29
+MAX_REQUEST_DAYS = 7
+
+
+def derived_interval(interval: str) -> str:
+    return f"{interval}/{BASE_INTERVAL}"
+
+
+def init_resample_state(engine) -> None:
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS ohlcv_resample_state (
+                symbol TEXT NOT NULL,
+                interval TEXT NOT NULL,
+                source_first TEXT NOT NULL,
+                source_last TEXT NOT NULL,
+                source_count INTEGER NOT NULL,
+                PRIMARY KEY (symbol, interval)
+            ) WITHOUT ROWID
+        """))
+
+
+def ingest(symbols, start=None, end=None, provider=None, engine=None) -> None:
+    """Store the 1m bars of [start, end) that are not stored yet (default: the last 7 days)."""
+    today = date.today()
+    end = pd.Timestamp(end or today + timedelta(days=1)).date()
+    start = pd.Timestamp(start or today - timedelta(days=MAX_REQUEST_DAYS)).date()
+    if start < today - timedelta(days=MAX_HISTORY_DAYS):
+        start = today - timedelta(days=MAX_HISTORY_DAYS)
+        print(f"Yahoo only keeps about a month of 1m bars, starting at {start}")
+    fetch_missing(symbols, start, end, interval=BASE_INTERVAL, provider=provider, engine=engine,
+                  max_days=MAX_REQUEST_DAYS)
+
+
+def bin_labels(index: pd.DatetimeIndex, interval: str) -> pd.DatetimeIndex:
+    """Start of the `interval` bin every timestamp falls into."""
+    day = index.normalize()
+    if interval == '1d':
+        return day
+    if interval == '1wk':
+        return day - pd.to_timedelta(index.dayofweek, unit='D')
+    freq = INTRADAY_INTERVALS[interval]
+    return day + SESSION_OPEN + ((index - day - SESSION_OPEN) // freq) * freq
+
+
+def resample_panel(panel: pd.DataFrame, interval: str) -> pd.DataFrame:
+    """Aggregate a (Symbol, Date) panel of 1m bars into `interval` bars within the NSE session."""
+    if interval not in INTERVALS:
+        raise ValueError(f"Unsupported interval: {interval} (expected one of {', '.join(INTERVALS)})")
+    panel = panel.sort_index()
+    dates = pd.DatetimeIndex(panel.index.get_level_values('Date'))
+    time_of_day = dates - dates.normalize()
+    in_session = (time_of_day >= SESSION_OPEN) & (time_of_day < SESSION_CLOSE)
+    panel, dates = panel[in_session], dates[in_session]
+
+    keys = [panel.index.get_level_values('Symbol'), bin_labels(dates, interval).rename('Date')]
+    bars = panel.groupby(keys, sort=True).agg({field: AGGREGATION[field] for field in panel.columns})
+    return bars.dropna(subset=['Close'])
+
+
+def _source_stats(symbols, engine) -> dict:
+    statement = text(
+        "SELECT symbol, MIN(ts), MAX(ts), COUNT(*) FROM ohlcv "
+        "WHERE interval = :interval AND symbol IN :symbols GROUP BY symbol"
+    ).bindparams(bindparam('symbols', expanding=True))
+    with engine.connect() as conn:
+        rows = conn.execute(statement, {'interval': BASE_INTERVAL, 'symbols': list(symbols)}).fetchall()
+    return {symbol: (first, last, count) for symbol, first, last, count in rows}
+
+
+def _saved_states(symbols, interval: str, engine) -> dict:
+    statement = text(
+        "SELECT symbol, source_first, source_last, source_count FROM ohlcv_resample_state "
+        "WHERE interval = :interval AND symbol IN :symbols"
+    ).bindparams(bindparam('symbols', expanding=True))
+    with engine.connect() as conn:
+        rows = conn.execute(statement, {'interval': interval, 'symbols': list(symbols)}).fetchall()
+    return {symbol: (first, last, count) for symbol, first, last, count in rows}
+
+
+def _rebuild(symbol: str, interval: str, source: tuple, engine, since=None) -> None:
+    key = derived_interval(interval)
+    minutes = read_bars([symbol], BASE_INTERVAL, start=since, engine=engine)
+    with engine.begin() as conn:
+        if since is None:
+            conn.execute(text("DELETE FROM ohlcv WHERE symbol = :symbol AND interval = :interval"),
+                         {'symbol': symbol, 'interval': key})
+    bars = resample_panel(minutes, interval)
+    if not bars.empty:
+        write_bars(symbol, key, bars.droplevel('Symbol'), engine=engine)
+    with engine.begin() as conn:
+        conn.execute(text(
+            "INSERT OR REPLACE INTO ohlcv_resample_state (symbol, interval, source_first, source_last, source_count) "
+            "VALUES (:symbol, :interval, :first, :last, :count)"
+        ), {'symbol': symbol, 'interval': interval, 'first': source[0], 'last': source[1], 'count': source[2]})
+
+
+def refresh(symbols, interval: str, engine=None) -> None:
+    """Bring the cached `interval` bars of `symbols` up to date with the stored 1m bars."""
+    engine = engine or get_engine()
+    init_resample_state(engine)
+    symbols = list(dict.fromkeys(symbols))
+    sources = _source_stats(symbols, engine)
+    saved = _saved_states(symbols, interval, engine)
+
+    for symbol, source in sources.items():
+        state = saved.get(symbol)
+        if state == source:
+            continue
+        if state is None or state[0] != source[0] or source[1] < state[1]:
+            _rebuild(symbol, interval, source, engine)
+            continue
+        # Only newer minutes: rebuild from the bin that held the last cached minute
+        last_bin = bin_labels(pd.DatetimeIndex([state[1]]), interval)[0]
+        new_rows = read_bars([symbol], BASE_INTERVAL, start=last_bin, engine=engine)
+        new_rows = new_rows[new_rows.index.get_level_values('Date') > pd.Timestamp(state[1])]
+        if state[2] + len(new_rows) != source[2]:
+            # Minutes were also added before the cached range, start over
+            _rebuild(symbol, interval, source, engine)
+        else:
+            _rebuild(symbol, interval, source, engine, since=last_bin)
+
+
+def get_bars(symbols, interval: str, start=None, end=None, engine=None) -> pd.DataFrame:
+    """(Symbol, Date) panel of `interval` bars derived from the stored 1m bars."""
+    engine = engine or get_engine()
+    if interval == BASE_INTERVAL:
+        return read_bars(list(symbols), BASE_INTERVAL, start, end, engine=engine)
+    refresh(symbols, interval, engine=engine)
+    return read_bars(list(symbols), derived_interval(interval), start, end, engine=engine)
+
+
+if __name__ == "__main__":
+    from universe import load_universe, to_yahoo
+
+    parser = argparse.ArgumentParser(description="Ingest 1m bars and derive coarser intervals from them")
+    parser.add_argument('csv_files', nargs='*', default=["NSE_large_midcap_250"])
+    parser.add_argument('--start', default=None)
+    parser.add_argument('--end', default=None)
+    parser.add_argument('--intervals', nargs='+', default=['5m', '15m', '1h', '1d'])
+    args = parser.parse_args()
+
+    universe = load_universe(args.csv_files)
+    symbols = to_yahoo(universe['Symbol']).tolist()
+    ingest(symbols, start=args.start, end=args.end)
+    for interval in args.intervals:
+        panel = get_bars(symbols, interval, start=args.start, end=args.end)
+        print(f"{interval}: {len(panel)} bars for {panel.index.get_level_values('Symbol').nunique()} symbols")
@@ -0,0 +1,166 @@
+"""
+Resumable universe jobs
+
+A universe run is split into per-symbol tasks that live in the OHLCV store
+(stock_data.db) next to the bars:
+
+    job_tasks    (job_id, symbol, status, reason, updated_at)   status: pending / done / failed
+    job_results  (job_id, symbol, result)                        one JSON row per finished symbol
+
+Symbols are processed in batches. Every batch commits its results and task
+states right away, so an interrupted run (crash, Ctrl-C) resumes with only the
+unfinished symbols. When a batch raises, its symbols are retried one by one, so
+a single bad symbol (empty download, missing column) is marked failed with the
+reason instead of throwing away the whole run.
+
+The job id is built from the job name, its parameters and the day, so a rerun on
+the same day only reads the stored results back.
+
+    runner = JobRunner('volatility', params={'start': start_date, 'end': end_date}, columns=['VIS', 'Trend'])
+    results = runner.run(symbols, compute_batch)   # compute_batch(batch) -> {symbol: {column: value}}
+
+`columns` names the result columns, so a run where every symbol failed still
+returns a frame with them. Failed symbols are retried with retry_failed=True.
+"""
+
+import json
+import hashlib
+from datetime import date, datetime
+
+import pandas as pd
+from sqlalchemy import text, bindparam
+
+from ohlcv_store import get_engine
+
+PENDING, DONE, FAILED = 'pending', 'done', 'failed'
+
+
+def init_jobs(engine) -> None:
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS job_tasks (
+                job_id TEXT NOT NULL,
+                symbol TEXT NOT NULL,
+                status TEXT NOT NULL,
+                reason TEXT,
+                updated_at TEXT,
+                PRIMARY KEY (job_id, symbol)
+            ) WITHOUT ROWID
+        """))
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS job_results (
+                job_id TEXT NOT NULL,
+                symbol TEXT NOT NULL,
+                result TEXT NOT NULL,
+                PRIMARY KEY (job_id, symbol)
+            ) WITHOUT ROWID
+        """))
+
+
+def make_job_id(name: str, params: dict = None, day=None) -> str:
+    key = json.dumps(params or {}, sort_keys=True, default=str)
+    digest = hashlib.sha1(key.encode()).hexdigest()[:10]
+    return f"{name}:{day or date.today()}:{digest}"
+
+
+class JobRunner:
+    def __init__(self, name: str, params: dict = None, engine=None, day=None, columns=None):
+        self.engine = engine or get_engine()
+        init_jobs(self.engine)
+        self.job_id = make_job_id(name, params, day)
+        self.columns = list(columns or [])
+
+    def register(self, symbols) -> None:
+        """Add symbols as pending tasks (already known symbols keep their state)."""
+        now = datetime.now().isoformat(timespec='seconds')
+        with self.engine.begin() as conn:
+            conn.execute(text(
+                "INSERT OR IGNORE INTO job_tasks (job_id, symbol, status, updated_at) "
+                "VALUES (:job_id, :symbol, :status, :now)"
+            ), [{'job_id': self.job_id, 'symbol': symbol, 'status': PENDING, 'now': now} for symbol in symbols])
+
+    def unfinished(self, symbols, retry_failed: bool = False) -> list:
+        statuses = (PENDING, FAILED) if retry_failed else (PENDING,)
+        statement = text(
+            "SELECT symbol FROM job_tasks WHERE job_id = :job_id AND status IN :statuses"
+        ).bindparams(bindparam('statuses', expanding=True))
+        with self.engine.connect() as conn:
+            todo = {row[0] for row in conn.execute(statement, {'job_id': self.job_id, 'statuses': list(statuses)})}
+        return [symbol for symbol in symbols if symbol in todo]
+
+    def _save(self, results: dict, failures: dict) -> None:
+        now = datetime.now().isoformat(timespec='seconds')
+        with self.engine.begin() as conn:
+            if results:
+                conn.execute(text(
+                    "INSERT OR REPLACE INTO job_results (job_id, symbol, result) VALUES (:job_id, :symbol, :result)"
+                ), [{'job_id': self.job_id, 'symbol': symbol, 'result': json.dumps(result, default=str)}
+                    for symbol, result in results.items()])
+            rows = [{'symbol': symbol, 'status': DONE, 'reason': None} for symbol in results]
+            rows += [{'symbol': symbol, 'status': FAILED, 'reason': reason} for symbol, reason in failures.items()]
+            if rows:
+                conn.execute(text(
+                    "UPDATE job_tasks SET status = :status, reason = :reason, updated_at = :now "
+                    "WHERE job_id = :job_id AND symbol = :symbol"
+                ), [dict(row, job_id=self.job_id, now=now) for row in rows])
+
+    def _run_batch(self, batch, compute):
+        # Whole batch first, then one symbol at a time if the batch fails
+        try:
+            output = compute(batch)
+        except Exception as error:
+            if len(batch) == 1:
+                return {}, {batch[0]: f"{type(error).__name__}: {error}"}
+            results, failures = {}, {}
+            for symbol in batch:
+                symbol_results, symbol_failures = self._run_batch([symbol], compute)
+                results.update(symbol_results)
+                failures.update(symbol_failures)
+            return results, failures
+
+        results = {symbol: output[symbol] for symbol in batch if output.get(symbol) is not None}
+        failures = {symbol: "no result" for symbol in batch if symbol not in results}
+        return results, failures
+
+    def run(self, symbols, compute, batch_size: int = 50, retry_failed: bool = False) -> pd.DataFrame:
+        """
+        Run `compute(batch) -> {symbol: {column: value}}` for every unfinished symbol and
+        return the stored results of all `symbols`.
+        """
+        symbols = list(dict.fromkeys(symbols))
+        self.register(symbols)
+        todo = self.unfinished(symbols, retry_failed=retry_failed)
+        if len(todo) < len(symbols):
+            print(f"Resuming {self.job_id}: {len(symbols) - len(todo)} of {len(symbols)} symbols already processed")
+
+        for first in range(0, len(todo), batch_size):
+            batch = todo[first:first + batch_size]
+            results, failures = self._run_batch(batch, compute)
+            self._save(results, failures)
+            for symbol, reason in failures.items():
+                print(f"Failed {symbol}: {reason}")
+        return self.results(symbols)
+
+    def results(self, symbols=None) -> pd.DataFrame:
+        """Stored results indexed by Symbol (in the order of `symbols` when given)."""
+        with self.engine.connect() as conn:
+            rows = conn.execute(text(
+                "SELECT symbol, result FROM job_results WHERE job_id = :job_id"
+            ), {'job_id': self.job_id}).fetchall()
+        results = pd.DataFrame([json.loads(result) for _, result in rows],
+                               index=pd.Index([symbol for symbol, _ in rows], name='Symbol'))
+        # The expected columns are there even when nothing finished
+        missing = [column for column in self.columns if column not in results.columns]
+        if missing:
+            results = results.reindex(columns=list(results.columns) + missing)
+        if symbols is not None:
+            results = results.reindex(list(dict.fromkeys(symbols)))
+        return results
+
+    def status(self) -> pd.DataFrame:
+        """Task state of every symbol: status and failure reason."""
+        with self.engine.connect() as conn:
+            return pd.read_sql(text(
+                "SELECT symbol AS Symbol, status AS Status, reason AS Reason, updated_at AS Updated "
+                "FROM job_tasks WHERE job_id = :job_id"
+            ), conn, params={'job_id': self.job_id}).set_index('Symbol')
@@ -0,0 +1,340 @@
+"""
+Support / resistance level index
+
+summarize_support_resistance used to add seven pivot columns and two swing
+columns to every row only to print the last one. LevelIndex keeps the levels of
+one symbol sorted by price instead:
+
+    swing extrema   closes find_extrema marks as local minima / maxima (`order`
+                    bars on both sides), confirmed once `order` later bars exist
+    clusters        extrema closer than `tolerance` (1%) to each other, merged into
+                    one level at their mean with the touch count as strength
+    recent          Pivot, R1-R3, S1-S3 of the last bar and the 5 bar Swing_High /
+                    Swing_Low (highest high / lowest low of the last 5 bars)
+
+Nearest support (highest level <= price) and resistance (lowest level > price)
+are two bisections, O(log n) per symbol. New bars are added with update(): only
+the last 2 * order + 1 bars are kept to confirm the next extremum, which is
+inserted in place, so the result equals a rebuild from the full history.
+
+    levels = LevelIndex.from_history(stock_data)
+    levels.update(new_bars)                     # Open/High/Low/Close frame, later dates only
+    levels.support(), levels.resistance()       # Level(price, kind, strength)
+
+LevelStore holds one index per symbol, persists them in stock_data.db (table
+level_index, one JSON state per symbol) and answers universe queries:
+
+    store = LevelStore.load(symbols)
+    store.update_panel(panel)                   # build or extend from a (Symbol, Date) panel
+    store.near_resistance(2.0)                  # symbols within 2% below their resistance
+"""
+
+import json
+import bisect
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_ORDER = 5           # find_extrema's default
+DEFAULT_TOLERANCE = 0.01    # extrema within 1% form one cluster
+SWING_WINDOW = 5            # bars behind Swing_High / Swing_Low
+RECENT_KINDS = ('S3', 'S2', 'S1', 'Pivot', 'R1', 'R2', 'R3', 'Swing_Low', 'Swing_High')
+
+
+class Level(NamedTuple):
+    price: float
+    kind: str       # 'min', 'max', 'cluster' or one of RECENT_KINDS
+    strength: int   # extrema merged into the level (1 for single extrema and recent levels)
+
+
+def pivot_levels(high: float, low: float, close: float) -> dict:
+    """Floor pivot point and its three resistance / support levels for one bar."""
+    pivot = (high + low + close) / 3
+    return {
+        'Pivot': pivot,
+        'R1': 2 * pivot - low,
+        'S1': 2 * pivot - high,
+        'R2': pivot + (high - low),
+        'S2': pivot - (high - low),
+        'R3': high + 2 * (pivot - low),
+        'S3': low - 2 * (high - pivot),
+    }
+
+
+class LevelIndex:
+    def __init__(self, order: int = DEFAULT_ORDER, tolerance: float = DEFAULT_TOLERANCE):
+        if order < 1:
+            raise ValueError(f"order must be at least 1, got {order}")
+        self.order = order
+        self.tolerance = tolerance
+        # Confirmed extrema, sorted by price
+        self.prices = []
+        self.kinds = []
+        self.dates = []
+        # Last bars still needed to confirm extrema and compute the recent levels
+        self.tail = []      # [timestamp, high, low, close]
+        self.bars = 0       # bars seen so far (position of tail[0] is bars - len(tail))
+        self._clusters = None
+        self._recent = None
+
+    @classmethod
+    def from_history(cls, stock_data: pd.DataFrame, order: int = DEFAULT_ORDER,
+                     tolerance: float = DEFAULT_TOLERANCE) -> 'LevelIndex':
+        """Index the whole history at once with find_extrema, then continue incrementally."""
+        from stock_trend import find_extrema
+
+        index = cls(order, tolerance)
+        if stock_data is None or stock_data.empty:
+            return index
+        extrema = find_extrema(stock_data[['High', 'Low', 'Close']].copy(), order=order)
+        # The last `order` bars are not confirmed yet, update() decides on them later
+        confirmed = extrema.iloc[:-order]
+        rows = []
+        for kind in ('min', 'max'):
+            marked = confirmed[kind].dropna()
+            rows.extend(zip(marked.to_numpy(dtype=float).tolist(), [kind] * len(marked), _timestamps(marked.index)))
+        rows.sort(key=lambda row: row[0])
+        index.prices = [row[0] for row in rows]
+        index.kinds = [row[1] for row in rows]
+        index.dates = [row[2] for row in rows]
+
+        keep = max(2 * order + 1, SWING_WINDOW)
+        recent = stock_data.iloc[-keep:]
+        index.tail = [list(row) for row in zip(_timestamps(recent.index), *(recent[column].to_numpy(dtype=float).tolist()
+                                                                            for column in ('High', 'Low', 'Close')))]
+        index.bars = len(stock_data)
+        return index
+
+    @property
+    def last_timestamp(self) -> Optional[int]:
+        return self.tail[-1][0] if self.tail else None
+
+    @property
+    def last_close(self) -> float:
+        return self.tail[-1][3] if self.tail else float('nan')
+
+    def __len__(self) -> int:
+        return len(self.prices)
+
+    def _insert(self, price: float, kind: str, timestamp: int) -> None:
+        position = bisect.bisect_right(self.prices, price)
+        self.prices.insert(position, price)
+        self.kinds.insert(position, kind)
+        self.dates.insert(position, timestamp)
+        self._clusters = None
+
+    def _confirm(self) -> None:
+        """Check the bar `order` bars back, it now has its full window (clipped at the start of history)."""
+        order = self.order
+        position = self.bars - 1 - order      # absolute position of the candidate
+        if position < 0:
+            return
+        first = self.bars - len(self.tail)
+        closes = [bar[3] for bar in self.tail[max(0, position - order - first):position + order + 1 - first]]
+        timestamp, _, _, close = self.tail[position - first]
+        # Same comparisons as argrelextrema(np.less_equal / np.greater_equal)
+        if all(close <= other for other in closes):
+            self._insert(close, 'min', timestamp)
+        if all(close >= other for other in closes):
+            self._insert(close, 'max', timestamp)
+
+    def update(self, stock_data: pd.DataFrame) -> int:
+        """Add the bars after the last indexed one. Returns the bars added."""
+        last = self.last_timestamp
+        timestamps = _timestamps(stock_data.index)
+        high, low, close = (stock_data[column].to_numpy(dtype=float).tolist() for column in ('High', 'Low', 'Close'))
+        keep = max(2 * self.order + 1, SWING_WINDOW)
+        added = 0
+        for timestamp, bar_high, bar_low, bar_close in zip(timestamps, high, low, close):
+            if last is not None and timestamp <= last:
+                continue
+            self.tail.append([timestamp, bar_high, bar_low, bar_close])
+            self.bars += 1
+            self._confirm()
+            if len(self.tail) > keep:
+                del self.tail[0]
+            last = timestamp
+            added += 1
+        if added:
+            self._recent = None
+        return added
+
+    def clusters(self) -> list:
+        """Levels where extrema within `tolerance` of each other meet, sorted by price."""
+        if self._clusters is None:
+            clusters = []
+            start = 0
+            for end in range(1, len(self.prices) + 1):
+                if end == len(self.prices) or self.prices[end] - self.prices[end - 1] > self.tolerance * self.prices[end - 1]:
+                    if end - start > 1:
+                        clusters.append(Level(float(np.mean(self.prices[start:end])), 'cluster', end - start))
+                    start = end
+            self._clusters = clusters
+        return self._clusters
+
+    def recent(self) -> list:
+        """Pivot and swing levels of the last bar, sorted by price."""
+        if self._recent is None:
+            if not self.tail:
+                return []
+            _, high, low, close = self.tail[-1]
+            values = pivot_levels(high, low, close)
+            swing = self.tail[-SWING_WINDOW:]
+            values['Swing_High'] = max(bar[1] for bar in swing)
+            values['Swing_Low'] = min(bar[2] for bar in swing)
+            self._recent = sorted((Level(float(price), kind, 1) for kind, price in values.items()))
+        return self._recent
+
+    def _candidates(self, price: float, below: bool, kinds=None) -> list:
+        """Nearest level of `kinds` on one side from each of the sorted lists (one bisection each)."""
+        found = []
+        position = bisect.bisect_right(self.prices, price)
+        step = -1 if below else 1
+        position = position - 1 if below else position
+        # Walk past levels of other kinds, usually none or a few
+        while 0 <= position < len(self.prices) and kinds is not None and self.kinds[position] not in kinds:
+            position += step
+        if 0 <= position < len(self.prices):
+            found.append(Level(self.prices[position], self.kinds[position], 1))
+        for levels in (self.clusters(), self.recent()):
+            if kinds is not None:
+                levels = [level for level in levels if level.kind in kinds]
+            position = bisect.bisect_right(levels, price, key=lambda level: level.price)
+            if below and position:
+                found.append(levels[position - 1])
+            elif not below and position < len(levels):
+                found.append(levels[position])
+        return found
+
+    def support(self, price: float = None, kinds=None) -> Optional[Level]:
+        """Highest level at or below `price` (default the last close)."""
+        price = self.last_close if price is None else price
+        return max(self._candidates(price, True, kinds), key=lambda level: (level.price, level.strength), default=None)
+
+    def resistance(self, price: float = None, kinds=None) -> Optional[Level]:
+        """Lowest level above `price` (default the last close)."""
+        price = self.last_close if price is None else price
+        return min(self._candidates(price, False, kinds), key=lambda level: (level.price, -level.strength), default=None)
+
+    def levels(self) -> pd.DataFrame:
+        """Every level, sorted by price."""
+        rows = [Level(price, kind, 1) for price, kind in zip(self.prices, self.kinds)]
+        rows += self.clusters() + self.recent()
+        return pd.DataFrame(sorted(rows), columns=Level._fields)
+
+    def to_state(self) -> dict:
+        return {'order': self.order, 'tolerance': self.tolerance, 'prices': self.prices, 'kinds': self.kinds,
+                'dates': self.dates, 'tail': self.tail, 'bars': self.bars}
+
+    @classmethod
+    def from_state(cls, state: dict) -> 'LevelIndex':
+        index = cls(state['order'], state['tolerance'])
+        index.prices, index.kinds, index.dates = state['prices'], state['kinds'], state['dates']
+        index.tail, index.bars = state['tail'], state['bars']
+        return index
+
+
+def _timestamps(index) -> list:
+    """Epoch seconds of a DatetimeIndex (JSON friendly and cheap to compare)."""
+    return pd.DatetimeIndex(index).as_unit('s').asi8.tolist()
+
+
+def init_levels(engine) -> None:
+    from sqlalchemy import text
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS level_index (
+                symbol TEXT PRIMARY KEY,
+                state TEXT NOT NULL,
+                updated_at TEXT
+            ) WITHOUT ROWID
+        """))
+
+
+class LevelStore:
+    def __init__(self, indexes: dict = None, order: int = DEFAULT_ORDER, tolerance: float = DEFAULT_TOLERANCE):
+        self.indexes = indexes or {}
+        self.order = order
+        self.tolerance = tolerance
+
+    def __getitem__(self, symbol: str) -> LevelIndex:
+        return self.indexes[symbol]
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self.indexes
+
+    def __len__(self) -> int:
+        return len(self.indexes)
+
+    def update(self, symbol: str, stock_data: pd.DataFrame) -> LevelIndex:
+        """Extend the symbol's index with the new bars (built from them when it is unknown)."""
+        index = self.indexes.get(symbol)
+        if index is None:
+            index = self.indexes[symbol] = LevelIndex.from_history(stock_data, self.order, self.tolerance)
+        else:
+            index.update(stock_data)
+        return index
+
+    def update_panel(self, panel: pd.DataFrame) -> None:
+        from data_provider import split_panel
+        for symbol, stock_data in split_panel(panel).items():
+            self.update(symbol, stock_data)
+
+    def _nearest(self, pct: float, prices: dict, side: str) -> pd.DataFrame:
+        rows = []
+        for symbol, index in self.indexes.items():
+            price = index.last_close if prices is None else prices.get(symbol)
+            if price is None or price != price:
+                continue
+            level = index.resistance(price) if side == 'resistance' else index.support(price)
+            if level is None:
+                continue
+            distance = abs(level.price - price) / price * 100
+            if distance <= pct:
+                rows.append((symbol, price, level.price, level.kind, level.strength, distance))
+        columns = ['Symbol', 'Price', 'Level', 'Kind', 'Strength', 'Distance %']
+        return pd.DataFrame(rows, columns=columns).sort_values('Distance %', ignore_index=True)
+
+    def near_resistance(self, pct: float = 2.0, prices: dict = None) -> pd.DataFrame:
+        """Symbols whose price (default last close) is within `pct`% below their nearest resistance."""
+        return self._nearest(pct, prices, 'resistance')
+
+    def near_support(self, pct: float = 2.0, prices: dict = None) -> pd.DataFrame:
+        """Symbols whose price is within `pct`% above their nearest support."""
+        return self._nearest(pct, prices, 'support')
+
+    def save(self, engine=None) -> None:
+        from sqlalchemy import text
+        from ohlcv_store import get_engine
+        engine = engine or get_engine()
+        init_levels(engine)
+        now = datetime.now().isoformat(timespec='seconds')
+        with engine.begin() as conn:
+            conn.execute(text("INSERT OR REPLACE INTO level_index (symbol, state, updated_at) "
+                              "VALUES (:symbol, :state, :now)"),
+                         [{'symbol': symbol, 'state': json.dumps(index.to_state()), 'now': now}
+                          for symbol, index in self.indexes.items()])
+
+    @classmethod
+    def load(cls, symbols=None, engine=None, order: int = DEFAULT_ORDER,
+             tolerance: float = DEFAULT_TOLERANCE) -> 'LevelStore':
+        """Stored indexes (of `symbols`, default all). Indexes built with other settings are left out."""
+        from sqlalchemy import text, bindparam
+        from ohlcv_store import get_engine
+        engine = engine or get_engine()
+        init_levels(engine)
+        with engine.connect() as conn:
+            if symbols is None:
+                rows = conn.execute(text("SELECT symbol, state FROM level_index")).fetchall()
+            else:
+                statement = text("SELECT symbol, state FROM level_index WHERE symbol IN :symbols") \
+                    .bindparams(bindparam('symbols', expanding=True))
+                rows = conn.execute(statement, {'symbols': list(symbols)}).fetchall() if len(symbols) else []
+        indexes = {}
+        for symbol, state in rows:
+            state = json.loads(state)
+            if state['order'] == order and state['tolerance'] == tolerance:
+                indexes[symbol] = LevelIndex.from_state(state)
+        return cls(indexes, order, tolerance)
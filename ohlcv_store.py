@@ -0,0 +1,276 @@
+"""
+Shared OHLCV store
+
+The scripts used to cache every yfinance download in its own SQLite table
+(`{symbol}_{start}_{end}` or `{symbol}_{today}_{period}`), which leaves tens of
+thousands of tables in stock_data.db and downloads overlapping ranges again.
+
+Here every bar lives in one `ohlcv` table keyed by (symbol, interval, ts). The
+primary key is the composite index, so a date-range read for any number of
+symbols is a single indexed query. A small `ohlcv_coverage` table remembers
+which [start, end) ranges were already downloaded, so only the missing part of
+a request goes to Yahoo. A range is only recorded once bars came back for it (or
+it holds no weekday at all, or it is a few past weekdays between stored ranges,
+i.e. exchange holidays), so a failed or empty download is retried.
+"""
+
+import pandas as pd
+from sqlalchemy import create_engine, text, bindparam
+from datetime import date, datetime, timedelta
+
+from instrumentation import stage, count
+
+DB_URL = 'sqlite:///stock_data.db'
+
+# yfinance column name -> store column name
+FIELDS = {
+    'Open': 'open',
+    'High': 'high',
+    'Low': 'low',
+    'Close': 'close',
+    'Adj Close': 'adj_close',
+    'Volume': 'volume',
+}
+
+# Longest run of weekday exchange holidays an empty download between stored ranges is taken for
+MAX_HOLIDAY_WEEKDAYS = 3
+
+# Calendar days spanned by the yfinance period strings used in the scripts
+PERIOD_DAYS = {
+    '1d': 5, '5d': 10, '1mo': 31, '3mo': 92, '6mo': 183,
+    '1y': 366, '2y': 731, '5y': 1827, '10y': 3653,
+}
+
+_engines = {}
+
+
+def get_engine(db_url: str = DB_URL):
+    engine = _engines.get(db_url)
+    if engine is None:
+        engine = create_engine(db_url)
+        init_store(engine)
+        _engines[db_url] = engine
+    return engine
+
+
+def init_store(engine) -> None:
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS ohlcv (
+                symbol TEXT NOT NULL,
+                interval TEXT NOT NULL,
+                ts TEXT NOT NULL,
+                open REAL, high REAL, low REAL, close REAL, adj_close REAL, volume REAL,
+                PRIMARY KEY (symbol, interval, ts)
+            ) WITHOUT ROWID
+        """))
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS ohlcv_coverage (
+                symbol TEXT NOT NULL,
+                interval TEXT NOT NULL,
+                start_date TEXT NOT NULL,
+                end_date TEXT NOT NULL
+            )
+        """))
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ohlcv_coverage_idx ON ohlcv_coverage (symbol, interval)"
+        ))
+
+
+def to_date(value) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return pd.Timestamp(value).date()
+
+
+def normalize_download(df: pd.DataFrame) -> pd.DataFrame:
+    """Bring a single-ticker yfinance frame to flat FIELDS columns and a naive index."""
+    if df is None or df.empty:
+        return pd.DataFrame(columns=list(FIELDS))
+    if isinstance(df.columns, pd.MultiIndex):
+        # Newer yfinance returns (Price, Ticker) columns even for one ticker
+        df = df.droplevel(-1, axis=1)
+    df = df.copy()
+    if 'Adj Close' not in df.columns and 'Close' in df.columns:
+        df['Adj Close'] = df['Close']
+    if getattr(df.index, 'tz', None) is not None:
+        df.index = df.index.tz_localize(None)
+    df.index.name = 'Date'
+    return df[[field for field in FIELDS if field in df.columns]]
+
+
+def write_bars(symbol: str, interval: str, df: pd.DataFrame, engine=None) -> int:
+    engine = engine or get_engine()
+    df = normalize_download(df)
+    if df.empty:
+        return 0
+    ts = pd.DatetimeIndex(df.index).strftime('%Y-%m-%d %H:%M:%S')
+    rows = []
+    for i, stamp in enumerate(ts):
+        row = {'symbol': symbol, 'interval': interval, 'ts': stamp}
+        for field, column in FIELDS.items():
+            value = df[field].iat[i] if field in df.columns else None
+            row[column] = None if pd.isna(value) else float(value)
+        rows.append(row)
+    with stage('cache.write_sql'), engine.begin() as conn:
+        conn.execute(text("""
+            INSERT OR REPLACE INTO ohlcv (symbol, interval, ts, open, high, low, close, adj_close, volume)
+            VALUES (:symbol, :interval, :ts, :open, :high, :low, :close, :adj_close, :volume)
+        """), rows)
+    return len(rows)
+
+
+def read_bars(symbols, interval: str = '1d', start=None, end=None, engine=None) -> pd.DataFrame:
+    """
+    Read bars for one symbol (indexed by Date) or a list of symbols
+    (indexed by Symbol, Date) in one query. `end` is exclusive like yfinance.
+    """
+    engine = engine or get_engine()
+    single = isinstance(symbols, str)
+    symbol_list = [symbols] if single else list(symbols)
+
+    query = "SELECT * FROM ohlcv WHERE interval = :interval AND symbol IN :symbols"
+    params = {'interval': interval, 'symbols': symbol_list}
+    if start is not None:
+        query += " AND ts >= :start"
+        params['start'] = str(to_date(start))
+    if end is not None:
+        query += " AND ts < :end"
+        params['end'] = str(to_date(end))
+    query += " ORDER BY symbol, ts"
+    statement = text(query).bindparams(bindparam('symbols', expanding=True))
+
+    with stage('cache.read_sql'), engine.connect() as conn:
+        df = pd.read_sql(statement, conn, params=params)
+    count('cache.rows_read', len(df))
+    count('cache.bytes_read', int(df.memory_usage(deep=True).sum()))
+
+    df = df.rename(columns={column: field for field, column in FIELDS.items()})
+    df['Date'] = pd.to_datetime(df['ts'])
+    df = df.rename(columns={'symbol': 'Symbol'})
+    if single:
+        return df.set_index('Date')[list(FIELDS)]
+    return df.set_index(['Symbol', 'Date'])[list(FIELDS)]
+
+
+def merge_ranges(ranges):
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def subtract_ranges(covered, start, end):
+    """Sub-ranges of [start, end) not inside the merged `covered` ranges."""
+    missing = []
+    cursor = start
+    for covered_start, covered_end in covered:
+        if covered_end <= cursor:
+            continue
+        if covered_start >= end:
+            break
+        if covered_start > cursor:
+            missing.append((cursor, covered_start))
+        cursor = max(cursor, covered_end)
+    if cursor < end:
+        missing.append((cursor, end))
+    return missing
+
+
+def coverage_end(end) -> date:
+    # Today's session is still moving, coverage stops before today (exclusive end)
+    # so every run downloads the current session's bars again.
+    return min(to_date(end), date.today())
+
+
+def non_trading_span(start, end) -> bool:
+    """True when [start, end) holds no weekday, an empty download there is expected."""
+    return len(pd.bdate_range(to_date(start), to_date(end) - timedelta(days=1))) == 0
+
+
+def holiday_gap(covered, start, end) -> bool:
+    """
+    True when stored ranges end at `start` and resume at `end` with at most
+    MAX_HOLIDAY_WEEKDAYS weekdays in between. Bars after the gap were already
+    downloaded, so an empty download of those past weekdays means exchange holidays.
+    """
+    start, end = to_date(start), to_date(end)
+    weekdays = len(pd.bdate_range(start, end - timedelta(days=1)))
+    return weekdays <= MAX_HOLIDAY_WEEKDAYS and any(covered_end == start for _, covered_end in covered) \
+        and any(covered_start == end for covered_start, _ in covered)
+
+
+def _covered_ranges(conn, symbol: str, interval: str):
+    rows = conn.execute(text(
+        "SELECT start_date, end_date FROM ohlcv_coverage WHERE symbol = :symbol AND interval = :interval"
+    ), {'symbol': symbol, 'interval': interval}).fetchall()
+    return merge_ranges((to_date(start), to_date(end)) for start, end in rows)
+
+
+def missing_ranges(symbol: str, interval: str, start, end, engine=None):
+    """Sub-ranges of [start, end) that were never downloaded for this symbol."""
+    engine = engine or get_engine()
+    with engine.connect() as conn:
+        covered = _covered_ranges(conn, symbol, interval)
+    return subtract_ranges(covered, to_date(start), to_date(end))
+
+
+def record_coverage(symbol: str, interval: str, start, end, engine=None) -> None:
+    engine = engine or get_engine()
+    end = coverage_end(end)
+    start = to_date(start)
+    if start >= end:
+        return
+    with engine.begin() as conn:
+        ranges = merge_ranges(_covered_ranges(conn, symbol, interval) + [(start, end)])
+        conn.execute(text(
+            "DELETE FROM ohlcv_coverage WHERE symbol = :symbol AND interval = :interval"
+        ), {'symbol': symbol, 'interval': interval})
+        conn.execute(text(
+            "INSERT INTO ohlcv_coverage (symbol, interval, start_date, end_date) "
+            "VALUES (:symbol, :interval, :start, :end)"
+        ), [{'symbol': symbol, 'interval': interval, 'start': str(s), 'end': str(e)} for s, e in ranges])
+
+
+def yf_download(symbol: str, start, end, interval: str = '1d') -> pd.DataFrame:
+    import yfinance as yf
+    return yf.download(symbol, start=str(start), end=str(end), interval=interval, progress=False)
+
+
+def fetch_bars(symbol: str, start, end, interval: str = '1d', download=yf_download, engine=None) -> pd.DataFrame:
+    """Return bars for [start, end), downloading only the ranges not stored yet."""
+    engine = engine or get_engine()
+    with engine.connect() as conn:
+        covered = _covered_ranges(conn, symbol, interval)
+    for missing_start, missing_end in subtract_ranges(covered, to_date(start), to_date(end)):
+        print(f"Fetching {symbol} {missing_start}..{missing_end} from Yahoo Finance...")
+        rows = write_bars(symbol, interval, download(symbol, missing_start, missing_end, interval), engine=engine)
+        # yfinance returns an empty frame on errors, only mark the range when bars came back
+        # or when no bars are expected (weekends, holidays between stored ranges)
+        if rows or non_trading_span(missing_start, missing_end) or holiday_gap(covered, missing_start, missing_end):
+            record_coverage(symbol, interval, missing_start, missing_end, engine=engine)
+    return read_bars(symbol, interval, start, end, engine=engine)
+
+
+def period_range(period: str, today=None):
+    """Translate a yfinance period string ("5d", "1mo", ...) into a [start, end) date range."""
+    today = to_date(today or date.today())
+    return today - timedelta(days=PERIOD_DAYS[period]), today + timedelta(days=1)
+
+
+def trim_to_period(df: pd.DataFrame, period: str) -> pd.DataFrame:
+    # "Nd" periods count trading days in yfinance, keep the last N bars
+    if period.endswith('d') and not df.empty:
+        return df.tail(int(period[:-1]))
+    return df
+
+
+def fetch_period(symbol: str, period: str, interval: str = '1d', download=yf_download, engine=None) -> pd.DataFrame:
+    start, end = period_range(period)
+    stock_data = fetch_bars(symbol, start, end, interval=interval, download=download, engine=engine)
+    return trim_to_period(stock_data, period)
@@ -0,0 +1,152 @@
+"""
+Columnar bar cache
+
+One partitioned Parquet dataset per interval under ./stock_data/parquet/:
+
+    stock_data/parquet/1d/symbol=SBIN.NS/bars.parquet
+    stock_data/parquet/1d/_coverage.json
+
+Dates are stored as timestamps (no string round trip like the per-symbol CSV
+files), and reads go through pyarrow.dataset on a memory-mapped filesystem: the
+symbol filter prunes partitions, the date filter is pushed down to the row groups
+and only the requested columns are read. Loading the Adj Close of 500 symbols for
+a window is a single dataset scan.
+
+    prices = read_matrix(symbols, 'Adj Close', start='2024-06-01', end='2024-07-20')
+"""
+
+import os
+import json
+from urllib.parse import quote
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from pyarrow.fs import LocalFileSystem
+
+from instrumentation import stage, count
+from ohlcv_store import FIELDS, normalize_download, merge_ranges, subtract_ranges, coverage_end, to_date
+
+CACHE_DIR = './stock_data/parquet/'
+
+PARTITIONING = ds.partitioning(pa.schema([('symbol', pa.string())]), flavor='hive')
+
+
+def dataset_dir(interval: str = '1d', root: str = CACHE_DIR) -> str:
+    return os.path.join(root, interval)
+
+
+def _symbol_path(symbol: str, interval: str, root: str) -> str:
+    return os.path.join(dataset_dir(interval, root), f"symbol={quote(symbol, safe='')}", 'bars.parquet')
+
+
+def _coverage_path(interval: str, root: str) -> str:
+    return os.path.join(dataset_dir(interval, root), '_coverage.json')
+
+
+def _load_coverage(interval: str, root: str) -> dict:
+    path = _coverage_path(interval, root)
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as file:
+        raw = json.load(file)
+    return {symbol: [(to_date(start), to_date(end)) for start, end in ranges] for symbol, ranges in raw.items()}
+
+
+def _save_coverage(coverage: dict, interval: str, root: str) -> None:
+    path = _coverage_path(interval, root)
+    with open(path + '.tmp', 'w') as file:
+        json.dump({symbol: [[str(start), str(end)] for start, end in ranges]
+                   for symbol, ranges in coverage.items()}, file)
+    os.replace(path + '.tmp', path)
+
+
+def write_bars(symbol: str, df: pd.DataFrame, interval: str = '1d', root: str = CACHE_DIR) -> None:
+    """Merge `df` into the symbol's partition (new bars win over cached ones)."""
+    df = normalize_download(df)
+    if df.empty:
+        return
+    path = _symbol_path(symbol, interval, root)
+    if os.path.exists(path):
+        cached = pd.read_parquet(path).set_index('Date')
+        df = pd.concat([cached, df])
+        df = df[~df.index.duplicated(keep='last')]
+    df = df.sort_index().reindex(columns=list(FIELDS)).astype('float64')
+    df.index = pd.DatetimeIndex(df.index, name='Date')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with stage('cache.parquet_write', symbol):
+        pq.write_table(pa.Table.from_pandas(df.reset_index(), preserve_index=False), path)
+
+
+def write_panel(panel: pd.DataFrame, interval: str = '1d', root: str = CACHE_DIR,
+                start=None, end=None, symbols=None) -> None:
+    """
+    Write a (Symbol, Date) panel. With start/end the range is recorded as downloaded
+    for `symbols` (default: the panel's symbols), including those that had no bars.
+    """
+    for symbol, df in panel.groupby(level='Symbol', sort=False):
+        write_bars(symbol, df.droplevel('Symbol'), interval=interval, root=root)
+    if start is None:
+        return
+
+    start, end = to_date(start), coverage_end(end)
+    if start >= end:
+        return
+    if symbols is None:
+        symbols = panel.index.get_level_values('Symbol').unique()
+    os.makedirs(dataset_dir(interval, root), exist_ok=True)
+    coverage = _load_coverage(interval, root)
+    for symbol in symbols:
+        coverage[symbol] = merge_ranges(coverage.get(symbol, []) + [(start, end)])
+    _save_coverage(coverage, interval, root)
+
+
+def missing_symbols(symbols, start, end, interval: str = '1d', root: str = CACHE_DIR) -> list:
+    """Symbols whose cached bars don't fully cover [start, end)."""
+    coverage = _load_coverage(interval, root)
+    start, end = to_date(start), to_date(end)
+    missing = [symbol for symbol in symbols if subtract_ranges(coverage.get(symbol, []), start, end)]
+    count('cache.miss', len(missing))
+    count('cache.hit', len(symbols) - len(missing))
+    return missing
+
+
+def read_panel(symbols=None, start=None, end=None, columns=None, interval: str = '1d',
+               root: str = CACHE_DIR) -> pd.DataFrame:
+    """(Symbol, Date) panel of `columns` for [start, end) in one memory-mapped dataset scan."""
+    columns = list(columns or FIELDS)
+    path = dataset_dir(interval, root)
+    if not os.path.isdir(path):
+        return pd.DataFrame(columns=columns, index=pd.MultiIndex.from_arrays([[], []], names=['Symbol', 'Date']))
+
+    dataset = ds.dataset(path, format='parquet', partitioning=PARTITIONING,
+                         filesystem=LocalFileSystem(use_mmap=True), exclude_invalid_files=True)
+    condition = None
+    if symbols is not None:
+        condition = ds.field('symbol').isin(list(symbols))
+    if start is not None:
+        condition = _and(condition, ds.field('Date') >= pd.Timestamp(start))
+    if end is not None:
+        condition = _and(condition, ds.field('Date') < pd.Timestamp(end))
+
+    with stage('cache.parquet_read'):
+        table = dataset.to_table(columns=['symbol', 'Date'] + columns, filter=condition)
+    count('cache.rows_read', table.num_rows)
+    count('cache.bytes_read', table.nbytes)
+    df = table.to_pandas().rename(columns={'symbol': 'Symbol'})
+    return df.set_index(['Symbol', 'Date']).sort_index()
+
+
+def _and(condition, other):
+    return other if condition is None else condition & other
+
+
+def read_matrix(symbols=None, field: str = 'Adj Close', start=None, end=None, interval: str = '1d',
+                root: str = CACHE_DIR) -> pd.DataFrame:
+    """Wide date x symbol matrix of one field (only that column is read from disk)."""
+    panel = read_panel(symbols, start, end, columns=[field], interval=interval, root=root)
+    matrix = panel[field].unstack('Symbol')
+    if symbols is not None:
+        matrix = matrix.reindex(columns=list(symbols))
+    return matrix
@@ -0,0 +1,188 @@
+"""
+Vectorized chart patterns
+
+find_extrema / detect_triangle / detect_rectangle in stock_trend.py look at one
+symbol and only compare the first and last extrema. This engine works on a whole
+(bars x symbols) close matrix at once:
+
+1. Swing points: a bar is a swing low/high when it is the min/max of the
+   `order` bars on each side (same rule as find_extrema's argrelextrema).
+2. Trendlines: least-squares lines through the swing highs and through the swing
+   lows of every sliding window. The fits come from prefix sums of the swing
+   points, so each window costs O(1) and the whole scan is O(bars x symbols).
+3. Classification per window, on the slopes normalized to the fractional price
+   change across the window:
+     Rectangle             both lines flat
+     Ascending Triangle    flat resistance, rising support
+     Descending Triangle   falling resistance, flat support
+     Symmetrical Triangle  falling resistance, rising support
+     Bull/Bear Flag        narrow parallel channel right after a sharp move (the pole)
+     Pennant               narrow converging lines right after a sharp move
+
+Fit quality is 1 - (RMSE of both lines) / (channel height), clipped to [0, 1].
+
+    runs = scan_patterns(field_matrix(panel, 'Close'))
+    latest = latest_patterns(runs, last_date)
+"""
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from instrumentation import timed
+
+PATTERNS = ['', 'Rectangle', 'Ascending Triangle', 'Descending Triangle', 'Symmetrical Triangle',
+            'Bull Flag', 'Bear Flag', 'Pennant']
+PATTERN_CODES = {name: code for code, name in enumerate(PATTERNS)}
+
+
+def swing_points(close: np.ndarray, order: int = 5):
+    """Boolean (bars x symbols) masks of swing lows and swing highs."""
+    bars = close.shape[0]
+    size = 2 * order + 1
+    padded_low = np.pad(close, ((order, order), (0, 0)), constant_values=np.inf)
+    padded_high = np.pad(close, ((order, order), (0, 0)), constant_values=-np.inf)
+    rolling_min = sliding_window_view(padded_low, size, axis=0).min(axis=-1)[:bars]
+    rolling_max = sliding_window_view(padded_high, size, axis=0).max(axis=-1)[:bars]
+    return close <= rolling_min, close >= rolling_max
+
+
+def _window_sums(values: np.ndarray, window: int) -> np.ndarray:
+    # Sum over the `window` bars ending at every bar (NaN until a full window exists)
+    sums = np.full(values.shape, np.nan)
+    if values.shape[0] < window:
+        return sums
+    cumulative = np.cumsum(values, axis=0)
+    sums[window - 1] = cumulative[window - 1]
+    sums[window:] = cumulative[window:] - cumulative[:-window]
+    return sums
+
+
+def fit_lines(close: np.ndarray, mask: np.ndarray, window: int):
+    """
+    Least-squares line through the masked points of every window ending at each bar.
+    Returns slope (price per bar), value at the window's last bar, RMSE and point count.
+    """
+    x = np.arange(close.shape[0], dtype=float)[:, None]
+    y = np.where(mask, close, 0.0)
+    weight = mask.astype(float)
+    n = _window_sums(weight, window)
+    sx = _window_sums(weight * x, window)
+    sy = _window_sums(y, window)
+    sxx = _window_sums(weight * x * x, window)
+    sxy = _window_sums(y * x, window)
+    syy = _window_sums(y * y, window)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        var_x = sxx - sx * sx / n
+        cov_xy = sxy - sx * sy / n
+        var_y = syy - sy * sy / n
+        slope = np.where(n >= 2, cov_xy / var_x, np.nan)
+        intercept = (sy - slope * sx) / n
+        rmse = np.sqrt(np.maximum(var_y - slope * cov_xy, 0.0) / n)
+    end_value = intercept + slope * x
+    return slope, end_value, rmse, n
+
+
+def classify_windows(close: np.ndarray, window: int = 60, flag_window: int = 15, order: int = 5,
+                     flag_order: int = 2, flat_tolerance: float = 0.03, pole_bars: int = 15,
+                     pole_move: float = 0.10):
+    """Pattern code and fit quality for the window ending at every bar of every symbol."""
+    close = np.asarray(close, dtype=float)
+    codes = np.zeros(close.shape, dtype=np.int8)
+    quality = np.full(close.shape, np.nan)
+
+    def normalized_fit(size, swing_order):
+        lows, highs = swing_points(close, order=swing_order)
+        high_slope, high_end, high_rmse, high_n = fit_lines(close, highs, size)
+        low_slope, low_end, low_rmse, low_n = fit_lines(close, lows, size)
+        mean_price = _window_sums(np.nan_to_num(close), size) / size
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # Fractional move of each line across the window
+            high_move = high_slope * size / mean_price
+            low_move = low_slope * size / mean_price
+            # Channel height at the middle of the window
+            height = (high_end - low_end) - (high_slope - low_slope) * (size - 1) / 2
+            fit = np.clip(1 - (high_rmse + low_rmse) / height, 0.0, 1.0)
+        valid = (high_n >= 2) & (low_n >= 2) & (height > 0)
+        return high_move, low_move, height / mean_price, fit, valid
+
+    # Triangles and rectangles over the long window
+    high_move, low_move, _, fit, valid = normalized_fit(window, order)
+    flat_high = np.abs(high_move) < flat_tolerance
+    flat_low = np.abs(low_move) < flat_tolerance
+    falling_high = high_move <= -flat_tolerance
+    rising_low = low_move >= flat_tolerance
+    for name, condition in (
+            ('Symmetrical Triangle', falling_high & rising_low),
+            ('Descending Triangle', falling_high & flat_low),
+            ('Ascending Triangle', flat_high & rising_low),
+            ('Rectangle', flat_high & flat_low)):
+        hit = valid & condition
+        codes[hit] = PATTERN_CODES[name]
+        quality[hit] = fit[hit]
+
+    # Flags and pennants: a short, narrow consolidation right after a sharp move
+    high_move, low_move, height, fit, valid = normalized_fit(flag_window, flag_order)
+    pole = np.full(close.shape, np.nan)
+    start = flag_window + pole_bars - 1
+    if len(close) > start:
+        # Pole: from `pole_bars` before the flag to the flag's first bar
+        with np.errstate(divide='ignore', invalid='ignore'):
+            pole[start:] = close[pole_bars:len(close) - flag_window + 1] / close[:len(close) - start] - 1
+    valid &= height < np.abs(pole) / 2
+    parallel = np.abs(high_move - low_move) < flat_tolerance
+    converging = (high_move <= -flat_tolerance / 2) & (low_move >= flat_tolerance / 2)
+    for name, condition in (
+            ('Pennant', (np.abs(pole) >= pole_move) & converging),
+            ('Bull Flag', (pole >= pole_move) & parallel & (high_move < flat_tolerance)),
+            ('Bear Flag', (pole <= -pole_move) & parallel & (low_move > -flat_tolerance))):
+        hit = valid & condition
+        codes[hit] = PATTERN_CODES[name]
+        quality[hit] = fit[hit]
+
+    return codes, quality
+
+
+@timed('patterns.vectorized')
+def scan_patterns(close: pd.DataFrame, window: int = 60, flag_window: int = 15, **kwargs) -> pd.DataFrame:
+    """
+    Runs of consecutive windows with the same pattern, one row per run:
+    Symbol, Pattern, Start (first window start), End (last window end), Quality (best fit).
+    """
+    codes, quality = classify_windows(close.to_numpy(dtype=float), window=window,
+                                      flag_window=flag_window, **kwargs)
+    dates = close.index
+    symbols = np.asarray(close.columns)
+    bars = codes.shape[0]
+
+    # A run starts where the code changes (or a new symbol begins) and ends before the next one
+    changed = np.vstack([np.ones((1, codes.shape[1]), dtype=bool), codes[1:] != codes[:-1]])
+    run_symbol, run_first = np.nonzero(changed.T)
+    flat_first = run_symbol * bars + run_first
+    run_last = np.append(flat_first[1:], codes.size) - 1 - run_symbol * bars
+    run_code = codes[run_first, run_symbol]
+
+    # Best fit quality inside every run, runs are contiguous in the symbol-major flattening
+    best = np.maximum.reduceat(np.nan_to_num(quality.T.ravel(), nan=-np.inf), flat_first)
+    best = np.where(np.isfinite(best), best, np.nan)
+
+    keep = run_code != 0
+    run_symbol, run_first, run_last, run_code, best = (
+        run_symbol[keep], run_first[keep], run_last[keep], run_code[keep], best[keep])
+
+    size = np.where(np.isin(run_code, [PATTERN_CODES['Bull Flag'], PATTERN_CODES['Bear Flag'],
+                                       PATTERN_CODES['Pennant']]), flag_window, window)
+    return pd.DataFrame({
+        'Symbol': symbols[run_symbol],
+        'Pattern': np.asarray(PATTERNS, dtype=object)[run_code],
+        'Start': dates[np.maximum(run_first - size + 1, 0)],
+        'End': dates[run_last],
+        'Quality': best,
+    })
+
+
+def latest_patterns(runs: pd.DataFrame, last_date) -> pd.DataFrame:
+    """Patterns still in progress at `last_date`, one row per symbol (best fit first)."""
+    current = runs[runs['End'] == pd.Timestamp(last_date)]
+    return current.sort_values('Quality', ascending=False).drop_duplicates('Symbol').reset_index(drop=True)
@@ -0,0 +1,203 @@
+"""
+Percentage change ranking over many windows at once
+
+The history for the longest requested window is loaded once for the whole
+universe (from the OHLCV store, downloading only what is missing), then the
+change for every window is a vectorized offset lookup on the stacked bars:
+
+    "5d", "20d"         change over the last N bars (trading days)
+    "1mo", "3mo", "1y"  change since the last close on or before the same day N months/years ago
+    "15m", "1h"         intraday: change since the last bar at or before N minutes/hours
+                        before the latest bar (from `intraday_interval` bars)
+
+The result has one "<window> %" column per window and can be written as HTML
+(click a header to sort), CSV or Parquet.
+
+    python period_returns.py NSE_large_midcap_250 --windows 1d 5d 1mo 3mo 1y 1h --output movers.html
+"""
+
+import os
+import re
+import argparse
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from data_provider import load_panel, load_period_panel
+from instrumentation import timed
+
+DEFAULT_WINDOWS = ['1d', '5d', '1mo', '3mo', '1y']
+
+WINDOW_PATTERN = re.compile(r'^(\d+)(d|wk|mo|y|m|h)$')
+INTRADAY_UNITS = {'m': 'minutes', 'h': 'hours'}
+
+# Seconds fit in 33 bits until 2242, the symbol code goes in the bits above
+_SYMBOL_SHIFT = 33
+
+
+def parse_window(window: str):
+    match = WINDOW_PATTERN.match(window)
+    if not match:
+        raise ValueError(f"Invalid window: {window!r} (expected e.g. 5d, 1wk, 3mo, 1y, 15m, 1h)")
+    return int(match.group(1)), match.group(2)
+
+
+def is_intraday(window: str) -> bool:
+    return parse_window(window)[1] in INTRADAY_UNITS
+
+
+def window_offset(window: str):
+    """Bar count for "Nd" windows, a time offset for all others."""
+    count, unit = parse_window(window)
+    if unit == 'd':
+        return count
+    if unit == 'wk':
+        return pd.DateOffset(weeks=count)
+    if unit == 'mo':
+        return pd.DateOffset(months=count)
+    if unit == 'y':
+        return pd.DateOffset(years=count)
+    return pd.Timedelta(**{INTRADAY_UNITS[unit]: count})
+
+
+def history_days(windows) -> int:
+    """Calendar days of daily history needed to cover the longest window."""
+    days = 0
+    for window in windows:
+        count, unit = parse_window(window)
+        if unit == 'd':
+            # N bars back, with room for weekends and exchange holidays
+            needed = (count + 1) * 7 // 5 + 10
+        elif unit in INTRADAY_UNITS:
+            continue
+        else:
+            needed = {'wk': 7, 'mo': 31, 'y': 366}[unit] * count + 7
+        days = max(days, needed)
+    return days
+
+
+def _stacked(panel: pd.DataFrame, field: str):
+    # Bars of all symbols back to back, sorted by (symbol, time), with a combined int64 key
+    series = panel[field].dropna().sort_index()
+    codes, symbols = pd.factorize(series.index.get_level_values('Symbol'), sort=True)
+    seconds = pd.DatetimeIndex(series.index.get_level_values('Date')).as_unit('s').asi8
+    keys = (codes.astype(np.int64) << _SYMBOL_SHIFT) | seconds
+    group_start = np.searchsorted(codes, np.arange(len(symbols)), side='left')
+    group_end = np.searchsorted(codes, np.arange(len(symbols)), side='right') - 1
+    return series.to_numpy(dtype=float), keys, seconds, symbols, group_start, group_end
+
+
+@timed('compute.returns')
+def window_returns(panel: pd.DataFrame, windows, field: str = 'Close') -> pd.DataFrame:
+    """
+    Percentage change of `field` for every window, one row per symbol of the panel
+    with its last date and last value.
+    """
+    values, keys, seconds, symbols, group_start, group_end = _stacked(panel, field)
+    result = pd.DataFrame(index=pd.Index(symbols, name='Symbol'))
+    if not len(symbols):
+        return result
+    last_value = values[group_end]
+    last_time = pd.DatetimeIndex(pd.to_datetime(seconds[group_end], unit='s'))
+    result['Last Date'] = last_time
+    result[field] = last_value
+
+    for window in windows:
+        offset = window_offset(window)
+        if isinstance(offset, int):
+            base = group_end - offset
+        else:
+            target = (last_time - offset).as_unit('s').asi8
+            target_keys = (np.arange(len(symbols), dtype=np.int64) << _SYMBOL_SHIFT) | target
+            base = np.searchsorted(keys, target_keys, side='right') - 1
+        found = base >= group_start
+        base_value = values[np.where(found, base, group_end)]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            change = (last_value / base_value - 1) * 100
+        result[f"{window} %"] = np.where(found, change, np.nan)
+    return result
+
+
+def rank_returns(symbols, windows=None, field: str = 'Close', intraday_interval: str = '5m',
+                 intraday_period: str = '5d', sort_by: str = None, ascending: bool = True,
+                 provider=None, engine=None, today=None) -> pd.DataFrame:
+    """Load the longest needed history once and rank `symbols` on every window."""
+    windows = list(windows or DEFAULT_WINDOWS)
+    daily = [window for window in windows if not is_intraday(window)]
+    intraday = [window for window in windows if is_intraday(window)]
+
+    result = pd.DataFrame(index=pd.Index(list(dict.fromkeys(symbols)), name='Symbol'))
+    if daily:
+        today = today or date.today()
+        start = today - timedelta(days=history_days(daily))
+        panel = load_panel(symbols, start, today + timedelta(days=1), provider=provider, engine=engine)
+        result = result.join(window_returns(panel, daily, field=field))
+    if intraday:
+        panel = load_period_panel(symbols, intraday_period, interval=intraday_interval,
+                                  provider=provider, engine=engine)
+        intraday_result = window_returns(panel, intraday, field=field).drop(columns=[field])
+        result = result.join(intraday_result.rename(columns={'Last Date': 'Last Bar'}))
+
+    sort_by = sort_by or f"{windows[0]} %"
+    return result.reset_index().sort_values(sort_by, ascending=ascending, na_position='last', kind='stable').reset_index(drop=True)
+
+
+SORTABLE_SCRIPT = """
+<script>
+document.querySelectorAll('table.sortable th').forEach(function (th, column) {
+  th.style.cursor = 'pointer';
+  th.addEventListener('click', function () {
+    var body = th.closest('table').tBodies[0];
+    var ascending = th.dataset.order !== 'asc';
+    th.dataset.order = ascending ? 'asc' : 'desc';
+    var value = function (row) {
+      var text = row.cells[column].innerText;
+      var number = parseFloat(text);
+      return isNaN(number) ? text : number;
+    };
+    Array.from(body.rows).sort(function (a, b) {
+      var x = value(a), y = value(b);
+      return (x > y ? 1 : x < y ? -1 : 0) * (ascending ? 1 : -1);
+    }).forEach(function (row) { body.appendChild(row); });
+  });
+});
+</script>
+"""
+
+
+@timed('report.write')
+def write_report(report: pd.DataFrame, path: str) -> None:
+    """Write the ranking as .html (sortable by clicking a header), .csv or .parquet."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.html', '.htm'):
+        html = report.to_html(index=False, float_format='{:.2f}'.format, classes='sortable')
+        with open(path, 'w') as file:
+            file.write(html + SORTABLE_SCRIPT)
+    elif extension == '.csv':
+        report.to_csv(path, index=False)
+    elif extension == '.parquet':
+        report.to_parquet(path, index=False)
+    else:
+        raise ValueError(f"Unsupported report format: {path}")
+
+
+if __name__ == "__main__":
+    from universe import load_universe, to_yahoo
+
+    parser = argparse.ArgumentParser(description="Rank a CSV universe by percentage change over several windows")
+    parser.add_argument('csv_files', nargs='*', default=["NSE_large_midcap_250"])
+    parser.add_argument('--windows', nargs='+', default=DEFAULT_WINDOWS)
+    parser.add_argument('--sort-by', default=None, help='window to sort on (default: the first one)')
+    parser.add_argument('--descending', action='store_true')
+    parser.add_argument('--intraday-interval', default='5m')
+    parser.add_argument('--output', default='percentage_changes.html', help='.html, .csv or .parquet')
+    args = parser.parse_args()
+
+    universe = load_universe(args.csv_files)
+    report = rank_returns(to_yahoo(universe['Symbol']).tolist(), windows=args.windows,
+                          intraday_interval=args.intraday_interval,
+                          sort_by=f"{args.sort_by} %" if args.sort_by else None,
+                          ascending=not args.descending)
+    print(report.to_string(index=False))
+    write_report(report, args.output)
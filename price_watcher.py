@@ -0,0 +1,258 @@
+"""
+Price watcher service
+
+Polls prices for many tickers with one scheduler instead of one executor job
+(and one Yahoo request) per ticker:
+
+- every ticker has its own jittered due time, so polls spread over the interval,
+- all tickers due in a cycle are fetched together in one batched quote request
+  (or a few, `batch_size` tickers each), one after another in a single worker
+  thread: yf.download keeps its results in module globals and mixes up the
+  tickers of concurrent calls,
+- tickers whose quote fails back off exponentially up to `max_backoff`,
+- the quote source is pluggable: YahooQuoteSource for live prices,
+  SimulatedQuoteSource for a local random-walk feed (thousands of tickers),
+- with `buffers` (ring_buffer.RingBuffers) the watcher keeps the recent bars of
+  every ticker and asks the source only for bars newer than the ones it holds
+  (fetch_bars), the price is the last close in the ring.
+
+    watcher = PriceWatcher(YahooQuoteSource(), on_price=print)
+    watcher.set_tickers(["RVNL.NS", "TATAPOWER.NS"])
+    asyncio.run(watcher.run())
+
+    watcher = PriceWatcher(YahooQuoteSource(), on_price=print, buffers=RingBuffers())
+    watcher.buffers["RVNL.NS"].vwap()
+"""
+
+import time
+import random
+import asyncio
+import inspect
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import stage, count
+from ring_buffer import FIELDS as BAR_FIELDS
+
+
+class YahooQuoteSource:
+    """Last 15m close of every requested ticker from one multi-ticker download."""
+
+    def __init__(self, period: str = "1d", interval: str = "15m"):
+        self.period = period
+        self.interval = interval
+
+    def _download(self, tickers, start=None):
+        import yfinance as yf
+        with stage('fetch.quotes'):
+            if start is None:
+                df = yf.download(tickers, period=self.period, interval=self.interval, group_by='ticker',
+                                 threads=False, progress=False)
+            else:
+                df = yf.download(tickers, start=start, interval=self.interval, group_by='ticker',
+                                 threads=False, progress=False)
+        count('fetch.symbols', len(tickers))
+        for ticker in tickers:
+            if isinstance(df.columns, pd.MultiIndex):
+                if ticker not in df.columns.get_level_values(0):
+                    continue
+                frame = df[ticker]
+            else:
+                frame = df
+            frame = frame.dropna(subset=['Close'])
+            if not frame.empty:
+                yield ticker, frame
+
+    def fetch(self, tickers) -> dict:
+        return {ticker: float(frame['Close'].iloc[-1]) for ticker, frame in self._download(list(tickers))}
+
+    def fetch_bars(self, tickers, since=None) -> dict:
+        """
+        ticker -> (epoch seconds, (n, 5) Open/High/Low/Close/Volume) of the bars from `since`
+        (ticker -> last timestamp held) on; the whole period when a ticker has no bars yet.
+        """
+        tickers = list(tickers)
+        starts = [(since or {}).get(ticker) for ticker in tickers]
+        start = None
+        if starts and all(start is not None for start in starts):
+            # From the oldest last bar, which may still have been forming
+            start = pd.Timestamp(min(starts), unit='s', tz='UTC')
+        bars = {}
+        for ticker, frame in self._download(tickers, start=start):
+            values = frame[list(BAR_FIELDS)].to_numpy(dtype=float)
+            values[:, -1] = np.nan_to_num(values[:, -1])
+            bars[ticker] = (frame.index.as_unit('s').asi8, values)
+        return bars
+
+
+class SimulatedQuoteSource:
+    """Local random-walk feed. `failure_rate` drops quotes to exercise the backoff."""
+
+    def __init__(self, start_price: float = 100.0, volatility: float = 0.002,
+                 failure_rate: float = 0.0, seed: int = None, bar_seconds: int = 60, start_time: int = None):
+        self.start_price = start_price
+        self.volatility = volatility
+        self.failure_rate = failure_rate
+        self.rng = np.random.default_rng(seed)
+        self.prices = {}
+        self.requests = 0
+        self.bar_seconds = bar_seconds
+        self.start_time = int(time.time()) // bar_seconds * bar_seconds if start_time is None else start_time
+
+    def fetch(self, tickers) -> dict:
+        self.requests += 1
+        tickers = list(tickers)
+        steps = np.exp(self.rng.normal(0.0, self.volatility, len(tickers)))
+        dropped = self.rng.random(len(tickers)) < self.failure_rate
+        quotes = {}
+        for ticker, step, drop in zip(tickers, steps, dropped):
+            price = self.prices.get(ticker, self.start_price) * step
+            self.prices[ticker] = price
+            if not drop:
+                quotes[ticker] = price
+        return quotes
+
+    def fetch_bars(self, tickers, since=None) -> dict:
+        """One new bar per ticker and request, opening at the previous price."""
+        tickers = list(tickers)
+        previous = {ticker: self.prices.get(ticker, self.start_price) for ticker in tickers}
+        quotes = self.fetch(tickers)
+        timestamp = np.array([self.start_time + self.requests * self.bar_seconds])
+        volumes = self.rng.lognormal(10, 1, len(quotes))
+        bars = {}
+        for (ticker, close), volume in zip(quotes.items(), volumes):
+            open_ = previous[ticker]
+            bars[ticker] = (timestamp, np.array([[open_, max(open_, close), min(open_, close), close, volume]]))
+        return bars
+
+
+class TickerSchedule:
+    __slots__ = ('next_due', 'failures')
+
+    def __init__(self, next_due: float):
+        self.next_due = next_due
+        self.failures = 0
+
+
+class PriceWatcher:
+    def __init__(self, source, on_price, interval: float = 60.0, jitter: float = 0.1,
+                 batch_size: int = 200, max_backoff: float = 900.0,
+                 tick: float = 1.0, clock=time.monotonic, buffers=None):
+        if buffers is not None and not hasattr(source, 'fetch_bars'):
+            raise ValueError(f"{type(source).__name__} has no fetch_bars, it can't fill the ring buffers")
+        self.source = source
+        self.buffers = buffers
+        self.on_price = on_price
+        self.interval = interval
+        self.jitter = jitter
+        self.batch_size = batch_size
+        self.max_backoff = max_backoff
+        self.tick = tick
+        self.clock = clock
+        # One worker, a cycle's batches run one after another in a single job
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.schedules = {}
+        self.requests = 0
+        # Tickers whose ring got new or refreshed bars in the last cycle
+        self.updated = set()
+
+    def _jittered(self, delay: float) -> float:
+        return delay * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def set_tickers(self, tickers) -> None:
+        """Add new tickers (spread over the interval) and drop removed ones, keeping the rest."""
+        tickers = set(tickers)
+        now = self.clock()
+        for ticker in list(self.schedules):
+            if ticker not in tickers:
+                del self.schedules[ticker]
+        if self.buffers is not None:
+            self.buffers.retain(tickers)
+        for ticker in tickers:
+            if ticker not in self.schedules:
+                self.schedules[ticker] = TickerSchedule(now + random.uniform(0, self.interval * self.jitter))
+
+    def due_tickers(self, now: float) -> list:
+        return [ticker for ticker, schedule in self.schedules.items() if schedule.next_due <= now]
+
+    def _backoff(self, ticker: str, now: float) -> None:
+        schedule = self.schedules[ticker]
+        schedule.failures += 1
+        delay = min(self.interval * 2 ** schedule.failures, self.max_backoff)
+        schedule.next_due = now + self._jittered(delay)
+
+    def _fetch_batches(self, requests) -> list:
+        """Runs in the worker thread: one source request per (batch, since), in order."""
+        results = []
+        for batch, since in requests:
+            try:
+                if since is None:
+                    results.append(self.source.fetch(batch))
+                else:
+                    results.append(self.source.fetch_bars(batch, since))
+            except Exception as error:
+                results.append(error)
+        return results
+
+    def _append_bars(self, bars) -> dict:
+        # New bars go to the rings, the price is the last close held
+        quotes = {}
+        for ticker, (timestamps, values) in bars.items():
+            if self.buffers.extend(ticker, timestamps, values):
+                self.updated.add(ticker)
+            quotes[ticker] = self.buffers[ticker].last_close()
+        return quotes
+
+    async def run_cycle(self) -> int:
+        """Fetch every due ticker in batched requests and hand the prices to on_price."""
+        now = self.clock()
+        due = self.due_tickers(now)
+        self.updated = set()
+        if not due:
+            return 0
+
+        batches = [due[i:i + self.batch_size] for i in range(0, len(due), self.batch_size)]
+        # With ring buffers ask only for the bars after the ones already held
+        requests = [(batch, None if self.buffers is None else
+                     {ticker: self.buffers[ticker].last_timestamp for ticker in batch if ticker in self.buffers})
+                    for batch in batches]
+        self.requests += len(requests)
+        loop = asyncio.get_running_loop()
+        results = await loop.run_in_executor(self.executor, self._fetch_batches, requests)
+
+        now = self.clock()
+        for batch, quotes in zip(batches, results):
+            if isinstance(quotes, Exception):
+                print(f"Quote request for {len(batch)} tickers failed: {quotes}")
+                quotes = {}
+            elif self.buffers is not None:
+                quotes = self._append_bars(quotes)
+            for ticker in batch:
+                if ticker not in self.schedules:
+                    continue
+                price = quotes.get(ticker)
+                if price is None:
+                    self._backoff(ticker, now)
+                    continue
+                schedule = self.schedules[ticker]
+                schedule.failures = 0
+                schedule.next_due = now + self._jittered(self.interval)
+                result = self.on_price(ticker, price)
+                if inspect.isawaitable(result):
+                    await result
+        return len(due)
+
+    def seconds_until_due(self) -> float:
+        if not self.schedules:
+            return self.tick
+        next_due = min(schedule.next_due for schedule in self.schedules.values())
+        return min(max(next_due - self.clock(), 0.0), self.tick)
+
+    async def run(self, cycles: int = None) -> None:
+        cycle = 0
+        while cycles is None or cycle < cycles:
+            await self.run_cycle()
+            await asyncio.sleep(self.seconds_until_due())
+            cycle += 1
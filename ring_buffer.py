@@ -0,0 +1,203 @@
+"""
+Fixed-capacity bar history for the live watchers
+
+BarRing keeps the last `capacity` bars of one ticker (timestamps plus OHLCV) in
+preallocated NumPy arrays. Every bar is written twice, at `i` and at
+`i + capacity`, so the latest bars are always one contiguous slice: window()
+and the indicators read views into the buffer and never copy or concatenate.
+Memory is fixed at creation, 2 x capacity x 48 bytes per ticker (about 19 KB
+for the default 200 bars), however long the process runs.
+
+    ring = BarRing(200)
+    ring.extend(timestamps, bars)      # bars: (n, 5) Open, High, Low, Close, Volume
+    ring.close()[-20:]                 # view of the last 20 closes
+    ring.vwap(), ring.rsi(14), ring.ema_cross(9, 21)
+
+Only bars newer than the last one are appended; a bar with the same timestamp
+as the last one replaces it (the still-forming bar of a live feed).
+RingBuffers holds one BarRing per ticker for PriceWatcher.
+"""
+
+import numpy as np
+
+from indicator_kernels import ema, rma
+
+FIELDS = ('Open', 'High', 'Low', 'Close', 'Volume')
+OPEN, HIGH, LOW, CLOSE, VOLUME = range(len(FIELDS))
+DEFAULT_CAPACITY = 200
+SESSION_OFFSET = 19800  # seconds east of UTC (IST), sessions start on the local date
+
+
+class BarRing:
+    __slots__ = ('capacity', 'timestamps', 'data', 'head', 'size')
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.timestamps = np.zeros(2 * capacity, dtype=np.int64)  # epoch seconds
+        self.data = np.full((len(FIELDS), 2 * capacity), np.nan)
+        self.head = 0   # next write position in [0, capacity)
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def nbytes(self) -> int:
+        return self.timestamps.nbytes + self.data.nbytes
+
+    @property
+    def last_timestamp(self):
+        return int(self.timestamps[self.head + self.capacity - 1]) if self.size else None
+
+    def _write(self, position: int, timestamp: int, bar) -> None:
+        self.timestamps[position] = self.timestamps[position + self.capacity] = timestamp
+        self.data[:, position] = self.data[:, position + self.capacity] = bar
+
+    def append(self, timestamp: int, bar) -> bool:
+        """Add one bar (Open, High, Low, Close, Volume). Returns False for a bar older than the last one."""
+        last = self.last_timestamp
+        if last is not None and timestamp < last:
+            return False
+        if last is not None and timestamp == last:
+            self._write((self.head - 1) % self.capacity, timestamp, bar)
+            return True
+        self._write(self.head, timestamp, bar)
+        self.head = (self.head + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+        return True
+
+    def extend(self, timestamps, bars) -> int:
+        """
+        Add the bars (ascending timestamps) newer than the last one and refresh an equal
+        last one. Returns the bars written.
+        """
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        bars = np.asarray(bars, dtype=float).reshape(len(timestamps), len(FIELDS))
+        if len(timestamps) == 1:
+            # The usual live update, one new or forming bar
+            return int(self.append(int(timestamps[0]), bars[0]))
+        last = self.last_timestamp
+        if last is not None:
+            keep = timestamps >= last
+            timestamps, bars = timestamps[keep], bars[keep]
+        if not len(timestamps):
+            return 0
+        if last is not None and timestamps[0] == last:
+            self.append(int(timestamps[0]), bars[0])
+            return 1 + self.extend(timestamps[1:], bars[1:])
+        # Only the last `capacity` bars can survive, write them as at most two slices
+        timestamps, bars = timestamps[-self.capacity:], bars[-self.capacity:]
+        count = len(timestamps)
+        positions = (self.head + np.arange(count)) % self.capacity
+        for offset in (0, self.capacity):
+            self.timestamps[positions + offset] = timestamps
+            self.data[:, positions + offset] = bars.T
+        self.head = (self.head + count) % self.capacity
+        self.size = min(self.size + count, self.capacity)
+        return count
+
+    def _slice(self, n: int = None) -> slice:
+        n = self.size if n is None else min(n, self.size)
+        end = self.head + self.capacity
+        return slice(end - n, end)
+
+    def times(self, n: int = None) -> np.ndarray:
+        """View of the last `n` (default all) timestamps, oldest first."""
+        return self.timestamps[self._slice(n)]
+
+    def window(self, n: int = None) -> np.ndarray:
+        """(5, n) view of the last `n` bars, rows Open, High, Low, Close, Volume."""
+        return self.data[:, self._slice(n)]
+
+    def field(self, index: int, n: int = None) -> np.ndarray:
+        return self.data[index, self._slice(n)]
+
+    def close(self, n: int = None) -> np.ndarray:
+        return self.field(CLOSE, n)
+
+    def last_close(self) -> float:
+        return float(self.data[CLOSE, self.head + self.capacity - 1]) if self.size else float('nan')
+
+    def session_start(self) -> int:
+        """Bars held from the current (latest) session, counted from the end."""
+        times = self.times()
+        if not len(times):
+            return 0
+        days = (times + SESSION_OFFSET) // 86400
+        return len(times) - int(np.searchsorted(days, days[-1]))
+
+    def vwap(self, n: int = None) -> float:
+        """Volume weighted average of the typical price, over the current session by default."""
+        bars = self.window(self.session_start() if n is None else n)
+        volume = bars[VOLUME]
+        total = volume.sum()
+        if not total:
+            return float('nan')
+        typical = (bars[HIGH] + bars[LOW] + bars[CLOSE]) / 3
+        return float(typical @ volume / total)
+
+    def ema(self, length: int, n: int = None) -> np.ndarray:
+        return ema(self.close(n)[:, None], length)[:, 0]
+
+    def rsi(self, length: int = 14, n: int = None) -> float:
+        """Wilder RSI of the last close (same definition as calculate_indicators)."""
+        close = self.close(n)
+        if len(close) <= length:
+            return float('nan')
+        change = np.diff(close)[:, None]
+        gain = rma(np.maximum(change, 0.0), length)[-1, 0]
+        loss = -rma(np.minimum(change, 0.0), length)[-1, 0]
+        return float(100 * gain / (gain + loss)) if gain + loss else float('nan')
+
+    def ema_cross(self, fast: int = 9, slow: int = 21, n: int = None) -> int:
+        """+1 when the fast EMA crossed above the slow one on the last bar, -1 when below, else 0."""
+        close = self.close(n)
+        if len(close) <= slow:
+            return 0
+        difference = ema(close[:, None], fast)[-2:, 0] - ema(close[:, None], slow)[-2:, 0]
+        if difference[0] <= 0 < difference[1]:
+            return 1
+        if difference[0] >= 0 > difference[1]:
+            return -1
+        return 0
+
+
+class RingBuffers:
+    """One BarRing per ticker, created on the first bar."""
+
+    __slots__ = ('capacity', 'rings')
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.rings = {}
+
+    def __getitem__(self, ticker: str) -> BarRing:
+        return self.rings[ticker]
+
+    def __contains__(self, ticker: str) -> bool:
+        return ticker in self.rings
+
+    def __len__(self) -> int:
+        return len(self.rings)
+
+    def get(self, ticker: str):
+        return self.rings.get(ticker)
+
+    def extend(self, ticker: str, timestamps, bars) -> int:
+        ring = self.rings.get(ticker)
+        if ring is None:
+            ring = self.rings[ticker] = BarRing(self.capacity)
+        return ring.extend(timestamps, bars)
+
+    def last_timestamps(self) -> dict:
+        return {ticker: ring.last_timestamp for ticker, ring in self.rings.items()}
+
+    def retain(self, tickers) -> None:
+        """Drop the rings of tickers no longer watched."""
+        tickers = set(tickers)
+        for ticker in [ticker for ticker in self.rings if ticker not in tickers]:
+            del self.rings[ticker]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(ring.nbytes for ring in self.rings.values())
@@ -0,0 +1,206 @@
+"""
+Rolling VIS and volatility regimes
+
+calculate_vis_panel scores one fixed start..end range. RollingVIS keeps prefix
+sums over time of the daily returns of a date x symbol price matrix (count,
+sum, sum of squares, up days, down days), so the metrics of any window are a
+difference of two rows:
+
+    rolling(20)                 VIS, volatility, upward/downward volatility and
+                                trend for every symbol on every day over the last
+                                20 returns, O(1) per step
+    range(start, end)           calculate_vis_panel(prices.loc[start:end]) for any
+                                date range, without touching the prices again
+    regimes(20, 120)            1 volatile / 0 normal / -1 calm per day, from the
+                                ratio of short to long window volatility: above 1.5
+                                turns volatile, below 0.75 calm, and the regime holds
+                                until the ratio crosses back through 1 (no flapping
+                                around a threshold)
+    regime_changes(...)         the days a symbol moved from one regime to another
+
+As with slicing the prices, a window starts at each symbol's first price in it
+(the return from a price before the window is left out), so the values equal
+calculate_vis_panel on the same rows. extend() appends new days, save() /
+load() keep the sums in an .npz file next to the bar caches:
+
+    rolling = RollingVIS(field_matrix(panel, 'Adj Close'))
+    rolling.rolling(20)['VIS']                       # date x symbol
+    rolling.range('2024-06-01', '2024-07-20')        # one row per symbol
+    rolling.regime_changes(since='2024-06-01')
+"""
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import timed
+from vis_engine import panel_returns, calculate_vis, _indicator_std
+
+DEFAULT_PATH = './stock_data/rolling_vis.npz'
+METRICS = ['upward_volatility', 'downward_volatility', 'volatility', 'trend', 'VIS']
+REGIMES = {-1: 'calm', 0: 'normal', 1: 'volatile'}
+# Sums kept per symbol, prefix summed over time
+COUNT, TOTAL, SQUARES, UP, DOWN = range(5)
+
+
+def _sums(returns: np.ndarray) -> np.ndarray:
+    valid = ~np.isnan(returns)
+    filled = np.where(valid, returns, 0.0)
+    return np.stack([valid, filled, filled * filled, filled > 0, filled < 0]).astype(float)
+
+
+def _next_valid(prices: np.ndarray, offset: int = 0) -> np.ndarray:
+    """Row (plus `offset`) of the next price at or after every row, len(prices) + offset when there is none."""
+    rows = np.where(~np.isnan(prices), np.arange(len(prices))[:, None] + offset, len(prices) + offset)
+    return np.minimum.accumulate(rows[::-1], axis=0)[::-1].astype(np.int32)
+
+
+class RollingVIS:
+    def __init__(self, prices: pd.DataFrame, alpha=2, beta=2, gamma=1):
+        self.alpha, self.beta, self.gamma = alpha, beta, gamma
+        self.dates = pd.DatetimeIndex(prices.index)
+        self.symbols = pd.Index(prices.columns)
+        values = prices.to_numpy(dtype=float)
+        sums = _sums(panel_returns(prices))
+        # prefix[:, k] = sums of the rows before k
+        self.prefix = np.zeros((5, len(values) + 1, values.shape[1]))
+        np.cumsum(sums, axis=1, out=self.prefix[:, 1:])
+        self.next_valid = _next_valid(values)
+        self.last_price = prices.ffill().to_numpy(dtype=float)[-1] if len(values) else np.full(values.shape[1], np.nan)
+        self._cache = {}
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def extend(self, prices: pd.DataFrame) -> int:
+        """Append the days of `prices` after the last one held. Returns the days added."""
+        prices = prices.reindex(columns=self.symbols)
+        if len(self.dates):
+            prices = prices[prices.index > self.dates[-1]]
+        if prices.empty:
+            return 0
+        values = prices.to_numpy(dtype=float)
+        # The first new return is taken from the last price held
+        with_last = pd.DataFrame(np.vstack([self.last_price, values]), columns=self.symbols)
+        sums = _sums(panel_returns(with_last)[1:])
+        held = len(self.dates)
+        self.prefix = np.concatenate([self.prefix, self.prefix[:, -1:] + np.cumsum(sums, axis=1)], axis=1)
+        new_next = _next_valid(values, offset=held)
+        # Rows after a symbol's last price pointed past the end, they now point at its next new price
+        self.next_valid = np.concatenate([np.where(self.next_valid == held, new_next[0], self.next_valid), new_next])
+        self.last_price = with_last.ffill().to_numpy()[-1]
+        self.dates = self.dates.append(pd.DatetimeIndex(prices.index))
+        self._cache.clear()
+        return len(values)
+
+    def _metrics(self, starts: np.ndarray, ends: np.ndarray) -> dict:
+        """Metrics over rows starts..ends (inclusive, one pair per output row) for every symbol."""
+        columns = np.arange(len(self.symbols))
+        # Returns after each symbol's first price in the window, up to the end row
+        first = self.next_valid[starts]
+        first = np.minimum(first, ends[:, None]) + 1
+        window = self.prefix[:, ends + 1] - self.prefix[:, first, columns]
+        n = window[COUNT]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            variance = (window[SQUARES] - window[TOTAL] ** 2 / n) / (n - 1)
+        metrics = {
+            'upward_volatility': _indicator_std(window[UP], n),
+            'downward_volatility': _indicator_std(window[DOWN], n),
+            'volatility': np.where(n > 1, np.sqrt(np.maximum(variance, 0.0)), np.nan),
+            'trend': window[TOTAL],
+        }
+        metrics['VIS'] = calculate_vis(metrics, alpha=self.alpha, beta=self.beta, gamma=self.gamma)
+        return metrics
+
+    def _rows(self, start=None, end=None) -> tuple:
+        first = 0 if start is None else int(self.dates.searchsorted(pd.Timestamp(start), side='left'))
+        last = len(self.dates) - 1 if end is None else int(self.dates.searchsorted(pd.Timestamp(end), side='right')) - 1
+        return first, last
+
+    @timed('compute.rolling_vis')
+    def rolling(self, window: int = 20) -> dict:
+        """metric -> date x symbol frame over the last `window` returns (NaN for the first `window` days)."""
+        if window in self._cache:
+            return self._cache[window]
+        ends = np.arange(window, len(self.dates))
+        metrics = self._metrics(ends - window, ends)
+        frames = {}
+        for name, values in metrics.items():
+            full = np.full((len(self.dates), len(self.symbols)), np.nan)
+            full[window:] = values
+            frames[name] = pd.DataFrame(full, index=self.dates, columns=self.symbols)
+        self._cache[window] = frames
+        return frames
+
+    def range(self, start=None, end=None) -> pd.DataFrame:
+        """Metrics, VIS and Trend per symbol for start..end (inclusive), like calculate_vis_panel."""
+        first, last = self._rows(start, end)
+        if last < first:
+            metrics = {name: np.full(len(self.symbols), np.nan) for name in METRICS}
+        else:
+            metrics = {name: values[0] for name, values in self._metrics(np.array([first]), np.array([last])).items()}
+        result = pd.DataFrame(metrics, index=self.symbols)[METRICS]
+        trend = result['trend'].to_numpy()
+        result['Trend'] = np.select([trend == 0, trend > 0], ['flat', 'up'], default='down')
+        return result
+
+    def regimes(self, window: int = 20, long_window: int = 120, high: float = 1.5, low: float = 0.75) -> pd.DataFrame:
+        """Regime code per day and symbol (see REGIMES), 0 until both volatilities exist."""
+        short = self.rolling(window)['volatility']
+        long = self.rolling(long_window)['volatility']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = (short / long).to_numpy()
+        codes = np.zeros(ratio.shape, dtype=np.int8)
+        state = np.zeros(ratio.shape[1], dtype=np.int8)
+        # One step per day for all symbols at once, the state needs the day before
+        for row, values in enumerate(ratio):
+            state[(state == 1) & ~(values > 1)] = 0
+            state[(state == -1) & ~(values < 1)] = 0
+            state[values > high] = 1
+            state[values < low] = -1
+            codes[row] = state
+        return pd.DataFrame(codes, index=self.dates, columns=self.symbols)
+
+    def regime_changes(self, window: int = 20, long_window: int = 120, high: float = 1.5, low: float = 0.75,
+                       since=None) -> pd.DataFrame:
+        """Date, Symbol, From, To and volatility ratio of every regime change (on or after `since`)."""
+        codes = self.regimes(window, long_window, high, low).to_numpy()
+        known = np.zeros(codes.shape, dtype=bool)
+        known[long_window:] = True   # both volatilities exist from here on
+        changed = known[1:] & known[:-1] & (codes[1:] != codes[:-1])
+        rows, columns = np.nonzero(changed)
+        rows += 1
+        short = self.rolling(window)['volatility'].to_numpy()[rows, columns]
+        long = self.rolling(long_window)['volatility'].to_numpy()[rows, columns]
+        changes = pd.DataFrame({
+            'Date': self.dates[rows],
+            'Symbol': self.symbols[columns],
+            'From': [REGIMES[code] for code in codes[rows - 1, columns]],
+            'To': [REGIMES[code] for code in codes[rows, columns]],
+            'Ratio': short / long,
+        })
+        if since is not None:
+            changes = changes[changes['Date'] >= pd.Timestamp(since)]
+        return changes.sort_values(['Date', 'Symbol'], ignore_index=True)
+
+    def save(self, path: str = DEFAULT_PATH) -> None:
+        import os
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        np.savez(path, prefix=self.prefix, next_valid=self.next_valid, last_price=self.last_price,
+                 dates=self.dates.as_unit('s').asi8, symbols=np.asarray(self.symbols, dtype=str),
+                 weights=np.array([self.alpha, self.beta, self.gamma], dtype=float),
+                 names=np.array([self.dates.name or '', self.symbols.name or ''], dtype=str))
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_PATH) -> 'RollingVIS':
+        with np.load(path) as data:
+            rolling = cls.__new__(cls)
+            rolling.alpha, rolling.beta, rolling.gamma = data['weights'].tolist()
+            rolling.prefix = data['prefix']
+            rolling.next_valid = data['next_valid']
+            rolling.last_price = data['last_price']
+            # Files saved before the index names were kept load unnamed
+            names = data['names'].tolist() if 'names' in data else ['', '']
+            rolling.dates = pd.DatetimeIndex(pd.to_datetime(data['dates'], unit='s'), name=names[0] or None)
+            rolling.symbols = pd.Index(data['symbols'].tolist(), name=names[1] or None)
+        rolling._cache = {}
+        return rolling
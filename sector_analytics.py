@@ -0,0 +1,144 @@
+"""
+Sector rollups
+
+The VIS, trend vote and period return of every symbol, rolled up by the
+Industry column of the constituent CSVs. Each metric is computed for the whole
+universe panel at once (calculate_vis_panel, the determine_trend vote on an
+indicator_panel, window_returns), then one groupby aggregation gives every
+sector column:
+
+    Members                   symbols with data in the sector
+    Breadth %                 share of members whose determine_trend vote is "Uptrend"
+    Median X / Dispersion X   median and standard deviation of each metric
+    RS <window>               sector median return minus the universe median
+    Leader / Laggard          best and worst member on the first window
+
+Per symbol, `RS <window>` is its return minus its sector's median.
+
+    python sector_analytics.py NSE_large_midcap_250 NSE_small_cap_list --period 1y --output sectors.html
+"""
+
+import os
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import timed
+
+DEFAULT_WINDOWS = ['1d', '5d', '1mo', '3mo']
+
+
+@timed('compute.trend_votes')
+def trend_votes(price_panel: pd.DataFrame) -> pd.DataFrame:
+    """determine_trend for every symbol of a panel: Uptrend / Downtrend Indicators and Overall Trend."""
+    from backtest import indicator_panel
+    from stock_trend import trend_conditions
+
+    panel = indicator_panel(price_panel)
+    close = panel['Close'].to_numpy(dtype=float)
+    has_data = ~np.isnan(close).all(axis=0)
+    # Each symbol votes on its own last bar; forward filling makes the bar before it
+    # (for the OBV rule) that symbol's previous bar, as in its own frame
+    last = len(close) - 1 - np.argmax(~np.isnan(close[::-1]), axis=0)
+    columns = np.arange(close.shape[1])
+    conditions = trend_conditions(panel.ffill())
+    up = sum(condition.to_numpy(dtype=bool)[last, columns].astype(int) for condition in conditions.values())
+    down = len(conditions) - up
+    votes = pd.DataFrame({
+        'Uptrend Indicators': up,
+        'Downtrend Indicators': down,
+        'Overall Trend': np.select([up > down, down > up], ['Uptrend', 'Downtrend'], default='Sideways'),
+    }, index=panel['Close'].columns)
+    return votes[has_data]
+
+
+def symbol_metrics(price_panel: pd.DataFrame, windows=None) -> pd.DataFrame:
+    """VIS, trend vote and window returns, one row per symbol of the panel."""
+    from data_provider import field_matrix
+    from vis_engine import calculate_vis_panel
+    from period_returns import window_returns
+
+    windows = list(windows or DEFAULT_WINDOWS)
+    field = 'Adj Close' if 'Adj Close' in price_panel.columns else 'Close'
+    vis = calculate_vis_panel(field_matrix(price_panel, field))[['VIS', 'Trend']]
+    metrics = trend_votes(price_panel).join(vis, how='outer')
+    metrics = metrics.join(window_returns(price_panel, windows).drop(columns=['Last Date']), how='outer')
+    metrics.index.name = 'Symbol'
+    return metrics
+
+
+@timed('compute.sectors')
+def sector_rollup(metrics: pd.DataFrame, industries: pd.Series, windows=None) -> tuple:
+    """
+    (sectors, metrics): one row per industry from a single grouped aggregation, and
+    the symbol metrics with their Industry and relative strength columns added.
+    `industries` maps the metrics' index (Symbol) to an industry name.
+    """
+    windows = list(windows or DEFAULT_WINDOWS)
+    returns = [f"{window} %" for window in windows if f"{window} %" in metrics.columns]
+    metrics = metrics.copy()
+    metrics['Industry'] = industries.reindex(metrics.index).fillna('Unknown').to_numpy()
+    metrics['Uptrend'] = (metrics['Overall Trend'] == 'Uptrend').astype(float) * 100
+
+    aggregations = {'Members': ('Industry', 'size'), 'Breadth %': ('Uptrend', 'mean')}
+    for column in ['VIS'] + returns:
+        aggregations[f"Median {column}"] = (column, 'median')
+        aggregations[f"Dispersion {column}"] = (column, 'std')
+    ranked = metrics
+    if returns:
+        # Sorted best first, the first / last symbol with a return is the leader / laggard
+        ranked = metrics.sort_values(returns[0], ascending=False, na_position='last', kind='stable')
+        ranked['Ranked'] = ranked.index.where(ranked[returns[0]].notna())
+        aggregations['Leader'] = ('Ranked', 'first')
+        aggregations['Laggard'] = ('Ranked', 'last')
+    sectors = ranked.groupby('Industry', sort=False).agg(**aggregations)
+
+    # Relative strength: symbols against their sector median, sectors against the universe median
+    codes = sectors.index.get_indexer(metrics['Industry'])
+    for column in returns:
+        median = sectors[f"Median {column}"].to_numpy()
+        metrics[f"RS {column.removesuffix(' %')}"] = metrics[column].to_numpy() - median[codes]
+        sectors[f"RS {column.removesuffix(' %')}"] = median - metrics[column].median()
+
+    sectors = sectors.sort_values('Breadth %', ascending=False, kind='stable')
+    return sectors.reset_index(), metrics.drop(columns=['Uptrend']).reset_index()
+
+
+def sector_report(csv_files, period: str = '1y', windows=None, provider=None) -> tuple:
+    """Load the universe once and roll it up by industry. Returns (sectors, symbols)."""
+    from universe import UniverseRegistry, from_yahoo
+    from data_provider import load_period_panel
+
+    registry = UniverseRegistry.load(csv_files)
+    registry.record_membership()
+    universe = registry.union()
+    panel = load_period_panel(universe.tickers(), period, provider=provider)
+    metrics = symbol_metrics(panel, windows)
+    # Industry and company name of every symbol by its ID in the symbol table
+    table = registry.table
+    industry_names = np.asarray(table.industries, dtype=object)
+    industries = pd.Series(industry_names[table.industry_codes[table.ids_of(metrics.index)]], index=metrics.index)
+    sectors, symbols = sector_rollup(metrics, industries, windows)
+    symbols['Symbol'] = from_yahoo(symbols['Symbol'])
+    symbols.insert(1, 'Company Name', np.asarray(table.names, dtype=object)[table.ids_of(symbols['Symbol'])])
+    for column in ('Leader', 'Laggard'):
+        if column in sectors:
+            sectors[column] = sectors[column].map(lambda symbol: from_yahoo(symbol) if isinstance(symbol, str) else symbol)
+    return sectors, symbols
+
+
+if __name__ == "__main__":
+    from period_returns import write_report
+
+    parser = argparse.ArgumentParser(description="VIS, trend breadth and returns rolled up by industry")
+    parser.add_argument('csv_files', nargs='*', default=["NSE_large_midcap_250"])
+    parser.add_argument('--period', default='1y')
+    parser.add_argument('--windows', nargs='+', default=DEFAULT_WINDOWS)
+    parser.add_argument('--output', default='./stock_data/sectors.html', help='.html, .csv or .parquet')
+    args = parser.parse_args()
+
+    sectors, symbols = sector_report(args.csv_files, period=args.period, windows=args.windows)
+    print(sectors.to_string(index=False))
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    write_report(sectors, args.output)
@@ -1,13 +1,14 @@
 
 
-import yfinance as yf
 import time
-import os
+
+from alert_dispatcher import play_sound
 
 def play_music(file_path):
-    os.system(f"afplay {file_path}")
+    play_sound(file_path)  # afplay on macOS, paplay/aplay/ffplay on Linux, doesn't block
 
 def check_stock_price(ticker, threshold):
+    import yfinance as yf  # imported on first check, keeps startup fast
     stock = yf.Ticker(ticker)
     price = stock.history(period="1d")['Close'].iloc[-1]  # Get the last closing price
     print(f"The current price of {ticker} is {price:.2f}")
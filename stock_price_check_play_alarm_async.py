@@ -1,33 +1,35 @@
 
 
 import asyncio
-import json
-import yfinance as yf
+from price_watcher import PriceWatcher, YahooQuoteSource
+from threshold_config import ThresholdConfig, ThresholdMonitor
+from alert_dispatcher import AlertDispatcher, default_sinks
+from ring_buffer import RingBuffers
+from alert_rules import RuleMonitor
 
-import os
 
-def play_music(file_path):
-    os.system(f"afplay {file_path}") #mac os command afplay
+# Check a polled price and queue an alarm when it crosses one of the ticker's thresholds
+def check_stock_price(monitor, dispatcher, ticker, price, ring=None):
+    line = f"The current price of {ticker} is {price:.2f}"
+    if ring is not None and len(ring) > 14:
+        line += f" (VWAP {ring.vwap():.2f}, RSI {ring.rsi():.1f})"
+    print(line)
 
+    for alert in monitor.check(ticker, price):
+        print(alert)
+        # Played by the dispatcher in the background, polling doesn't wait for the clip
+        dispatcher.submit(ticker, alert, price)
 
-# Function to fetch stock price synchronously
-def get_stock_price(ticker):
-    stock = yf.Ticker(ticker)
-    price = stock.history(period="1d", interval="15m")['Close'].iloc[-1]  # Get the last closing price
-    return price
+# Evaluate the indicator rules at once on the bars held in memory, only for the tickers whose bars changed
+def check_rules(rule_monitor, dispatcher, buffers, tickers=None):
+    for ticker, rule in rule_monitor.check_buffers(buffers, tickers):
+        ring = buffers.get(ticker)
+        price = ring.last_close() if ring is not None else None
+        alert = f"Alert: {ticker} rule '{rule}' is true"
+        print(alert)
+        dispatcher.submit(ticker, alert, price)
 
-# Asynchronous wrapper to check the stock price and play an alarm if a threshold is crossed
-async def check_stock_price(ticker, threshold):
-    loop = asyncio.get_running_loop()
-    price = await loop.run_in_executor(None, get_stock_price, ticker)
-    await asyncio.sleep(2)
-    print(f"The current price of {ticker} is {price:.2f}")
-
-    if abs(price - threshold) < 3:
-        print(f"Alert: {ticker} has crossed the threshold price of {threshold}")
-        play_music('./Alarm-Clock-Short-chosic.com_.mp3')  # Ensure you have an alarm mp3 file in your working directory
-
-async def main():
+async def main(config_path='./stock_price_thresholds.json', interval=60, sinks=None):
     # Dictionary of tickers and their price thresholds
     
     '''stock_thresholds = {
@@ -36,14 +38,33 @@ async def main():
         'TATAPOWER.NS': 446
     }'''
 
+    # Thresholds stay in memory, the JSON file is parsed again only when it changes
+    config = ThresholdConfig(config_path)
+    monitor = ThresholdMonitor()
+    rule_monitor = RuleMonitor()
+    # Ensure you have an alarm mp3 file in your working directory
+    dispatcher = await AlertDispatcher(default_sinks() if sinks is None else sinks).start()
+    # One batched quote request per cycle for all due tickers, each ticker polled every ~60 seconds.
+    # The recent 15m bars stay in memory, later requests only fetch the bars after them
+    buffers = RingBuffers()
+    watcher = PriceWatcher(YahooQuoteSource(),
+                           on_price=lambda ticker, price: check_stock_price(monitor, dispatcher, ticker, price,
+                                                                            buffers.get(ticker)),
+                           interval=interval, buffers=buffers)
 
-    while True:
-        with open('./stock_price_thresholds.json', 'r') as file:
-            stock_thresholds = json.load(file)
-        tasks = [check_stock_price(ticker, threshold) for ticker, threshold in stock_thresholds.items()]
-        await asyncio.gather(*tasks)
-        print("Sleep some time")
-        await asyncio.sleep(60)  # Wait for 60 seconds before checking again
+    try:
+        while True:
+            diff = config.poll()
+            if diff:
+                print(f"Thresholds changed: added={sorted(diff.added)} removed={sorted(diff.removed)} changed={sorted(diff.changed)}")
+                monitor.apply(config.rules, diff)
+                watcher.set_tickers(config.rules)
+                rule_monitor.set_rules({ticker: rule.rules for ticker, rule in config.rules.items()})
+            await watcher.run_cycle()
+            check_rules(rule_monitor, dispatcher, buffers, watcher.updated)
+            await asyncio.sleep(watcher.seconds_until_due())
+    finally:
+        await dispatcher.close()
 
 
 if __name__ == "__main__":
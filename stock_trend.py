@@ -70,53 +70,24 @@ Rectangles:
 Consolidation patterns where the price bounces between two parallel levels.
 """
 
-# pip install pandas-ta
-import yfinance as yf
 import pandas as pd
-import pandas_ta as ta
 import numpy as np
-import matplotlib.pyplot as plt
-from scipy.signal import argrelextrema
+# yfinance, matplotlib and scipy take seconds to import, they are imported
+# inside the functions that need them so quick lookups start fast
 
 from typing import Optional
 
-def calculate_indicators(stock_data: pd.DataFrame) -> pd.DataFrame:
-    # Simple Moving Average (SMA)
-    stock_data['SMA_20'] = ta.sma(stock_data['Close'], length=20)
-    stock_data['SMA_50'] = ta.sma(stock_data['Close'], length=50)
-
-    # Exponential Moving Average (EMA)
-    stock_data['EMA_20'] = ta.ema(stock_data['Close'], length=20)
-    stock_data['EMA_50'] = ta.ema(stock_data['Close'], length=50)
-
-    # Bollinger Bands
-    bbands = ta.bbands(stock_data['Close'], length=20, std=2)
-    stock_data['MiddleBand'] = bbands['BBM_20_2.0']
-    stock_data['UpperBand'] = bbands['BBU_20_2.0']
-    stock_data['LowerBand'] = bbands['BBL_20_2.0']
-
-    # Relative Strength Index (RSI)
-    stock_data['RSI'] = ta.rsi(stock_data['Close'], length=14)
-
-    # MACD
-    macd = ta.macd(stock_data['Close'], fast=12, slow=26, signal=9)
-    stock_data['MACD'] = macd['MACD_12_26_9']
-    stock_data['Signal_Line'] = macd['MACDs_12_26_9']
-
-    # Average True Range (ATR)
-    stock_data['ATR'] = ta.atr(stock_data['High'], stock_data['Low'], stock_data['Close'], length=14)
-
-    # On-Balance Volume (OBV)
-    stock_data['OBV'] = ta.obv(stock_data['Close'], stock_data['Volume'])
-
-    # ADX, +DI, -DI
-    adx = ta.adx(stock_data['High'], stock_data['Low'], stock_data['Close'], length=14)
-    stock_data['Plus_DI'] = adx['DMP_14']
-    stock_data['Minus_DI'] = adx['DMN_14']
-    stock_data['ADX'] = adx['ADX_14']
+from instrumentation import timed
+from indicator_kernels import indicator_arrays, INDICATORS
 
-    # Volume Spike
-    stock_data['Volume_Spike'] = stock_data['Volume'] > 2 * stock_data['Volume'].rolling(window=20).mean()
+@timed('indicators')
+def calculate_indicators(stock_data: pd.DataFrame) -> pd.DataFrame:
+    # SMA, EMA, Bollinger Bands, RSI, MACD, ATR, OBV, ADX/+DI/-DI and Volume Spike in one
+    # NumPy pass (same values as the pandas_ta calls, see indicator_kernels.py)
+    indicators = indicator_arrays(stock_data['High'], stock_data['Low'], stock_data['Close'],
+                                  stock_data['Volume'])
+    for column in INDICATORS:
+        stock_data[column] = indicators[column]
 
     return stock_data
 
@@ -124,7 +95,30 @@ def format_print(text):
     print(text)
     print('_' * len(text))
 
-def determine_trend(stock_data: pd.DataFrame): 
+def trend_conditions(stock_data: pd.DataFrame) -> dict:
+    """
+    The trend rules for every bar. Works on one symbol's frame (boolean Series) and on
+    an indicator panel whose columns give date x symbol frames (boolean DataFrames).
+    """
+    return {
+        # SMA Trend
+        "SMA TREND": stock_data['SMA_20'] > stock_data['SMA_50'],
+        # EMA Trend
+        "EMA TREND": stock_data['EMA_20'] > stock_data['EMA_50'],
+        # Bollinger Bands Trend
+        "BOLLINGER BANDS TREND": stock_data['Close'] > stock_data['MiddleBand'],
+        # RSI Trend
+        "RSI TREND": stock_data['RSI'] > 50,
+        # MACD Trend
+        "MACD TREND": stock_data['MACD'] > stock_data['Signal_Line'],
+        # OBV Trend
+        "OBV TREND": stock_data['OBV'] > stock_data['OBV'].shift(1),
+        # ADX Trend
+        "ADX TREND": (stock_data['Plus_DI'] > stock_data['Minus_DI']) & (stock_data['ADX'] > 20),
+    }
+
+@timed('trend')
+def determine_trend(stock_data: pd.DataFrame, verbose: bool = True): 
     # Initialize counters
     uptrend_count = 0
     downtrend_count = 0
@@ -134,32 +128,17 @@ def determine_trend(stock_data: pd.DataFrame):
         nonlocal uptrend_count, downtrend_count
         if condition:
             uptrend_count += 1
-            format_print("Positive Trend : " + trend_name)
+            if verbose:
+                format_print("Positive Trend : " + trend_name)
         else:
             downtrend_count += 1
-            format_print("Nagative Trend : " + trend_name)
+            if verbose:
+                format_print("Nagative Trend : " + trend_name)
     
 
-    # SMA Trend
-    update_trend_count(stock_data['SMA_20'].iat[-1] > stock_data['SMA_50'].iat[-1], "SMA TREND")
-
-    # EMA Trend
-    update_trend_count(stock_data['EMA_20'].iat[-1] > stock_data['EMA_50'].iat[-1], "EMA TREND")
-
-    # Bollinger Bands Trend
-    update_trend_count(stock_data['Close'].iat[-1] > stock_data['MiddleBand'].iat[-1], "BOLLINGER BANDS TREND")
-
-    # RSI Trend
-    update_trend_count(stock_data['RSI'].iat[-1] > 50, "RSI TREND")
-
-    # MACD Trend
-    update_trend_count(stock_data['MACD'].iat[-1] > stock_data['Signal_Line'].iat[-1], "MACD TREND")
-
-    # OBV Trend
-    update_trend_count(stock_data['OBV'].iat[-1] > stock_data['OBV'].iat[-2], "OBV TREND")
-
-    # ADX Trend
-    update_trend_count(stock_data['Plus_DI'].iat[-1] > stock_data['Minus_DI'].iat[-1] and stock_data['ADX'].iat[-1] > 20, "ADX TREND")
+    # Vote of every trend rule on the last bar
+    for trend_name, condition in trend_conditions(stock_data).items():
+        update_trend_count(bool(condition.iat[-1]), trend_name)
 
     # Determine overall trend
     if uptrend_count > downtrend_count:
@@ -173,7 +152,10 @@ def determine_trend(stock_data: pd.DataFrame):
 
 
 
+@timed('fetch.history')
 def get_stock_data(stock_symbol, period, interval) -> Optional[pd.DataFrame]:
+    import yfinance as yf
+
     stock = yf.Ticker(stock_symbol)
     stock_data = stock.history(period=period, interval=interval)
     if stock_data.empty:
@@ -183,40 +165,31 @@ def get_stock_data(stock_symbol, period, interval) -> Optional[pd.DataFrame]:
     format_print(f"Choosing interval: {interval}")
     return stock_data
 
-def calculate_pivot_points(stock_data: pd.DataFrame) -> pd.DataFrame:
-    stock_data['Pivot'] = (stock_data['High'] + stock_data['Low'] + stock_data['Close']) / 3
-    stock_data['R1'] = 2 * stock_data['Pivot'] - stock_data['Low']
-    stock_data['S1'] = 2 * stock_data['Pivot'] - stock_data['High']
-    stock_data['R2'] = stock_data['Pivot'] + (stock_data['High'] - stock_data['Low'])
-    stock_data['S2'] = stock_data['Pivot'] - (stock_data['High'] - stock_data['Low'])
-    stock_data['R3'] = stock_data['High'] + 2 * (stock_data['Pivot'] - stock_data['Low'])
-    stock_data['S3'] = stock_data['Low'] - 2 * (stock_data['High'] - stock_data['Pivot'])
-    return stock_data
-
-def find_swing_levels(stock_data: pd.DataFrame, window: int = 5) -> pd.DataFrame:
-    stock_data['Swing_High'] = stock_data['High'].rolling(window=window, min_periods=1).max()
-    stock_data['Swing_Low'] = stock_data['Low'].rolling(window=window, min_periods=1).min()
-    return stock_data
-
-def summarize_support_resistance(stock_data: pd.DataFrame) -> None:
+def summarize_support_resistance(stock_data: pd.DataFrame, stock_symbol: str = None) -> None:
     if stock_data is not None:
-        stock_data = calculate_pivot_points(stock_data)
-        stock_data = find_swing_levels(stock_data, window=5)
+        from level_index import LevelIndex
+        # Pivot and swing levels of the last bar plus the sorted extrema / cluster levels
+        levels = LevelIndex.from_history(stock_data)
+        recent = {level.kind: level.price for level in levels.recent()}
+        support, resistance = levels.support(), levels.resistance()
 
-        last_row = stock_data.iloc[-1]
         format_print(f"Stock Symbol: {stock_symbol}")
-        format_print(f"Close: {last_row['Close']}")
+        format_print(f"Close: {levels.last_close}")
         format_print("Pivot Points:")
-        format_print(f"  Pivot: {last_row['Pivot']}")
-        format_print(f"  Resistance Levels: R1={last_row['R1']}, R2={last_row['R2']}, R3={last_row['R3']}")
-        format_print(f"  Support Levels: S1={last_row['S1']}, S2={last_row['S2']}, S3={last_row['S3']}")
+        format_print(f"  Pivot: {recent['Pivot']}")
+        format_print(f"  Resistance Levels: R1={recent['R1']}, R2={recent['R2']}, R3={recent['R3']}")
+        format_print(f"  Support Levels: S1={recent['S1']}, S2={recent['S2']}, S3={recent['S3']}")
         format_print("Swing Levels:")
-        format_print(f"  Swing High: {last_row['Swing_High']}")
-        format_print(f"  Swing Low: {last_row['Swing_Low']}")
+        format_print(f"  Swing High: {recent['Swing_High']}")
+        format_print(f"  Swing Low: {recent['Swing_Low']}")
+        if support is not None:
+            format_print(f"Nearest Support: {support.price:.2f} ({support.kind}, strength {support.strength})")
+        if resistance is not None:
+            format_print(f"Nearest Resistance: {resistance.price:.2f} ({resistance.kind}, strength {resistance.strength})")
 
 
 
-def get_stock_trend(stock_data: pd.DataFrame) -> None:
+def get_stock_trend(stock_data: pd.DataFrame, stock_symbol: str = None) -> None:
 
     # Calculate indicators
     stock_data = calculate_indicators(stock_data)
@@ -236,56 +209,53 @@ def get_stock_trend(stock_data: pd.DataFrame) -> None:
     #print(stock_data[['Close', 'ATR', 'OBV', 'Plus_DI', 'Minus_DI', 'ADX']].tail(10))
 
 
-def identify_breakout(stock_data: pd.DataFrame) -> None:
-    last_row = stock_data.iloc[-1]
-    prev_row = stock_data.iloc[-2]
-
-    breakout_signals = []
-
-    # Check Bollinger Bands breakout
-    if last_row['Close'] > last_row['UpperBand']:
-        breakout_signals.append('Bollinger Band Breakout')
-
-    # Check Moving Averages crossover
-    if prev_row['EMA_20'] <= prev_row['EMA_50'] and last_row['EMA_20'] > last_row['EMA_50']:
-        breakout_signals.append('EMA Crossover')
-
-    # Check RSI breakout from overbought/oversold
-    if prev_row['RSI'] <= 30 and last_row['RSI'] > 30:
-        breakout_signals.append('RSI Breakout from Oversold')
-    elif prev_row['RSI'] >= 70 and last_row['RSI'] < 70:
-        breakout_signals.append('RSI Breakout from Overbought')
-
-    # Check MACD crossover
-    if prev_row['MACD'] <= prev_row['Signal_Line'] and last_row['MACD'] > last_row['Signal_Line']:
-        breakout_signals.append('MACD Crossover')
+def breakout_conditions(stock_data: pd.DataFrame) -> dict:
+    """The breakout rules for every bar (comparing each bar with the one before it)."""
+    prev = stock_data[['EMA_20', 'EMA_50', 'RSI', 'MACD', 'Signal_Line']].shift(1)
+    rsi_oversold = (prev['RSI'] <= 30) & (stock_data['RSI'] > 30)
+    return {
+        # Check Bollinger Bands breakout
+        'Bollinger Band Breakout': stock_data['Close'] > stock_data['UpperBand'],
+        # Check Moving Averages crossover
+        'EMA Crossover': (prev['EMA_20'] <= prev['EMA_50']) & (stock_data['EMA_20'] > stock_data['EMA_50']),
+        # Check RSI breakout from overbought/oversold
+        'RSI Breakout from Oversold': rsi_oversold,
+        'RSI Breakout from Overbought': ~rsi_oversold & (prev['RSI'] >= 70) & (stock_data['RSI'] < 70),
+        # Check MACD crossover
+        'MACD Crossover': (prev['MACD'] <= prev['Signal_Line']) & (stock_data['MACD'] > stock_data['Signal_Line']),
+        # Check Volume Spike
+        'Volume Spike': stock_data['Volume_Spike'].fillna(False).astype(bool),
+    }
+
+@timed('breakout')
+def identify_breakout(stock_data: pd.DataFrame, verbose: bool = True) -> list:
+    breakout_signals = [signal for signal, condition in breakout_conditions(stock_data).items()
+                        if condition.iat[-1]]
+
+    if verbose:
+        if breakout_signals:
+            format_print(f"Potential Breakout Signals: {', '.join(breakout_signals)}")
+        else:
+            format_print("No breakout signals detected.")
 
-    # Check Volume Spike
-    if last_row['Volume_Spike']:
-        breakout_signals.append('Volume Spike')
+    return breakout_signals
 
-    if breakout_signals:
-        format_print(f"Potential Breakout Signals: {', '.join(breakout_signals)}")
-    else:
-        format_print("No breakout signals detected.")
 
 
-
-def plot_stock_data(stock_data:pd.DataFrame, stock_symbol, pattern=None):
-    import time
-    plt.figure(figsize=(12, 6))
-    plt.plot(stock_data['Close'], label='Close Price')
-    if pattern:
-        plt.title(f'{stock_symbol} - {pattern}')
-    else:
-        plt.title(stock_symbol)
-    plt.xlabel('Date')
-    plt.ylabel('Price')
-    plt.legend()
-    # Save the plot as an image
-    plt.savefig(f"./plots/{time.ctime()}-{stock_symbol}-{pattern}.png")
+@timed('report.plot')
+def plot_stock_data(stock_data:pd.DataFrame, stock_symbol, pattern=None, renderer=None):
+    # Agg Figure written to plots/{symbol}/{pattern}_{date}.png, unchanged charts are
+    # not drawn again. With a ChartRenderer the chart is queued to its process pool
+    from chart_renderer import ChartJob, render_chart
+    if renderer is not None:
+        return renderer.submit(stock_data, stock_symbol, pattern)
+    job = ChartJob(stock_data, stock_symbol, pattern)
+    if job.is_current():
+        return job.path
+    return render_chart(job)
 
 def find_extrema(stock_data:pd.DataFrame, order:int =5) -> pd.DataFrame:
+    from scipy.signal import argrelextrema
     stock_data['min'] = stock_data.iloc[argrelextrema(stock_data['Close'].values, np.less_equal, order=order)[0]]['Close']
     stock_data['max'] = stock_data.iloc[argrelextrema(stock_data['Close'].values, np.greater_equal, order=order)[0]]['Close']
     return stock_data
@@ -329,24 +299,34 @@ def detect_rectangle(stock_data: pd.DataFrame):
     else:
         return None
 
-def find_price_patterns(stock_data: pd.DataFrame):
+@timed('patterns')
+def find_price_patterns(stock_data: pd.DataFrame, stock_symbol: str, plot: bool = True, verbose: bool = True,
+                        renderer=None) -> list:
     stock_data = find_extrema(stock_data)
+    patterns = []
     
     triangle_pattern = detect_triangle(stock_data)
     if triangle_pattern:
-        
-        plot_stock_data(stock_data, stock_symbol, pattern=triangle_pattern)
-        print(f"Detected pattern: {triangle_pattern}")
+        patterns.append(triangle_pattern)
+        if plot:
+            plot_stock_data(stock_data, stock_symbol, pattern=triangle_pattern, renderer=renderer)
+        if verbose:
+            print(f"Detected pattern: {triangle_pattern}")
     
     rectangle_pattern = detect_rectangle(stock_data)
     if rectangle_pattern:
-        plot_stock_data(stock_data, stock_symbol, pattern=rectangle_pattern)
-        print(f"Detected pattern: {rectangle_pattern}")
+        patterns.append(rectangle_pattern)
+        if plot:
+            plot_stock_data(stock_data, stock_symbol, pattern=rectangle_pattern, renderer=renderer)
+        if verbose:
+            print(f"Detected pattern: {rectangle_pattern}")
 
-    if not triangle_pattern and not rectangle_pattern:
+    if not patterns and verbose:
         #plot_stock_data(stock_data, stock_symbol)
         print("No significant pattern detected.")
 
+    return patterns
+
 if __name__ == "__main__":
     stock_symbol = input("Enter the stock symbol (e.g., TITAGARH.NS): ")
 
@@ -354,10 +334,10 @@ if __name__ == "__main__":
     interval = "1d" # [1m, 2m, 5m, 15m, 30m, 60m, 90m, 1h, 1d, 5d, 1wk, 1mo, 3mo]
     stock_data = get_stock_data(stock_symbol.upper(), period=period, interval=interval)
 
-    get_stock_trend(stock_data=stock_data)
-    summarize_support_resistance(stock_data=stock_data)
+    get_stock_trend(stock_data=stock_data, stock_symbol=stock_symbol)
+    summarize_support_resistance(stock_data=stock_data, stock_symbol=stock_symbol)
     identify_breakout(stock_data=stock_data)
-    find_price_patterns(stock_data=stock_data)
+    find_price_patterns(stock_data=stock_data, stock_symbol=stock_symbol)
 
 
 
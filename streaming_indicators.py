@@ -0,0 +1,250 @@
+"""
+Streaming indicators
+
+calculate_indicators in stock_trend.py recomputes every indicator series over the
+whole history just so determine_trend can read the last value. For intraday
+polling StreamingIndicators keeps O(1) running state per indicator instead and is
+updated with one bar at a time:
+
+    indicators = StreamingIndicators.from_history(stock_data)   # warm up once
+    indicators.update(open_, high, low, close, volume)          # every new bar
+    determine_trend(indicators.frame())
+
+The running state reproduces the pandas_ta (0.3.14b) definitions used by
+calculate_indicators, so the values equal the batch output:
+    SMA / Bollinger Bands : rolling sums over a fixed window (population std)
+    EMA                   : seeded with the SMA of the first `length` closes
+    RSI / ATR / ADX       : Wilder's smoothing (ewm alpha=1/length, min_periods=length)
+    MACD signal           : EMA of MACD starting at its first valid value
+    OBV                   : running signed volume
+"""
+
+import math
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+NAN = float('nan')
+
+# Same columns (and order) as calculate_indicators adds
+INDICATOR_COLUMNS = ['SMA_20', 'SMA_50', 'EMA_20', 'EMA_50', 'MiddleBand', 'UpperBand', 'LowerBand',
+                     'RSI', 'MACD', 'Signal_Line', 'ATR', 'OBV', 'Plus_DI', 'Minus_DI', 'ADX', 'Volume_Spike']
+
+
+class RollingWindow:
+    """Running sum over the last `length` values."""
+
+    def __init__(self, length: int):
+        self.length = length
+        self.values = deque(maxlen=length)
+        self.total = 0.0
+
+    def update(self, value: float) -> None:
+        if len(self.values) == self.length:
+            self.total -= self.values[0]
+        self.values.append(value)
+        self.total += value
+
+    @property
+    def mean(self) -> float:
+        if len(self.values) < self.length:
+            return NAN
+        return self.total / self.length
+
+    @property
+    def std(self) -> float:
+        # Population std (ddof=0) like pandas_ta bbands. Computed from the window around
+        # its own mean: a running sum of squares cancels out on flat prices.
+        if len(self.values) < self.length:
+            return NAN
+        mean = sum(self.values) / self.length
+        return math.sqrt(sum((value - mean) ** 2 for value in self.values) / self.length)
+
+
+class Ema:
+    """pandas_ta ema: SMA of the first `length` values, then ewm(span=length, adjust=False)."""
+
+    def __init__(self, length: int):
+        self.length = length
+        self.alpha = 2.0 / (length + 1)
+        self.seed = []
+        self.value = NAN
+
+    def update(self, value: float) -> float:
+        if self.seed is not None:
+            self.seed.append(value)
+            if len(self.seed) == self.length:
+                self.value = sum(self.seed) / self.length
+                self.seed = None
+            return self.value
+        self.value += self.alpha * (value - self.value)
+        return self.value
+
+
+class Rma:
+    """Wilder's moving average as pandas_ta rma: ewm(alpha=1/length, min_periods=length)."""
+
+    def __init__(self, length: int):
+        self.length = length
+        self.decay = 1.0 - 1.0 / length
+        self.numerator = 0.0
+        self.denominator = 0.0
+        self.count = 0
+        self.value = NAN
+
+    def update(self, value: float) -> float:
+        if math.isnan(value):
+            if self.count:
+                # A gap decays the older weights but keeps the last value
+                self.numerator *= self.decay
+                self.denominator *= self.decay
+            return self.value
+        self.numerator = value + self.decay * self.numerator
+        self.denominator = 1.0 + self.decay * self.denominator
+        self.count += 1
+        if self.count >= self.length:
+            self.value = self.numerator / self.denominator
+        return self.value
+
+
+class StreamingIndicators:
+    def __init__(self):
+        self.sma_20 = RollingWindow(20)
+        self.sma_50 = RollingWindow(50)
+        self.ema_20 = Ema(20)
+        self.ema_50 = Ema(50)
+        self.ema_12 = Ema(12)
+        self.ema_26 = Ema(26)
+        self.signal = Ema(9)
+        self.gain = Rma(14)
+        self.loss = Rma(14)
+        self.atr = Rma(14)
+        self.plus_dm = Rma(14)
+        self.minus_dm = Rma(14)
+        self.adx = Rma(14)
+        self.volume_20 = RollingWindow(20)
+        self.obv = 0.0
+        self.prev_bar = None
+        self.prev_row = None
+        self.row = None
+        self.bars = 0
+
+    @classmethod
+    def from_history(cls, stock_data: pd.DataFrame) -> 'StreamingIndicators':
+        indicators = cls()
+        for values in stock_data[['Open', 'High', 'Low', 'Close', 'Volume']].itertuples(index=False):
+            indicators.update(*values)
+        return indicators
+
+    def update(self, open_: float, high: float, low: float, close: float, volume: float) -> dict:
+        """Add one bar and return the latest row of indicator values."""
+        row = {'Open': open_, 'High': high, 'Low': low, 'Close': close, 'Volume': volume}
+
+        # SMA and Bollinger Bands
+        self.sma_20.update(close)
+        self.sma_50.update(close)
+        row['SMA_20'] = self.sma_20.mean
+        row['SMA_50'] = self.sma_50.mean
+        deviation = 2 * self.sma_20.std
+        row['MiddleBand'] = row['SMA_20']
+        row['UpperBand'] = row['SMA_20'] + deviation
+        row['LowerBand'] = row['SMA_20'] - deviation
+
+        # EMA
+        row['EMA_20'] = self.ema_20.update(close)
+        row['EMA_50'] = self.ema_50.update(close)
+
+        # MACD, the signal line starts at the first valid MACD value
+        macd = self.ema_12.update(close) - self.ema_26.update(close)
+        row['MACD'] = macd
+        row['Signal_Line'] = self.signal.update(macd) if not math.isnan(macd) else NAN
+
+        if self.prev_bar is None:
+            change = true_range = up_move = down_move = NAN
+            self.obv = volume
+        else:
+            prev_high, prev_low, prev_close = self.prev_bar
+            change = close - prev_close
+            high_low = high - low
+            true_range = max(abs(high_low), abs(high - prev_close), abs(prev_close - low))
+            up_move = high - prev_high
+            down_move = prev_low - low
+            self.obv += volume * (1 if change > 0 else -1 if change < 0 else 0)
+
+        # RSI
+        gain = self.gain.update(max(change, 0.0) if not math.isnan(change) else NAN)
+        loss = self.loss.update(min(change, 0.0) if not math.isnan(change) else NAN)
+        row['RSI'] = 100 * gain / (gain + abs(loss)) if gain + abs(loss) else NAN
+
+        # ATR
+        atr = self.atr.update(true_range)
+        row['ATR'] = atr
+
+        # OBV
+        row['OBV'] = self.obv
+
+        # ADX, +DI, -DI
+        if math.isnan(up_move):
+            plus_dm = minus_dm = NAN
+        else:
+            plus_dm = up_move if up_move > down_move and up_move > 0 else 0.0
+            minus_dm = down_move if down_move > up_move and down_move > 0 else 0.0
+        # The smoothers take every bar, also the ones where ATR is 0
+        plus_smoothed = self.plus_dm.update(plus_dm)
+        minus_smoothed = self.minus_dm.update(minus_dm)
+        plus_di = 100 / atr * plus_smoothed if atr else NAN
+        minus_di = 100 / atr * minus_smoothed if atr else NAN
+        row['Plus_DI'] = plus_di
+        row['Minus_DI'] = minus_di
+        di_sum = plus_di + minus_di
+        dx = 100 * abs(plus_di - minus_di) / di_sum if di_sum else NAN
+        row['ADX'] = self.adx.update(dx)
+
+        # Volume Spike
+        self.volume_20.update(volume)
+        row['Volume_Spike'] = bool(volume > 2 * self.volume_20.mean)
+
+        self.prev_bar = (high, low, close)
+        self.prev_row, self.row = self.row, row
+        self.bars += 1
+        return row
+
+    def frame(self) -> pd.DataFrame:
+        """Previous and latest rows, enough for determine_trend and identify_breakout."""
+        rows = [row for row in (self.prev_row, self.row) if row is not None]
+        return pd.DataFrame(rows)
+
+
+def compare_with_batch(stock_data: pd.DataFrame, calculate_indicators=None) -> pd.Series:
+    """
+    Replay `stock_data` bar by bar and return the largest absolute difference per
+    column against the batch calculate_indicators output (0 means identical).
+    """
+    if calculate_indicators is None:
+        from stock_trend import calculate_indicators
+    batch = calculate_indicators(stock_data.copy())[INDICATOR_COLUMNS]
+
+    indicators = StreamingIndicators()
+    rows = [indicators.update(*values) for values in
+            stock_data[['Open', 'High', 'Low', 'Close', 'Volume']].itertuples(index=False)]
+    streaming = pd.DataFrame(rows, index=stock_data.index)[INDICATOR_COLUMNS]
+
+    differences = {}
+    for column in INDICATOR_COLUMNS:
+        expected = batch[column].to_numpy(dtype=float)
+        actual = streaming[column].to_numpy(dtype=float)
+        if not np.array_equal(np.isnan(expected), np.isnan(actual)):
+            differences[column] = np.inf
+        else:
+            differences[column] = np.nan_to_num(np.abs(expected - actual)).max(initial=0.0)
+    return pd.Series(differences)
+
+
+if __name__ == "__main__":
+    from stock_trend import get_stock_data
+
+    stock_symbol = input("Enter the stock symbol (e.g., TITAGARH.NS): ")
+    stock_data = get_stock_data(stock_symbol.upper(), period="1y", interval="1d")
+    if stock_data is not None:
+        print(compare_with_batch(stock_data).to_string())
@@ -0,0 +1,122 @@
+"""
+Deterministic synthetic OHLCV bars
+
+Random-walk prices (per-symbol price level and volatility), opening gaps,
+high/low wicks around the open-close body and lognormal volume that rises on big
+moves (and follows the U shape of the NSE session for intraday bars). The same
+seed always gives the same bars, so benchmarks and offline runs are repeatable.
+
+    panel = synthetic_panel(1000, 252)                 # (Symbol, Date) panel, 1y of daily bars
+    panel = synthetic_panel(100, 1875, interval='1m')  # 5 sessions of minute bars
+
+SyntheticProvider serves the same kind of panel through the provider interface
+(see data_provider.py), so load_panel and the scanners run without Yahoo.
+"""
+
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from data_provider import empty_panel
+from ohlcv_store import FIELDS, period_range
+
+# Minutes per bar for the supported intervals (a session is 09:15 to 15:30)
+BAR_MINUTES = {'1m': 1, '5m': 5, '15m': 15, '30m': 30, '1h': 60}
+SESSION_MINUTES = 375
+SESSION_OPEN = pd.Timedelta(hours=9, minutes=15)
+TRADING_DAYS = 252
+
+DEFAULT_END = '2024-12-31'
+
+
+def bar_dates(n_bars: int, interval: str = '1d', end=DEFAULT_END) -> pd.DatetimeIndex:
+    """Timestamps of the last `n_bars` bars up to `end` (business days, NSE session for intraday)."""
+    if interval == '1d':
+        return pd.bdate_range(end=end, periods=n_bars, name='Date')
+    minutes = BAR_MINUTES[interval]
+    per_session = -(-SESSION_MINUTES // minutes)
+    days = pd.bdate_range(end=end, periods=-(-n_bars // per_session))
+    offsets = SESSION_OPEN + pd.to_timedelta(np.arange(per_session) * minutes, unit='min')
+    stamps = (days.values[:, None] + offsets.values[None, :]).ravel()
+    return pd.DatetimeIndex(stamps[-n_bars:], name='Date')
+
+
+def synthetic_arrays(n_symbols: int, n_bars: int, interval: str = '1d', seed: int = 0) -> dict:
+    """Field -> (bars x symbols) array."""
+    rng = np.random.default_rng(seed)
+    bars_per_year = TRADING_DAYS if interval == '1d' else TRADING_DAYS * -(-SESSION_MINUTES // BAR_MINUTES[interval])
+
+    # Per-symbol price level, annual drift and volatility
+    start_price = np.exp(rng.uniform(np.log(20), np.log(5000), n_symbols))
+    drift = rng.normal(0.08, 0.15, n_symbols) / bars_per_year
+    volatility = rng.uniform(0.15, 0.60, n_symbols) / np.sqrt(bars_per_year)
+
+    returns = drift + volatility * rng.standard_t(5, (n_bars, n_symbols)) * np.sqrt(3 / 5)
+    close = start_price * np.exp(np.cumsum(returns, axis=0))
+    previous = np.vstack([start_price[None, :], close[:-1]])
+    open_ = previous * np.exp(rng.normal(0, 0.3, (n_bars, n_symbols)) * volatility)
+    body_high = np.maximum(open_, close)
+    body_low = np.minimum(open_, close)
+    high = body_high * np.exp(np.abs(rng.normal(0, 0.5, (n_bars, n_symbols))) * volatility)
+    low = body_low * np.exp(-np.abs(rng.normal(0, 0.5, (n_bars, n_symbols))) * volatility)
+
+    # Volume: lognormal around a per-symbol level, heavier on big moves
+    base_volume = np.exp(rng.uniform(np.log(1e4), np.log(5e6), n_symbols)) * (bars_per_year / TRADING_DAYS) ** -1
+    move = np.abs(np.log(close / previous)) / volatility
+    volume = base_volume * np.exp(rng.normal(0, 0.4, (n_bars, n_symbols))) * (1 + 0.5 * move)
+    if interval != '1d':
+        # Busier open and close, quiet midday
+        position = np.linspace(-1, 1, -(-SESSION_MINUTES // BAR_MINUTES[interval]))
+        session_shape = 0.6 + 1.2 * position ** 2
+        volume *= np.resize(session_shape, n_bars)[::-1][:, None]
+
+    return {
+        'Open': open_, 'High': high, 'Low': low, 'Close': close, 'Adj Close': close,
+        'Volume': np.round(np.maximum(volume, 1)),
+    }
+
+
+def synthetic_panel(n_symbols: int, n_bars: int, interval: str = '1d', seed: int = 0,
+                    end=DEFAULT_END, symbols=None) -> pd.DataFrame:
+    """(Symbol, Date) panel of `n_symbols` random-walk symbols with `n_bars` bars each."""
+    symbols = list(symbols) if symbols is not None else [f"SYN{i:05d}.NS" for i in range(n_symbols)]
+    dates = bar_dates(n_bars, interval, end)
+    arrays = synthetic_arrays(len(symbols), len(dates), interval, seed)
+    index = pd.MultiIndex.from_product([symbols, dates], names=['Symbol', 'Date'])
+    return pd.DataFrame({field: arrays[field].T.ravel() for field in FIELDS}, index=index)
+
+
+def synthetic_frames(n_symbols: int, n_bars: int, interval: str = '1d', seed: int = 0) -> dict:
+    """{symbol: OHLCV frame}, the shape stock_trend.py works on."""
+    panel = synthetic_panel(n_symbols, n_bars, interval, seed)
+    return {symbol: df.droplevel('Symbol') for symbol, df in panel.groupby(level='Symbol', sort=False)}
+
+
+def bar_dates_between(start, end, interval: str = '1d') -> pd.DatetimeIndex:
+    """Timestamps of all bars in [start, end)."""
+    days = pd.bdate_range(start, pd.Timestamp(end) - pd.Timedelta(days=1))
+    if interval == '1d' or not len(days):
+        return days.rename('Date')
+    return bar_dates(len(days) * -(-SESSION_MINUTES // BAR_MINUTES[interval]), interval, days[-1])
+
+
+class SyntheticProvider:
+    """Provider with synthetic bars, deterministic per (symbol, interval, requested range)."""
+
+    def __init__(self, seed: int = 0):
+        self.seed = seed
+        self.last_failed = set()
+
+    def download(self, symbols, start=None, end=None, period=None, interval: str = '1d') -> pd.DataFrame:
+        if period is not None:
+            start, end = period_range(period)
+        dates = bar_dates_between(start, end, interval)
+        if not len(dates):
+            return empty_panel()
+        frames = []
+        for symbol in dict.fromkeys(symbols):
+            seed = zlib.crc32(f"{symbol}|{interval}|{start}".encode()) ^ self.seed
+            frames.append(synthetic_panel(1, len(dates), interval, seed=seed, end=dates[-1].normalize(),
+                                          symbols=[symbol]))
+        return pd.concat(frames)
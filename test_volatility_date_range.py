@@ -10,57 +10,31 @@ Here’s how you can construct such a composite score:
 VIS=(α⋅upward_volatitlity+β⋅downward_volatility+γ⋅Volatility) / (α + β + γ)
 """
 
-import pandas as pd
-import yfinance as yf
-import matplotlib.pyplot as plt
-import logging
 import os
 
-import numpy as np
 import pandas as pd
-
-# Function to calculate various metrics
-def calculate_metrics(data):
-    daily_returns = data.pct_change().dropna()
-    
-    
-
-    
-    # Proportion of Up and Down Movements
-    upward_volatility =  (daily_returns > 0).std()
-
-    downward_volatility = (daily_returns < 0).std()
-    
-    # Volatility
-    volatility = daily_returns.std()
-
-    # Trend
-    trend = daily_returns.sum()
-    
-    return {
-        'upward_volatility': upward_volatility,
-        'downward_volatility': downward_volatility,
-        'volatility': volatility,
-        'trend': trend
-    }
-
-# Function to calculate Volatility Impact Score (VIS)
-def calculate_vis(metrics, alpha=2, beta=2, gamma=1):
-    volatility = metrics['volatility']
-    upward_volatility = metrics['upward_volatility']
-    downward_volatility = metrics['downward_volatility']
-    vis = (alpha * volatility + beta * upward_volatility + gamma * downward_volatility) / (alpha + beta +gamma)
-
-    return vis
-
-def calculate_trend(metrics):
-    if metrics['trend'] == 0:
-        return 'flat'
-    elif metrics['trend'] > 0:
-        return 'up'
-    else:
-        return 'down'
-    
+from matplotlib.figure import Figure
+from data_provider import YahooProvider, field_matrix
+from universe import to_yahoo
+from parquet_cache import missing_symbols, write_panel, read_matrix
+from vis_engine import calculate_vis_panel
+from instrumentation import stage
+from intraday_pipeline import ingest, get_bars
+
+
+# Function to save a bar chart of the VIS of some companies. A Figure without pyplot
+# is not kept in pyplot's figure list, nothing stays open after saving
+def save_vis_chart(companies, title, file_path):
+    figure = Figure(figsize=(12, 8))  # Adjusted for better visibility
+    axes = figure.add_subplot()
+    axes.bar(companies['Company Name'], companies['VIS'], color='skyblue')
+    axes.set_xlabel('Company Name')
+    axes.set_ylabel('VIS')
+    axes.set_title(title)
+    axes.tick_params(axis='x', labelrotation=90)  # Rotate company names for better visibility
+    figure.tight_layout()  # Adjust layout to make room for label
+    with stage('report.plot'):
+        figure.savefig(file_path)
 
 
 # Suppress messages from yfinance
@@ -74,82 +48,49 @@ data = pd.read_csv(f"{csv_file}.csv")
 start_date = '2024-06-01'
 end_date = '2024-07-20'
 
-## OR define period and interval ( dynamic data, dont store in csv)
-#period = "1d"
-#interval = "1m"
-
-# Create a DataFrame to store volatilities
-volatility_data = pd.DataFrame(columns=['Company Name', 'VIS', 'Trend'])
+## Daily bars come from the Parquet cache, any other interval ("15m", "1h", ...) is
+## derived from the stored 1m bars (Yahoo keeps about a month of them)
+interval = "1d"
 
-# Directory to save CSV files of stock data
+# Directory for the results (the bars themselves go to the Parquet cache under it)
 data_directory = './stock_data/'
 if not os.path.exists(data_directory):
     os.makedirs(data_directory)
 
-# Loop through each row in the DataFrame
-for index, row in data.iterrows():
-    symbol = row['Symbol'] + ".NS"  # Appending .NS for NSE
-    company_name = row['Company Name']
-    
-    file_path = f"{data_directory}{symbol}_{start_date}_{end_date}.csv"
-
-    # Check if data already exists
-    if os.path.exists(file_path):
-        # Load stock data from CSV file
-        stock_data = pd.read_csv(file_path)
-    else:
-        # Download stock data
-        stock_data = yf.download(symbol, start=start_date, end=end_date, progress=False)
-        #stock_data = yf.download(symbol, period="1d", interval="1m", progress=False)
-        # Save to CSV
-        stock_data.to_csv(file_path)
-
-    # Calculate metrics
-    metrics = calculate_metrics(stock_data['Adj Close'])
-
-
-    # Calculate VIS 
-    vis = calculate_vis(metrics)
-
-    # Calculate Trend
-    trend = calculate_trend(metrics)
-
-    # Append to the DataFrame using concat
-    new_row = pd.DataFrame({
-        'Company Name': [company_name],
-        'VIS': [vis],
-        'Trend': [trend]
-    })
-    volatility_data = pd.concat([volatility_data, new_row], ignore_index=True)
-
-# Sort the data by VIS in ascending order and select the top 30
-volatility_data_30_least = volatility_data.sort_values(by='VIS').head(30)
-
-# Plotting
-plt.figure(figsize=(12, 8))  # Adjusted for better visibility
-plt.bar(volatility_data_30_least['Company Name'], volatility_data_30_least['VIS'], color='skyblue')
-plt.xlabel('Company Name')
-plt.ylabel('VIS')
-plt.title('30 Least Volatile Companies (VIS)')
-plt.xticks(rotation=90)  # Rotate company names for better visibility
-plt.tight_layout()  # Adjust layout to make room for label
-
-file_path = os.path.join(data_directory, "30_least_volatile_stocks.png")
-plt.savefig(file_path)
-
-
-# Sort the data by VIS in ascending order and select the top 30
-volatility_data_30_most = volatility_data.sort_values(by='VIS').tail(30)
-
-# Plotting
-plt.figure(figsize=(12, 8))  # Adjusted for better visibility
-plt.bar(volatility_data_30_most['Company Name'], volatility_data_30_most['VIS'], color='skyblue')
-plt.xlabel('Company Name')
-plt.ylabel('VIS')
-plt.title('30 Most Volatile Companies (VIS)')
-plt.xticks(rotation=90)  # Rotate company names for better visibility
-plt.tight_layout()  # Adjust layout to make room for label
-file_path = os.path.join(data_directory, "30_most_volatile_stocks.png")
-plt.savefig(file_path)
-
-volatility_data.sort_values(by='VIS').to_html(f"{data_directory}{csv_file}volatility_data.html")
\ No newline at end of file
+symbols = to_yahoo(data['Symbol'])
+if interval == "1d":
+    # Download every symbol not cached for the date range yet in batched multi-ticker requests
+    to_download = missing_symbols(symbols, start_date, end_date)
+    if to_download:
+        provider = YahooProvider()
+        panel = provider.download(to_download, start=start_date, end=end_date)
+        # Batches that failed are not marked as cached so the next run retries them
+        write_panel(panel, start=start_date, end=end_date,
+                    symbols=[symbol for symbol in to_download if symbol not in provider.last_failed])
+
+    # Load the Adj Close of every symbol into one date x symbol matrix (one memory-mapped scan)
+    prices = read_matrix(symbols, 'Adj Close', start=start_date, end=end_date)
+else:
+    # Only missing 1m bars are downloaded, coarser bars come from the resample cache
+    ingest(symbols, start=start_date, end=end_date)
+    prices = field_matrix(get_bars(symbols, interval, start=start_date, end=end_date), 'Adj Close')
+
+# Calculate metrics, VIS and Trend for every symbol in one pass
+vis_data = calculate_vis_panel(prices)
+
+# Create a DataFrame to store volatilities
+volatility_data = pd.DataFrame({
+    'Company Name': data['Company Name'],
+    'VIS': symbols.map(vis_data['VIS']),
+    'Trend': symbols.map(vis_data['Trend'])
+})
+
+# Sort the data by VIS in ascending order, chart the 30 least and the 30 most volatile
+ranked = volatility_data.sort_values(by='VIS')
+save_vis_chart(ranked.head(30), '30 Least Volatile Companies (VIS)',
+               os.path.join(data_directory, "30_least_volatile_stocks.png"))
+save_vis_chart(ranked.tail(30), '30 Most Volatile Companies (VIS)',
+               os.path.join(data_directory, "30_most_volatile_stocks.png"))
+
+with stage('report.html'):
+    volatility_data.sort_values(by='VIS').to_html(f"{data_directory}{csv_file}volatility_data.html")
\ No newline at end of file
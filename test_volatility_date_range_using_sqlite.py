@@ -10,119 +10,60 @@ Here’s how you can construct such a composite score:
 VIS=(α⋅upward_volatitlity+β⋅downward_volatility+γ⋅Volatility) / (α + β + γ)
 """
 
+import argparse
 import pandas as pd
-import yfinance as yf
-from sqlalchemy import create_engine, inspect
+from data_provider import load_panel, field_matrix
+from vis_engine import calculate_vis_panel
+from job_runner import JobRunner
+from instrumentation import stage
+from universe import load_universe, to_yahoo
 import os
 
-# Create an SQLite database engine
-engine = create_engine('sqlite:///stock_data.db')
-
-# Function to fetch stock data
-def fetch_stock_data(symbol, start_date, end_date):
-    table_name = f"{symbol}_{start_date}_{end_date}"
-    # Check if the table for the ticker exists in the database
-    if inspect(engine).has_table(table_name):
-        print(f"Fetching {symbol} data from the database...")
-        df = pd.read_sql(table_name, con=engine)
-    else:
-        print(f"Fetching {symbol} data from Yahoo Finance...")
-        df = yf.download(symbol, start=start_date, end=end_date)
-        df.to_sql(table_name, con=engine, index=True, if_exists='replace')
-    return df
-
-# Function to calculate various metrics
-def calculate_metrics(data):
-    daily_returns = data.pct_change().dropna()
-
-    # Proportion of Up and Down Movements
-
-    upward_volatility = (daily_returns > 0).std()
-    downward_volatility = (daily_returns < 0).std()
-
-    # Volatility
-    volatility = daily_returns.std()
-
-    # Trend
-    trend = daily_returns.sum()
-
-    return {
-        'upward_volatility': upward_volatility,
-        'downward_volatility': downward_volatility,
-        'volatility': volatility,
-        'trend': trend
-    }
-
-# Function to calculate Volatility Impact Score (VIS)
-def calculate_vis(metrics, alpha=2, beta=2, gamma=1):
-    volatility = metrics['volatility']
-    upward_volatility = metrics['upward_volatility']
-    downward_volatility = metrics['downward_volatility']
-    vis = (alpha * volatility + beta * upward_volatility + gamma * downward_volatility) / (alpha + beta + gamma)
-    return vis
-
-def calculate_trend(metrics):
-    if metrics['trend'] == 0:
-        return 'flat'
-    elif metrics['trend'] > 0:
-        return 'up'
-    else:
-        return 'down'
+parser = argparse.ArgumentParser(description="VIS of every listed symbol, resumable through the job tables")
+parser.add_argument('--retry-failed', action='store_true', help='run the symbols that failed earlier today again')
+args = parser.parse_args()
 
 # Suppress messages from yfinance
 #logging.getLogger('yfinance').setLevel(logging.ERROR)
 # csv_file = "NSE_large_midcap_250"
 csv_files = ["NSE_small_cap_list", "NSE_large_midcap_250"]
 
-# Initialize an empty list to store the DataFrames
-dataframes = []
-
-# Loop through the list of CSV files and read each one into a DataFrame
-for file in csv_files:
-    df = pd.read_csv(f"{file}.csv")
-    dataframes.append(df)
-
-# Concatenate all the DataFrames in the list into a single DataFrame
-combined_df = pd.concat(dataframes, ignore_index=True)
+# All the listed files, symbols in more than one of them only once
+combined_df = load_universe(csv_files)
 
 # Define the date range
 start_date = '2024-06-01'
 end_date = '2024-07-20'
 
-# Create a DataFrame to store volatilities
-volatility_data = pd.DataFrame(columns=['Company Name', 'VIS', 'Trend'])
-
-# Loop through each row in the DataFrame
-for index, row in combined_df.iterrows():
-    symbol = row['Symbol'] + ".NS"  # Appending .NS for NSE
-    company_name = row['Company Name']
-
-    # Fetch stock data
-    stock_data = fetch_stock_data(symbol, start_date, end_date)
+# Fetch all symbols in batches, only bars missing from the store are downloaded
+symbols = to_yahoo(combined_df['Symbol'])
 
-    # Calculate metrics
-    metrics = calculate_metrics(stock_data['Adj Close'])
 
-    # Calculate VIS
-    vis = calculate_vis(metrics)
+# Function to calculate metrics, VIS and Trend for one batch of symbols
+def compute_vis(batch):
+    panel = load_panel(batch, start_date, end_date)
+    vis_data = calculate_vis_panel(field_matrix(panel, 'Adj Close')).dropna(subset=['VIS'])
+    return {symbol: {'VIS': row['VIS'], 'Trend': row['Trend']} for symbol, row in vis_data.iterrows()}
 
-    # Calculate Trend
-    trend = calculate_trend(metrics)
 
-    # Append to the DataFrame using concat
-    new_row = pd.DataFrame({
-        'Company Name': [company_name],
-        'VIS': [vis],
-        'Trend': [trend],
-        'Start Date': [start_date],
-        'End Date': [end_date]
-    })
-    volatility_data = pd.concat([volatility_data, new_row], ignore_index=True)
+# Symbols already processed today are read back, a failing symbol is recorded and skipped
+runner = JobRunner('volatility', params={'symbols': csv_files, 'start': start_date, 'end': end_date},
+                   columns=['VIS', 'Trend'])
+vis_data = runner.run(symbols.tolist(), compute_vis, batch_size=100, retry_failed=args.retry_failed)
 
+# Create a DataFrame to store volatilities
+volatility_data = pd.DataFrame({
+    'Company Name': combined_df['Company Name'],
+    'VIS': symbols.map(vis_data['VIS']),
+    'Trend': symbols.map(vis_data['Trend']),
+    'Start Date': start_date,
+    'End Date': end_date
+})
 
 
 data_directory = "./stock_data/"
 if not os.path.isdir(data_directory):
     os.mkdir(data_directory)
 
-volatility_data.sort_values(by='VIS').to_html(f"{data_directory}{"-".join(csv_files)}volatility_data.html")
\ No newline at end of file
+with stage('report.html'):
+    volatility_data.sort_values(by='VIS').to_html(f"{data_directory}{"-".join(csv_files)}volatility_data.html")
\ No newline at end of file
@@ -0,0 +1,97 @@
+import time
+import asyncio
+
+from alert_dispatcher import AlertDispatcher
+
+
+class RecordingSink:
+    """Keeps every delivery (a list of alerts) and when it arrived."""
+
+    name = 'recording'
+
+    def __init__(self):
+        self.deliveries = []
+        self.times = []
+
+    async def send(self, alerts):
+        self.deliveries.append([alert.message for alert in alerts])
+        self.times.append(time.monotonic())
+
+
+class SlowSink:
+    name = 'slow'
+
+    async def send(self, alerts):
+        await asyncio.sleep(10)
+
+
+def test_full_queue_drops_the_oldest_alert():
+    async def run():
+        sink = RecordingSink()
+        dispatcher = AlertDispatcher([sink], max_queue=3, coalesce=0.01)
+        for i in range(5):
+            dispatcher.submit(f"T{i}", f"alert {i}")
+        assert dispatcher.dropped == 2
+        await dispatcher.start()
+        await dispatcher.close()
+        return sink
+
+    sink = asyncio.run(run())
+    assert sink.deliveries == [['alert 2', 'alert 3', 'alert 4']]
+
+
+def test_alerts_within_the_window_are_delivered_together():
+    async def run():
+        sink = RecordingSink()
+        dispatcher = await AlertDispatcher([sink], coalesce=0.1).start()
+        dispatcher.submit('AAA', 'alert 1')
+        await asyncio.sleep(0.02)
+        dispatcher.submit('BBB', 'alert 2')
+        dispatcher.submit('AAA', 'alert 1')     # repeat of a queued message, folded
+        await dispatcher.flush()
+        # Outside the window: a delivery of its own
+        await asyncio.sleep(0.05)
+        dispatcher.submit('CCC', 'alert 3')
+        await dispatcher.close()
+        return sink, dispatcher
+
+    sink, dispatcher = asyncio.run(run())
+    assert sink.deliveries == [['alert 1', 'alert 2'], ['alert 3']]
+    assert dispatcher.delivered == 3 and dispatcher.suppressed == 1
+
+
+def test_ticker_is_rate_limited():
+    async def run():
+        sink = RecordingSink()
+        now = [0.0]
+        dispatcher = await AlertDispatcher([sink], rate_limit=60, coalesce=0.01, clock=lambda: now[0]).start()
+        dispatcher.submit('AAA', 'alert 1')
+        await dispatcher.flush()
+        now[0] = 30.0
+        dispatcher.submit('AAA', 'alert 2')
+        dispatcher.submit('BBB', 'alert 3')
+        await dispatcher.flush()
+        now[0] = 61.0
+        dispatcher.submit('AAA', 'alert 4')
+        await dispatcher.close()
+        return sink, dispatcher
+
+    sink, dispatcher = asyncio.run(run())
+    assert sink.deliveries == [['alert 1'], ['alert 3'], ['alert 4']]
+    assert dispatcher.suppressed == 1
+
+
+def test_slow_sink_times_out_without_holding_up_the_others(capsys):
+    async def run():
+        sink = RecordingSink()
+        dispatcher = await AlertDispatcher([SlowSink(), sink], coalesce=0.01, sink_timeout=0.2).start()
+        start = time.monotonic()
+        dispatcher.submit('AAA', 'alert 1')
+        await dispatcher.close()
+        return sink, start, time.monotonic()
+
+    sink, start, end = asyncio.run(run())
+    assert sink.deliveries == [['alert 1']]
+    assert sink.times[0] - start < 0.15       # delivered before the slow sink timed out
+    assert end - start < 1.0
+    assert 'Alert sink slow failed: TimeoutError' in capsys.readouterr().out
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from alert_rules import parse, _dnf, _conjunction_count, RuleMonitor, MAX_CONJUNCTIONS
+from ring_buffer import RingBuffers
+from synthetic_data import synthetic_arrays
+
+
+def test_conjunction_count_matches_expansion():
+    for text in ["RSI crosses 30", "Close > UpperBand or RSI < 30",
+                 "(RSI > 50 or Close > SMA_20) and not (MACD crossover or Volume_Spike)",
+                 "not ((RSI > 1 and RSI > 2) or (RSI > 3 and (RSI > 4 or RSI > 5)))"]:
+        node = parse(text)
+        assert _conjunction_count(node) == len(_dnf(node))
+
+
+def test_exponential_rules_are_rejected():
+    clause = "(RSI > 10 or Close > 20)"
+    parse(" and ".join([clause] * 8))   # 256 conjunctions
+    with pytest.raises(ValueError, match=str(MAX_CONJUNCTIONS)):
+        parse(" and ".join([clause] * 9))
+
+
+def test_checking_updated_rings_only_equals_checking_all():
+    tickers = [f"T{i}" for i in range(6)]
+    arrays = synthetic_arrays(len(tickers), 120, interval='15m', seed=4)
+    bars = np.stack([arrays[field] for field in ['Open', 'High', 'Low', 'Close', 'Volume']], axis=-1)
+    rules = {ticker: ["RSI crosses 50", "Close > EMA_20 and MACD crossover", "Close < SMA_20"] for ticker in tickers}
+    every, updated_only = RuleMonitor(), RuleMonitor()
+    every.set_rules(rules)
+    updated_only.set_rules(rules)
+
+    buffers = RingBuffers()
+    rng = np.random.default_rng(0)
+    positions = np.zeros(len(tickers), dtype=int)
+    for _ in range(150):
+        # A random subset of tickers gets its next bar each cycle
+        updated = [ticker for column, ticker in enumerate(tickers) if rng.random() < 0.4 and positions[column] < 120]
+        for ticker in updated:
+            column = tickers.index(ticker)
+            buffers.extend(ticker, [positions[column] * 900], bars[positions[column], column][None, :])
+            positions[column] += 1
+        assert sorted(every.check_buffers(buffers)) == sorted(updated_only.check_buffers(buffers, updated))
+    assert (every.active == updated_only.active).all()
@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+
+from backtest import indicator_panel, trend_positions, breakout_positions, run_backtest, previous_bars
+from data_provider import field_matrix
+from synthetic_data import synthetic_panel
+
+
+def gapped_panel():
+    # SYN00001.NS misses every fifth date the other symbol traded on
+    panel = synthetic_panel(2, 200, seed=5)
+    dates = panel.index.unique('Date')
+    missing = panel.index.isin([('SYN00001.NS', date) for date in dates[::5]])
+    return panel[~missing]
+
+
+def test_no_positions_during_warm_up():
+    panel = indicator_panel(synthetic_panel(3, 120, seed=2))
+    positions = trend_positions(panel, long_only=False)
+    assert (positions.iloc[:49] == 0).all().all()
+    assert (positions.iloc[60:] != 0).any().any()
+
+
+def test_previous_bars():
+    valid = np.array([[False, True], [True, False], [False, True], [True, True]])
+    assert previous_bars(valid).tolist() == [[-1, -1], [-1, 0], [1, 0], [1, 2]]
+
+
+def test_symbols_trade_on_their_own_bars():
+    price_panel = gapped_panel()
+    panel = indicator_panel(price_panel)
+    for strategy in (trend_positions, breakout_positions):
+        positions = strategy(panel)
+        result = run_backtest(positions, field_matrix(price_panel, 'Adj Close'))
+
+        # The gapped symbol alone, on its own calendar
+        alone = price_panel.loc[['SYN00001.NS']]
+        alone_positions = strategy(indicator_panel(alone))
+        expected = run_backtest(alone_positions, field_matrix(alone, 'Adj Close'))
+        returns = result['returns']['SYN00001.NS'].dropna()
+        pd.testing.assert_series_equal(returns, expected['returns']['SYN00001.NS'].dropna(), check_freq=False)
+        assert np.isclose(result['stats'].loc['SYN00001.NS', 'Turnover'],
+                          expected['stats'].loc['SYN00001.NS', 'Turnover'])
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import yfinance
+
+from data_provider import YahooProvider, fetch_missing, empty_panel
+from ohlcv_store import get_engine, missing_ranges
+from synthetic_data import synthetic_panel
+
+
+# Function to fake a grouped yf.download: AAA and BBB have bars, CCC is all NaN, DDD is left out
+def fake_download(tickers, **kwargs):
+    dates = pd.bdate_range('2024-06-03', periods=5, name='Date')
+    columns = {}
+    for ticker in tickers:
+        if ticker == 'DDD':
+            continue
+        for field in ['Open', 'High', 'Low', 'Close', 'Adj Close', 'Volume']:
+            columns[(ticker, field)] = np.nan if ticker == 'CCC' else np.arange(5.0) + 10
+    return pd.DataFrame(columns, index=dates)
+
+
+def test_tickers_without_rows_are_failed(monkeypatch):
+    calls = []
+    monkeypatch.setattr(yfinance, 'download', lambda tickers, **kwargs: calls.append(tickers) or fake_download(tickers))
+    provider = YahooProvider(batch_size=2, min_interval=0)
+    panel = provider.download(['AAA', 'BBB', 'CCC', 'DDD'], start='2024-06-03', end='2024-06-08')
+    assert sorted(panel.index.unique('Symbol')) == ['AAA', 'BBB']
+    assert provider.last_failed == {'CCC', 'DDD'}
+    assert calls == [['AAA', 'BBB'], ['CCC', 'DDD']]
+
+
+class EmptyForProvider:
+    """Bars for every symbol but the ones in `empty`."""
+
+    def __init__(self, empty):
+        self.empty = set(empty)
+        self.last_failed = set()
+
+    def download(self, symbols, start=None, end=None, period=None, interval='1d'):
+        symbols = [symbol for symbol in symbols if symbol not in self.empty]
+        if not symbols:
+            return empty_panel()
+        dates = pd.bdate_range(start, pd.Timestamp(end) - pd.Timedelta(days=1))
+        return synthetic_panel(len(symbols), len(dates), end=dates[-1], symbols=symbols)
+
+
+def test_coverage_only_for_symbols_with_bars(tmp_path):
+    engine = get_engine(f"sqlite:///{tmp_path / 'store.db'}")
+    start, end = pd.Timestamp('2024-06-03'), pd.Timestamp('2024-06-15')
+    fetch_missing(['AAA', 'BBB'], start, end, provider=EmptyForProvider(['BBB']), engine=engine)
+    assert missing_ranges('AAA', '1d', start, end, engine=engine) == []
+    assert missing_ranges('BBB', '1d', start, end, engine=engine) == [(start.date(), end.date())]
+
+
+def test_weekend_chunk_is_covered_without_download(tmp_path):
+    engine = get_engine(f"sqlite:///{tmp_path / 'store.db'}")
+    start, end = pd.Timestamp('2024-06-08'), pd.Timestamp('2024-06-10')
+    provider = EmptyForProvider(['AAA', 'BBB'])
+    provider.download = None  # a download call would fail the test
+    fetch_missing(['AAA', 'BBB'], start, end, provider=provider, engine=engine)
+    assert missing_ranges('AAA', '1d', start, end, engine=engine) == []
+    assert missing_ranges('BBB', '1d', start, end, engine=engine) == []
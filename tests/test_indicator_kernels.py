@@ -0,0 +1,84 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from indicator_kernels import indicator_arrays, INDICATORS
+from synthetic_data import synthetic_panel
+from data_provider import field_matrix
+
+# 160 bars with a flat stretch of zero range bars (70..94) and single zero range bars, and the
+# pandas_ta 0.3.14b definitions of every indicator written out with pandas rolling / ewm
+# (Bollinger Bands with a two-pass population std)
+REFERENCE = os.path.join(os.path.dirname(__file__), 'data', 'indicator_reference.csv')
+
+
+def reference():
+    return pd.read_csv(REFERENCE, index_col='Date', parse_dates=True)
+
+
+def assert_matches(indicators, expected, atol=1e-9, columns=INDICATORS):
+    for column in columns:
+        np.testing.assert_allclose(np.asarray(indicators[column], dtype=float),
+                                   expected[column].to_numpy(dtype=float),
+                                   rtol=1e-9, atol=atol, err_msg=column)
+
+
+def test_matches_reference_values():
+    expected = reference()
+    indicators = indicator_arrays(expected['High'], expected['Low'], expected['Close'], expected['Volume'])
+    assert_matches(indicators, expected)
+    # Windows inside the flat stretch have bands of width 0
+    assert (indicators['UpperBand'][89:95] == indicators['MiddleBand'][89:95]).all()
+
+
+def test_matches_pandas_ta():
+    ta = pytest.importorskip('pandas_ta')
+    stock_data = reference()[['Open', 'High', 'Low', 'Close', 'Volume']]
+    close, high, low = stock_data['Close'], stock_data['High'], stock_data['Low']
+    bbands = ta.bbands(close, length=20, std=2)
+    macd = ta.macd(close, fast=12, slow=26, signal=9)
+    adx = ta.adx(high, low, close, length=14)
+    expected = pd.DataFrame({
+        'SMA_20': ta.sma(close, length=20), 'SMA_50': ta.sma(close, length=50),
+        'EMA_20': ta.ema(close, length=20), 'EMA_50': ta.ema(close, length=50),
+        'MiddleBand': bbands['BBM_20_2.0'], 'UpperBand': bbands['BBU_20_2.0'], 'LowerBand': bbands['BBL_20_2.0'],
+        'RSI': ta.rsi(close, length=14),
+        'MACD': macd['MACD_12_26_9'], 'Signal_Line': macd['MACDs_12_26_9'],
+        'ATR': ta.atr(high, low, close, length=14),
+        'OBV': ta.obv(close, stock_data['Volume']),
+        'Plus_DI': adx['DMP_14'], 'Minus_DI': adx['DMN_14'], 'ADX': adx['ADX_14'],
+        'Volume_Spike': stock_data['Volume'] > 2 * stock_data['Volume'].rolling(window=20).mean(),
+    })
+    indicators = indicator_arrays(high, low, close, stock_data['Volume'])
+    bands = ['UpperBand', 'LowerBand']
+    assert_matches(indicators, expected, columns=[column for column in INDICATORS if column not in bands])
+    # pandas' online rolling variance leaves rounding noise on the flat windows
+    assert_matches(indicators, expected, atol=1e-4, columns=bands)
+
+
+def test_packed_matrix_equals_per_symbol_calls():
+    panel = synthetic_panel(4, 150, seed=11)
+    dates = panel.index.unique('Date')
+    # Missing bars: a late listing, a delisting, scattered gaps and a symbol without any bar
+    drop = [('SYN00000.NS', date) for date in dates[:40]]
+    drop += [('SYN00001.NS', date) for date in dates[110:]]
+    drop += [('SYN00002.NS', date) for date in dates[5::7]]
+    drop += [('SYN00003.NS', date) for date in dates]
+    panel = panel[~panel.index.isin(drop)]
+    symbols = [f"SYN{i:05d}.NS" for i in range(4)]
+    fields = {field: field_matrix(panel, field).reindex(index=dates, columns=symbols)
+              for field in ['High', 'Low', 'Close', 'Volume']}
+    matrix = indicator_arrays(*(fields[field].to_numpy() for field in ['High', 'Low', 'Close', 'Volume']))
+
+    for column, symbol in enumerate(fields['Close'].columns):
+        rows = fields['Close'][symbol].notna().to_numpy()
+        single = indicator_arrays(*(fields[field][symbol].to_numpy()[rows] for field in ['High', 'Low', 'Close', 'Volume']))
+        for name in INDICATORS:
+            np.testing.assert_allclose(matrix[name][rows, column], single[name], rtol=1e-12, atol=1e-12,
+                                       err_msg=f"{symbol} {name}")
+            if name == 'Volume_Spike':
+                assert not matrix[name][~rows, column].any()
+            else:
+                assert np.isnan(matrix[name][~rows, column]).all()
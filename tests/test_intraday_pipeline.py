@@ -0,0 +1,50 @@
+import pandas as pd
+import pytest
+
+from synthetic_data import synthetic_panel
+from ohlcv_store import get_engine, read_bars, write_bars
+from intraday_pipeline import BASE_INTERVAL, get_bars, resample_panel
+
+SYMBOLS = ['AAA.NS', 'BBB.NS']
+
+
+def minutes():
+    # Three sessions of 1m bars
+    return synthetic_panel(len(SYMBOLS), 3 * 375, interval='1m', seed=4, symbols=SYMBOLS)
+
+
+def store(panel, engine):
+    for symbol, df in panel.groupby(level='Symbol'):
+        write_bars(symbol, BASE_INTERVAL, df.droplevel('Symbol'), engine=engine)
+
+
+def full_resample(interval, engine):
+    return resample_panel(read_bars(SYMBOLS, BASE_INTERVAL, engine=engine), interval)
+
+
+@pytest.mark.parametrize('interval', ['15m', '1h', '1d'])
+def test_incremental_resample_matches_full_resample(tmp_path, interval):
+    engine = get_engine(f"sqlite:///{tmp_path / 'store.db'}")
+    panel = minutes()
+    dates = panel.index.get_level_values('Date').unique()
+    # Splits land inside a 15m and a 1h bin (10:55, 14:07) and on the next session's open
+    splits = [dates[100], dates[375 + 292], dates[750], dates[-1] + pd.Timedelta(minutes=1)]
+    previous = dates[0]
+    for split in splits:
+        chunk = panel[(panel.index.get_level_values('Date') >= previous) & (panel.index.get_level_values('Date') < split)]
+        store(chunk, engine)
+        bars = get_bars(SYMBOLS, interval, engine=engine)
+        pd.testing.assert_frame_equal(bars, full_resample(interval, engine), check_dtype=False, check_freq=False)
+        previous = split
+
+
+def test_backfilled_minutes_rebuild(tmp_path):
+    engine = get_engine(f"sqlite:///{tmp_path / 'store.db'}")
+    panel = minutes()
+    later = panel.index.get_level_values('Date') >= panel.index.get_level_values('Date').unique()[375]
+    store(panel[later], engine)
+    get_bars(SYMBOLS, '15m', engine=engine)
+    store(panel[~later], engine)
+    bars = get_bars(SYMBOLS, '15m', engine=engine)
+    pd.testing.assert_frame_equal(bars, full_resample('15m', engine), check_dtype=False, check_freq=False)
+    assert len(bars) == len(SYMBOLS) * 3 * 25
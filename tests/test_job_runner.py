@@ -0,0 +1,36 @@
+from job_runner import JobRunner
+from ohlcv_store import get_engine
+
+
+def runner(tmp_path):
+    return JobRunner('test', params={'day': 1}, engine=get_engine(f"sqlite:///{tmp_path / 'jobs.db'}"),
+                     columns=['VIS', 'Trend'])
+
+
+def test_results_without_rows_have_the_columns(tmp_path):
+    results = runner(tmp_path).run(['AAA', 'BBB'], lambda batch: {})
+    assert list(results.columns) == ['VIS', 'Trend']
+    assert list(results.index) == ['AAA', 'BBB']
+    assert results['VIS'].isna().all()
+
+
+def test_failed_symbols_run_again_with_retry_failed(tmp_path):
+    calls = []
+
+    def compute(batch):
+        calls.append(list(batch))
+        if 'BBB' in batch and len(calls) < 4:
+            raise ValueError('no bars')
+        return {symbol: {'VIS': 1.0, 'Trend': 'up'} for symbol in batch}
+
+    results = runner(tmp_path).run(['AAA', 'BBB'], compute)
+    assert calls == [['AAA', 'BBB'], ['AAA'], ['BBB']]
+    assert results['VIS'].isna().tolist() == [False, True]
+    assert runner(tmp_path).status().loc['BBB', 'Status'] == 'failed'
+
+    # Finished symbols are read back, failed ones only run again when asked to
+    runner(tmp_path).run(['AAA', 'BBB'], compute)
+    assert len(calls) == 3
+    results = runner(tmp_path).run(['AAA', 'BBB'], compute, retry_failed=True)
+    assert calls[-1] == ['BBB']
+    assert results['VIS'].tolist() == [1.0, 1.0]
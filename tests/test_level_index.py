@@ -0,0 +1,81 @@
+import json
+
+import pytest
+
+from synthetic_data import synthetic_frames
+from level_index import LevelIndex, LevelStore
+from ohlcv_store import get_engine
+
+
+def stock_data(symbol=0):
+    return list(synthetic_frames(3, 400, seed=5).values())[symbol]
+
+
+def entries(index):
+    return sorted(zip(index.prices, index.kinds, index.dates))
+
+
+@pytest.mark.parametrize('split, chunk', [(1, 1), (20, 7), (200, 50), (390, 3)])
+def test_update_matches_full_history(split, chunk):
+    df = stock_data()
+    full = LevelIndex.from_history(df)
+    levels = LevelIndex.from_history(df.iloc[:split])
+    for start in range(split, len(df), chunk):
+        levels.update(df.iloc[start:start + chunk])
+    assert len(full) > 0
+    assert entries(levels) == entries(full)
+    assert levels.tail == full.tail and levels.bars == full.bars
+    assert levels.recent() == full.recent()
+    assert levels.clusters() == full.clusters()
+
+
+def test_update_skips_bars_already_indexed():
+    df = stock_data(1)
+    levels = LevelIndex.from_history(df.iloc[:300])
+    assert levels.update(df.iloc[250:]) == 100
+    assert entries(levels) == entries(LevelIndex.from_history(df))
+
+
+def test_support_and_resistance_sides():
+    levels = LevelIndex.from_history(stock_data(2))
+    close = levels.last_close
+    support, resistance = levels.support(), levels.resistance()
+    assert support.price <= close < resistance.price
+    every = levels.levels()['price']
+    assert support.price == every[every <= close].max()
+    assert resistance.price == every[every > close].min()
+
+    # Only one kind, and a price below every level has no support
+    low = levels.support(kinds={'min'})
+    assert low.kind == 'min' and low.price == max(p for p, k in zip(levels.prices, levels.kinds) if k == 'min' and p <= close)
+    assert levels.support(every.min() - 1) is None
+    assert levels.resistance(every.max()) is None
+
+
+def test_state_roundtrip():
+    df = stock_data()
+    levels = LevelIndex.from_history(df.iloc[:350])
+    restored = LevelIndex.from_state(json.loads(json.dumps(levels.to_state())))
+    assert entries(restored) == entries(levels)
+    assert restored.tail == levels.tail and restored.bars == levels.bars
+    assert restored.support() == levels.support() and restored.resistance() == levels.resistance()
+
+    restored.update(df.iloc[350:])
+    assert entries(restored) == entries(LevelIndex.from_history(df))
+
+
+def test_store_save_and_load(tmp_path):
+    engine = get_engine(f"sqlite:///{tmp_path / 'store.db'}")
+    frames = synthetic_frames(3, 400, seed=5)
+    store = LevelStore()
+    for symbol, df in frames.items():
+        store.update(symbol, df)
+    store.save(engine=engine)
+
+    loaded = LevelStore.load(list(frames)[:2], engine=engine)
+    assert len(loaded) == 2
+    for symbol in list(frames)[:2]:
+        assert entries(loaded[symbol]) == entries(store[symbol])
+    # Indexes built with another order are not reused
+    assert len(LevelStore.load(engine=engine, order=3)) == 0
+    assert list(store.near_resistance(100.0)['Symbol']) != []
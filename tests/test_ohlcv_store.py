@@ -0,0 +1,60 @@
+from datetime import date, timedelta
+
+import pandas as pd
+
+from ohlcv_store import get_engine, fetch_bars, missing_ranges, record_coverage, coverage_end, non_trading_span
+
+
+def bars(start, end):
+    dates = pd.bdate_range(start, pd.Timestamp(end) - pd.Timedelta(days=1), name='Date')
+    return pd.DataFrame({'Open': 1.0, 'High': 1.0, 'Low': 1.0, 'Close': 1.0, 'Volume': 100.0}, index=dates)
+
+
+def test_empty_download_is_not_covered(tmp_path):
+    engine = get_engine(f"sqlite:///{tmp_path / 'store.db'}")
+    start, end = date(2024, 6, 3), date(2024, 6, 15)
+    fetch_bars('AAA', start, end, download=lambda *args: pd.DataFrame(), engine=engine)
+    assert missing_ranges('AAA', '1d', start, end, engine=engine) == [(start, end)]
+
+    stock_data = fetch_bars('AAA', start, end, download=lambda symbol, s, e, interval: bars(s, e), engine=engine)
+    assert len(stock_data) == 10
+    assert missing_ranges('AAA', '1d', start, end, engine=engine) == []
+
+
+def test_weekend_span_is_covered_without_bars(tmp_path):
+    engine = get_engine(f"sqlite:///{tmp_path / 'store.db'}")
+    saturday, monday = date(2024, 6, 8), date(2024, 6, 10)
+    assert non_trading_span(saturday, monday)
+    assert not non_trading_span(saturday, monday + timedelta(days=1))
+    fetch_bars('AAA', saturday, monday, download=lambda *args: pd.DataFrame(), engine=engine)
+    assert missing_ranges('AAA', '1d', saturday, monday, engine=engine) == []
+
+
+def test_holiday_between_stored_ranges_is_covered(tmp_path):
+    engine = get_engine(f"sqlite:///{tmp_path / 'store.db'}")
+    start, holiday, end = date(2024, 6, 3), date(2024, 6, 17), date(2024, 6, 28)   # Bakri Id, a Monday
+    empty = lambda *args: pd.DataFrame()
+
+    # Only the days before are stored: the empty day might be a failure, asked for again
+    record_coverage('AAA', '1d', start, holiday, engine=engine)
+    fetch_bars('AAA', start, holiday + timedelta(days=1), download=empty, engine=engine)
+    assert missing_ranges('AAA', '1d', start, end, engine=engine) == [(holiday, end)]
+
+    record_coverage('AAA', '1d', holiday + timedelta(days=1), end, engine=engine)
+    fetch_bars('AAA', start, end, download=empty, engine=engine)
+    assert missing_ranges('AAA', '1d', start, end, engine=engine) == []
+
+
+def test_long_empty_gap_is_not_covered(tmp_path):
+    engine = get_engine(f"sqlite:///{tmp_path / 'store.db'}")
+    record_coverage('AAA', '1d', date(2024, 6, 3), date(2024, 6, 10), engine=engine)
+    record_coverage('AAA', '1d', date(2024, 6, 24), date(2024, 6, 28), engine=engine)
+    fetch_bars('AAA', date(2024, 6, 3), date(2024, 6, 28), download=lambda *args: pd.DataFrame(), engine=engine)
+    assert missing_ranges('AAA', '1d', date(2024, 6, 3), date(2024, 6, 28), engine=engine) == \
+        [(date(2024, 6, 10), date(2024, 6, 24))]
+
+
+def test_coverage_stops_before_today():
+    today = date.today()
+    assert coverage_end(today + timedelta(days=1)) == today
+    assert coverage_end(today - timedelta(days=3)) == today - timedelta(days=3)
@@ -0,0 +1,35 @@
+import numpy as np
+
+from pattern_engine import classify_windows, PATTERNS
+
+
+# Function to build a flat base, a 30% pole over `pole_bars` and a slightly falling zigzag flag
+def pole_and_flag(pole_bars, flag_window):
+    base = np.full(40, 100.0)
+    pole = np.linspace(100, 130, pole_bars + 1)[1:]
+    bars = np.arange(flag_window)
+    flag = 130 - 0.05 * bars + np.where(bars % 4 < 2, 0.6, -0.6)
+    return np.concatenate([base, pole, flag])
+
+
+def test_bull_flag_pole_measured_before_the_flag():
+    # A 20% pole test only passes when the whole pole is measured: from pole_bars
+    # before the flag up to the flag's first bar
+    for pole_bars, flag_window in [(20, 8), (25, 10), (8, 15)]:
+        close = pole_and_flag(pole_bars, flag_window)
+        codes, quality = classify_windows(close[:, None], flag_window=flag_window,
+                                          pole_bars=pole_bars, pole_move=0.2)
+        assert PATTERNS[codes[-1, 0]] == 'Bull Flag', (pole_bars, flag_window)
+        assert quality[-1, 0] > 0
+
+
+def test_no_flag_without_a_pole():
+    close = pole_and_flag(20, 8)[-28:]
+    close[:20] = close[20]
+    codes, _ = classify_windows(close[:, None], flag_window=8, pole_bars=20, pole_move=0.2)
+    assert PATTERNS[codes[-1, 0]] != 'Bull Flag'
+
+
+def test_series_shorter_than_pole_and_flag():
+    codes, _ = classify_windows(np.linspace(100, 130, 20)[:, None], flag_window=15, pole_bars=15)
+    assert codes.shape == (20, 1)
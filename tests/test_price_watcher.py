@@ -0,0 +1,59 @@
+import asyncio
+import threading
+
+import pytest
+
+from price_watcher import PriceWatcher, SimulatedQuoteSource
+from ring_buffer import RingBuffers
+
+
+class RecordingSource(SimulatedQuoteSource):
+    """Simulated bars that record how many requests ran at the same time."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.lock = threading.Lock()
+        self.running = 0
+        self.most_running = 0
+        self.batches = []
+
+    def fetch_bars(self, tickers, since=None):
+        with self.lock:
+            self.running += 1
+            self.most_running = max(self.most_running, self.running)
+        try:
+            self.batches.append(list(tickers))
+            return super().fetch_bars(tickers, since)
+        finally:
+            with self.lock:
+                self.running -= 1
+
+
+def test_batches_run_one_after_another():
+    source = RecordingSource(seed=1)
+    prices = {}
+    now = [0.0]
+    watcher = PriceWatcher(source, on_price=prices.__setitem__, batch_size=3, buffers=RingBuffers(),
+                           clock=lambda: now[0])
+    tickers = [f"T{i}" for i in range(10)]
+    watcher.set_tickers(tickers)
+    now[0] = 60.0
+    assert asyncio.run(watcher.run_cycle()) == 10
+    assert [len(batch) for batch in source.batches] == [3, 3, 3, 1]
+    assert source.most_running == 1
+    assert watcher.requests == 4
+    assert sorted(prices) == tickers
+    assert all(len(watcher.buffers[ticker]) == 1 for ticker in tickers)
+    assert watcher.updated == set(tickers)
+    # Nothing due, nothing updated
+    asyncio.run(watcher.run_cycle())
+    assert watcher.updated == set()
+
+
+def test_buffers_need_a_bar_source():
+    class QuotesOnly:
+        def fetch(self, tickers):
+            return {}
+
+    with pytest.raises(ValueError):
+        PriceWatcher(QuotesOnly(), on_price=print, buffers=RingBuffers())
@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from synthetic_data import synthetic_panel
+from data_provider import field_matrix
+from vis_engine import calculate_vis_panel
+from rolling_vis import RollingVIS, METRICS
+
+
+def prices():
+    matrix = field_matrix(synthetic_panel(5, 260, seed=11), 'Adj Close')
+    # Gapped symbols: listed late, delisted early, missing days in between
+    matrix.iloc[:40, 1] = np.nan
+    matrix.iloc[-30:, 2] = np.nan
+    matrix.iloc[100:103, 3] = np.nan
+    matrix.iloc[::7, 4] = np.nan
+    return matrix
+
+
+def assert_same(result, expected):
+    for name in METRICS:
+        np.testing.assert_allclose(result[name].to_numpy(), expected[name].to_numpy(), rtol=1e-7, atol=1e-12,
+                                   err_msg=name)
+    assert list(result['Trend']) == list(expected['Trend'])
+
+
+@pytest.mark.parametrize('start, end', [(None, None), (10, 60), (35, 45), (95, 110), (200, 259), (230, 259), (50, 50)])
+def test_range_matches_calculate_vis_panel(start, end):
+    matrix = prices()
+    rolling = RollingVIS(matrix)
+    start = None if start is None else matrix.index[start]
+    end = None if end is None else matrix.index[end]
+    assert_same(rolling.range(start, end), calculate_vis_panel(matrix.loc[start:end]))
+
+
+def test_range_between_dates():
+    # Bounds that are no trading day select the days inside them, like .loc
+    matrix = prices()
+    start, end = matrix.index[20] + pd.Timedelta(hours=12), matrix.index[80] - pd.Timedelta(hours=12)
+    assert_same(RollingVIS(matrix).range(start, end), calculate_vis_panel(matrix.loc[start:end]))
+
+
+def test_extend_and_save_load_match_full_build(tmp_path):
+    matrix = prices()
+    rolling = RollingVIS(matrix.iloc[:90])
+    assert rolling.extend(matrix.iloc[80:150]) == 60
+    path = str(tmp_path / 'rolling_vis.npz')
+    rolling.save(path)
+    rolling = RollingVIS.load(path)
+    assert rolling.extend(matrix.iloc[150:]) == 110
+
+    full = RollingVIS(matrix)
+    assert rolling.dates.equals(full.dates) and rolling.symbols.equals(full.symbols)
+    np.testing.assert_allclose(rolling.prefix, full.prefix, rtol=1e-12)
+    np.testing.assert_array_equal(rolling.next_valid, full.next_valid)
+    for start, end in [(None, None), (30, 120), (85, 95), (140, 200)]:
+        start = None if start is None else matrix.index[start]
+        end = None if end is None else matrix.index[end]
+        assert_same(rolling.range(start, end), full.range(start, end))
+    for name in METRICS:
+        pd.testing.assert_frame_equal(rolling.rolling(20)[name], full.rolling(20)[name], rtol=1e-9,
+                                      check_freq=False)
+
+
+def test_regimes_hold_until_ratio_crosses_one():
+    matrix = prices().iloc[:10, :1]
+    rolling = RollingVIS(matrix)
+    ratio = [np.nan, 1.0, 1.6, 1.2, 0.9, 0.7, 0.9, 1.1, 1.4, 1.6]
+    long = pd.DataFrame(1.0, index=rolling.dates, columns=rolling.symbols)
+    # The volatilities regimes() reads, short / long gives `ratio`
+    rolling._cache[2] = {'volatility': long * np.array(ratio)[:, None]}
+    rolling._cache[4] = {'volatility': long}
+    codes = rolling.regimes(2, 4)
+    assert codes.iloc[:, 0].tolist() == [0, 0, 1, 1, 0, -1, -1, 0, 0, 1]
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from synthetic_data import synthetic_frames
+from streaming_indicators import StreamingIndicators, RollingWindow, compare_with_batch
+
+PRICES = ['Open', 'High', 'Low', 'Close']
+
+
+def frames():
+    return list(synthetic_frames(4, 300, seed=3).values())
+
+
+@pytest.mark.parametrize('symbol', range(4))
+def test_synthetic_frames_match_batch(symbol):
+    differences = compare_with_batch(frames()[symbol])
+    assert differences.max() < 1e-9, differences[differences >= 1e-9].to_dict()
+
+
+def test_flat_prices_match_batch():
+    stock_data = frames()[0]
+    stock_data[PRICES] = 100.0
+    differences = compare_with_batch(stock_data)
+    assert differences.max() < 1e-9, differences[differences >= 1e-9].to_dict()
+
+
+def test_zero_range_bars_match_batch():
+    # Flat, zero range bars first (ATR stays 0), then single zero range bars scattered around
+    stock_data = frames()[1]
+    stock_data.iloc[:30, stock_data.columns.get_indexer(PRICES)] = stock_data['Close'].iloc[30]
+    for row in range(60, 300, 17):
+        stock_data.iloc[row, stock_data.columns.get_indexer(['Open', 'High', 'Low'])] = stock_data['Close'].iloc[row]
+    differences = compare_with_batch(stock_data)
+    assert differences.max() < 1e-9, differences[differences >= 1e-9].to_dict()
+
+
+def test_rolling_std_of_a_flat_window_is_zero():
+    window = RollingWindow(20)
+    for value in np.linspace(1e6, 2e6, 100):
+        window.update(value)
+    for _ in range(20):
+        window.update(1500000.3)
+    assert window.std < 1e-9
+
+
+def test_from_history_equals_updates():
+    stock_data = frames()[2]
+    indicators = StreamingIndicators.from_history(stock_data.iloc[:-1])
+    row = indicators.update(*stock_data[['Open', 'High', 'Low', 'Close', 'Volume']].iloc[-1])
+    assert row == StreamingIndicators.from_history(stock_data).row
@@ -0,0 +1,92 @@
+import os
+import json
+
+from threshold_config import ThresholdConfig, ThresholdMonitor, ConfigDiff, Level
+
+
+def write(path, thresholds, mtime_ns=None):
+    path.write_text(json.dumps(thresholds))
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_reload_reports_added_removed_and_changed(tmp_path):
+    path = tmp_path / 'thresholds.json'
+    write(path, {'AAA.NS': 100, 'BBB.NS': 200, 'CCC.NS': {'upper': 310, 'lower': 290}}, mtime_ns=1_000_000_000)
+    config = ThresholdConfig(str(path))
+    assert config.poll() == ConfigDiff({'AAA.NS', 'BBB.NS', 'CCC.NS'}, set(), set())
+
+    write(path, {'AAA.NS': 100, 'CCC.NS': {'upper': 320, 'lower': 290}, 'DDD.NS': {'price': 50, 'direction': 'up'}},
+          mtime_ns=2_000_000_000)
+    assert config.poll() == ConfigDiff({'DDD.NS'}, {'BBB.NS'}, {'CCC.NS'})
+    assert config.rules['CCC.NS'].levels == (Level(320.0, 'up'), Level(290.0, 'down'))
+    assert config.poll() is None
+
+
+def test_unchanged_signature_is_not_parsed(tmp_path):
+    path = tmp_path / 'thresholds.json'
+    write(path, {'AAA.NS': 100}, mtime_ns=1_000_000_000)
+    config = ThresholdConfig(str(path))
+    reads = []
+    read = config._read
+    config._read = lambda: reads.append(1) or read()
+    assert config.poll()
+
+    # Same size and mtime: not read again, even though the content differs
+    write(path, {'AAA.NS': 900}, mtime_ns=1_000_000_000)
+    assert config.poll() is None
+    assert len(reads) == 1 and config.rules['AAA.NS'].levels == (Level(100.0, 'both'),)
+
+    write(path, {'AAA.NS': 900}, mtime_ns=3_000_000_000)
+    assert config.poll() == ConfigDiff(set(), set(), {'AAA.NS'})
+    assert len(reads) == 2
+
+
+def test_invalid_file_keeps_last_good_rules(tmp_path):
+    path = tmp_path / 'thresholds.json'
+    write(path, {'AAA.NS': 100}, mtime_ns=1_000_000_000)
+    config = ThresholdConfig(str(path))
+    config.poll()
+    path.write_text('{"AAA.NS": ')
+    assert config.poll() is None
+    assert config.rules['AAA.NS'].levels == (Level(100.0, 'both'),)
+
+
+def test_crossing_alerts_once_within_cooldown(tmp_path):
+    path = tmp_path / 'thresholds.json'
+    write(path, {'AAA.NS': {'price': 100, 'cooldown': 60}})
+    config = ThresholdConfig(str(path))
+    now = [0.0]
+    monitor = ThresholdMonitor(clock=lambda: now[0])
+    diff = config.poll()
+    monitor.apply(config.rules, diff)
+
+    assert monitor.check('AAA.NS', 98) == []        # first price, nothing to compare with
+    assert monitor.check('AAA.NS', 99) == []
+    assert monitor.check('AAA.NS', 101) == ["Alert: AAA.NS has crossed above the threshold price of 100"]
+    assert monitor.check('AAA.NS', 102) == []       # still above, no new crossing
+    now[0] = 30
+    assert monitor.check('AAA.NS', 99) == []        # crossed back within the cooldown
+    assert monitor.check('AAA.NS', 101) == []
+    now[0] = 61
+    assert monitor.check('AAA.NS', 99) == ["Alert: AAA.NS has crossed below the threshold price of 100"]
+
+
+def test_changed_ticker_loses_its_cooldown(tmp_path):
+    path = tmp_path / 'thresholds.json'
+    write(path, {'AAA.NS': {'price': 100, 'cooldown': 60}, 'BBB.NS': {'price': 10, 'cooldown': 60}},
+          mtime_ns=1_000_000_000)
+    config = ThresholdConfig(str(path))
+    monitor = ThresholdMonitor(clock=lambda: 0.0)
+    diff = config.poll()
+    monitor.apply(config.rules, diff)
+    for ticker, low, high in (('AAA.NS', 99, 101), ('BBB.NS', 9, 11)):
+        monitor.check(ticker, low)
+        assert monitor.check(ticker, high)
+
+    write(path, {'AAA.NS': {'price': 100, 'cooldown': 61}, 'BBB.NS': {'price': 10, 'cooldown': 60}},
+          mtime_ns=2_000_000_000)
+    diff = config.poll()
+    monitor.apply(config.rules, diff)
+    assert monitor.check('AAA.NS', 99)              # changed, cooldown state dropped
+    assert monitor.check('BBB.NS', 9) == []         # unchanged, still cooling down
@@ -0,0 +1,32 @@
+import pandas as pd
+
+from ohlcv_store import get_engine
+from universe import load_universe, members_on, UniverseRegistry
+
+
+def write_list(directory, symbols):
+    pd.DataFrame({'Company Name': [f"{symbol} Ltd." for symbol in symbols], 'Industry': 'Banks',
+                  'Symbol': symbols, 'Series': 'EQ', 'ISIN Code': [f"INE{symbol}" for symbol in symbols]}
+                 ).to_csv(directory / 'NSE_test_list.csv', index=False)
+
+
+def test_load_universe_records_membership(tmp_path):
+    engine = get_engine(f"sqlite:///{tmp_path / 'store.db'}")
+    write_list(tmp_path, ['AAA', 'BBB'])
+    universe = load_universe(['NSE_test_list'], directory=str(tmp_path), engine=engine)
+    assert universe['Symbol'].tolist() == ['AAA', 'BBB']
+    assert members_on('NSE_test_list', engine=engine) == ['AAA', 'BBB']
+
+    # BBB leaves the list and CCC joins it on a later day
+    write_list(tmp_path, ['AAA', 'CCC'])
+    registry = UniverseRegistry.load(['NSE_test_list'], directory=str(tmp_path))
+    assert registry.record_membership(day='2099-01-02', engine=engine) == {'NSE_test_list': (['CCC'], ['BBB'])}
+    assert members_on('NSE_test_list', day='2099-01-01', engine=engine) == ['AAA', 'BBB']
+    assert members_on('NSE_test_list', day='2099-01-02', engine=engine) == ['AAA', 'CCC']
+
+
+def test_load_universe_without_recording(tmp_path):
+    engine = get_engine(f"sqlite:///{tmp_path / 'store.db'}")
+    write_list(tmp_path, ['AAA'])
+    load_universe(['NSE_test_list'], directory=str(tmp_path), record=False, engine=engine)
+    assert members_on('NSE_test_list', engine=engine) == []
@@ -0,0 +1,173 @@
+"""
+Threshold config for the price watcher
+
+ThresholdConfig keeps stock_price_thresholds.json in memory and only parses it
+again when its mtime (or size) changes. Every reload is diffed into added, removed
+and changed tickers so the watcher keeps the schedules and alert state of the
+tickers that did not change.
+
+Each entry is either a plain number (alert when the price crosses it in either
+direction) or a band, optionally with indicator rules (see alert_rules.py):
+
+    {
+        "RVNL.NS": 613,
+        "TITAGARH.NS": {"upper": 1700, "lower": 1600},
+        "TATAPOWER.NS": {"price": 446, "direction": "up", "cooldown": 600},
+        "JWL.NS": {"rules": ["RSI crosses 30", "Volume_Spike and MACD crossover"]}
+    }
+
+ThresholdMonitor remembers the last price per ticker and alerts only when the
+price crosses a level (instead of on every cycle the price sits within 3 of it),
+then stays quiet for that level until the cooldown has passed.
+"""
+
+import os
+import json
+import time
+from typing import NamedTuple
+
+DEFAULT_COOLDOWN = 900  # seconds
+
+
+class Level(NamedTuple):
+    price: float
+    direction: str  # "up", "down" or "both"
+
+
+class ThresholdRule(NamedTuple):
+    levels: tuple
+    cooldown: float
+    rules: tuple = ()  # alert_rules texts, checked against the live indicators
+
+    @classmethod
+    def parse(cls, ticker: str, value, default_cooldown: float = DEFAULT_COOLDOWN) -> 'ThresholdRule':
+        if isinstance(value, (int, float)):
+            return cls((Level(float(value), 'both'),), default_cooldown)
+        if not isinstance(value, dict):
+            raise ValueError(f"Invalid threshold for {ticker}: {value!r}")
+
+        levels = []
+        if 'upper' in value:
+            levels.append(Level(float(value['upper']), 'up'))
+        if 'lower' in value:
+            levels.append(Level(float(value['lower']), 'down'))
+        if 'price' in value:
+            direction = value.get('direction', 'both')
+            if direction not in ('up', 'down', 'both'):
+                raise ValueError(f"Invalid direction for {ticker}: {direction!r}")
+            levels.append(Level(float(value['price']), direction))
+        rules = value.get('rules', ())
+        if isinstance(rules, str):
+            rules = [rules]
+        if not isinstance(rules, (list, tuple)) or not all(isinstance(rule, str) for rule in rules):
+            raise ValueError(f"Invalid rules for {ticker}: {rules!r}")
+        if rules:
+            from alert_rules import parse
+            for rule in rules:
+                parse(rule)  # raises ValueError pointing at the bad rule
+        if not levels and not rules:
+            raise ValueError(f"Threshold for {ticker} needs 'price', 'upper', 'lower' or 'rules'")
+        return cls(tuple(levels), float(value.get('cooldown', default_cooldown)), tuple(rules))
+
+
+class ConfigDiff(NamedTuple):
+    added: set
+    removed: set
+    changed: set
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.changed)
+
+
+def diff_rules(old: dict, new: dict) -> ConfigDiff:
+    return ConfigDiff(
+        added=set(new) - set(old),
+        removed=set(old) - set(new),
+        changed={ticker for ticker in set(old) & set(new) if old[ticker] != new[ticker]},
+    )
+
+
+class ThresholdConfig:
+    def __init__(self, path: str, default_cooldown: float = DEFAULT_COOLDOWN):
+        self.path = path
+        self.default_cooldown = default_cooldown
+        self.rules = {}
+        self._signature = None
+
+    def _read(self) -> dict:
+        with open(self.path, 'r') as file:
+            raw = json.load(file)
+        return {ticker: ThresholdRule.parse(ticker, value, self.default_cooldown) for ticker, value in raw.items()}
+
+    def poll(self):
+        """Reload if the file changed on disk. Returns a ConfigDiff, or None when nothing changed."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if signature == self._signature:
+            return None
+
+        try:
+            rules = self._read()
+        except (ValueError, OSError) as error:
+            # Keep the last good config while the file is half written or invalid
+            print(f"Ignoring invalid {self.path}: {error}")
+            return None
+        self._signature = signature
+
+        diff = diff_rules(self.rules, rules)
+        self.rules = rules
+        return diff if diff else None
+
+
+class TickerAlertState:
+    __slots__ = ('last_price', 'last_alert')
+
+    def __init__(self):
+        self.last_price = None
+        self.last_alert = {}  # Level -> time of the last alert
+
+
+class ThresholdMonitor:
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.rules = {}
+        self.states = {}
+
+    def apply(self, rules: dict, diff: ConfigDiff) -> None:
+        """Take over new rules; only removed or changed tickers lose their state."""
+        self.rules = rules
+        for ticker in diff.removed:
+            self.states.pop(ticker, None)
+        for ticker in diff.changed:
+            state = self.states.get(ticker)
+            if state is not None:
+                state.last_alert.clear()
+
+    def check(self, ticker: str, price: float) -> list:
+        """Alert messages for the levels this price crossed since the last check."""
+        rule = self.rules.get(ticker)
+        if rule is None:
+            return []
+        state = self.states.setdefault(ticker, TickerAlertState())
+        last_price, state.last_price = state.last_price, price
+        if last_price is None:
+            return []
+
+        now = self.clock()
+        alerts = []
+        for level in rule.levels:
+            if last_price < level.price <= price and level.direction in ('up', 'both'):
+                crossed = 'above'
+            elif last_price > level.price >= price and level.direction in ('down', 'both'):
+                crossed = 'below'
+            else:
+                continue
+            last_alert = state.last_alert.get(level)
+            if last_alert is not None and now - last_alert < rule.cooldown:
+                continue
+            state.last_alert[level] = now
+            alerts.append(f"Alert: {ticker} has crossed {crossed} the threshold price of {level.price:g}")
+        return alerts
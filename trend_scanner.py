@@ -0,0 +1,144 @@
+"""
+Universe trend scanner
+
+Runs the stock_trend.py pipeline (calculate_indicators, determine_trend,
+identify_breakout, find_price_patterns) for every symbol of one or more
+constituent CSV files and ranks the results in one table.
+
+Downloading stays in the main process as one batched panel load through the
+OHLCV store, the indicator and pattern work is spread over a process pool sized
+to the machine's cores. With plot=True (--plot) a chart of every detected
+pattern is queued to chart_renderer's pool while the ranking is put together.
+
+    python trend_scanner.py NSE_large_midcap_250 NSE_small_cap_list --period 1y
+"""
+
+import os
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+import instrumentation
+from instrumentation import stage
+from data_provider import load_period_panel, split_panel, field_matrix
+from intraday_pipeline import ingest, get_bars
+from ohlcv_store import period_range
+from universe import load_universe, to_yahoo
+from pattern_engine import scan_patterns, latest_patterns
+from stock_trend import calculate_indicators, determine_trend, identify_breakout, find_price_patterns, find_extrema
+
+RESULT_COLUMNS = ['Symbol', 'Company Name', 'Overall Trend', 'Uptrend Indicators', 'Downtrend Indicators',
+                  'Breakout Signals', 'Pattern', 'Chart Pattern', 'Pattern Start', 'Pattern Quality', 'Close', 'Error']
+
+
+# Function to run the full trend/breakout/pattern pipeline for one symbol (runs in a worker process)
+def analyze_symbol(item) -> dict:
+    symbol, stock_data = item
+    try:
+        with stage('scan.symbol', symbol):
+            stock_data = calculate_indicators(stock_data.copy())
+            overall_trend, uptrend_count, downtrend_count = determine_trend(stock_data, verbose=False)
+            breakout_signals = identify_breakout(stock_data, verbose=False)
+            patterns = find_price_patterns(stock_data, symbol, plot=False, verbose=False)
+        row = {
+            'Symbol': symbol,
+            'Overall Trend': overall_trend,
+            'Uptrend Indicators': uptrend_count,
+            'Downtrend Indicators': downtrend_count,
+            'Breakout Signals': ', '.join(breakout_signals),
+            'Pattern': ', '.join(patterns),
+            'Close': stock_data['Close'].iat[-1],
+        }
+    except Exception as error:
+        # Too little history or bad data for one symbol must not stop the scan
+        row = {'Symbol': symbol, 'Error': f"{type(error).__name__}: {error}"}
+
+    if instrumentation.is_enabled():
+        # Timings of this worker process go back to the main process with the row
+        row['_metrics'] = instrumentation.drain()
+    return row
+
+
+def rank_results(results: pd.DataFrame) -> pd.DataFrame:
+    results = results.reindex(columns=RESULT_COLUMNS)
+    score = results['Uptrend Indicators'].fillna(0) - results['Downtrend Indicators'].fillna(0)
+    breakouts = results['Breakout Signals'].fillna('').map(lambda signals: len(signals.split(', ')) if signals else 0)
+    order = pd.DataFrame({'score': score, 'breakouts': breakouts}).sort_values(
+        ['score', 'breakouts'], ascending=False, kind='stable').index
+    return results.loc[order].reset_index(drop=True)
+
+
+def scan(csv_files, period: str = '1y', interval: str = '1d', max_workers: int = None, provider=None,
+         from_1m: bool = False, plot: bool = False) -> pd.DataFrame:
+    universe = load_universe(csv_files)
+    symbols = to_yahoo(universe['Symbol'])  # each symbol once, even when listed in several files
+
+    # I/O: one batched load of the whole universe through the OHLCV store
+    if from_1m:
+        # Bars of `interval` derived from stored 1m bars, only missing minutes are downloaded
+        start, end = period_range(period)
+        ingest(symbols.tolist(), start, end, provider=provider)
+        panel = get_bars(symbols.tolist(), interval, start, end)
+    else:
+        panel = load_period_panel(symbols.tolist(), period, interval=interval, provider=provider)
+    stocks = split_panel(panel)
+
+    # CPU: indicators, trend votes and patterns in worker processes
+    max_workers = max_workers or os.cpu_count() or 1
+    chunksize = max(1, len(stocks) // (max_workers * 4))
+    # Workers start with empty metrics (fork would copy the main process's ones)
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=instrumentation.drain) as executor:
+        rows = list(executor.map(analyze_symbol, stocks.items(), chunksize=chunksize))
+    for row in rows:
+        instrumentation.merge(row.pop('_metrics', None))
+
+    renderer = None
+    if plot:
+        from chart_renderer import ChartRenderer
+        # Charts render in their own pool, unchanged ones are skipped
+        renderer = ChartRenderer(max_workers=max_workers)
+    # The pool renders while the pattern scan below runs, closed even when that raises
+    try:
+        if renderer is not None:
+            for row in rows:
+                if row.get('Pattern'):
+                    stock_data = find_extrema(stocks[row['Symbol']].copy())
+                    for pattern in row['Pattern'].split(', '):
+                        renderer.submit(stock_data, row['Symbol'], pattern)
+
+        results = pd.DataFrame(rows, columns=RESULT_COLUMNS)
+        results['Company Name'] = results['Symbol'].map(dict(zip(symbols, universe.get('Company Name', symbols))))
+
+        # Chart patterns in progress for the whole universe from one vectorized pass
+        close = field_matrix(panel, 'Close')
+        if not close.empty:
+            latest = latest_patterns(scan_patterns(close), close.index[-1]).set_index('Symbol')
+            results['Chart Pattern'] = results['Symbol'].map(latest['Pattern'])
+            results['Pattern Start'] = results['Symbol'].map(latest['Start'])
+            results['Pattern Quality'] = results['Symbol'].map(latest['Quality'])
+    finally:
+        if renderer is not None:
+            with stage('report.plot'):
+                renderer.close()
+    return rank_results(results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rank a CSV universe by trend, breakout signals and patterns")
+    parser.add_argument('csv_files', nargs='*', default=["NSE_large_midcap_250"])
+    parser.add_argument('--period', default="1y")
+    parser.add_argument('--interval', default="1d")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--from-1m', action='store_true', help='derive the interval from stored 1m bars')
+    parser.add_argument('--plot', action='store_true', help='save a chart for every pattern found')
+    args = parser.parse_args()
+
+    results = scan(args.csv_files, period=args.period, interval=args.interval, max_workers=args.workers,
+                   from_1m=args.from_1m, plot=args.plot)
+    print(results.to_string(index=False))
+
+    data_directory = "./stock_data/"
+    os.makedirs(data_directory, exist_ok=True)
+    with stage('report.html'):
+        results.to_html(f"{data_directory}{'-'.join(args.csv_files)}trend_scan.html", index=False)
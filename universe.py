@@ -0,0 +1,321 @@
+"""
+Universe registry
+
+The constituent lists (NSE_large_midcap_250.csv, NSE_mid_cap_list.csv,
+NSE_small_cap_list.csv, columns Company Name, Industry, Symbol, Series, ISIN
+Code) are read once into one SymbolTable. Every symbol gets an integer ID, the
+same ID in every list, so a symbol listed twice is downloaded and scored once,
+and the engines can index NumPy arrays by ID instead of looking up strings:
+
+    registry = UniverseRegistry.load()                    # every NSE_*.csv next to the scripts
+    large = registry['NSE_large_midcap_250']
+    both = large | registry['NSE_small_cap_list']         # union, & intersection, - difference
+    both.tickers()                                        # ['3MINDIA.NS', ...] for yfinance
+    registry.table.industry_codes[both.ids]               # int16 industry per symbol
+
+IDs are assigned in load order and stay stable while the registry lives.
+Yahoo's `.NS` suffix is added and removed in one place, to_yahoo() / from_yahoo().
+
+record_membership() stores the lists in stock_data.db (table
+universe_membership, one row per list, symbol and [added, removed) day range),
+so index changes between two loads are kept and members_on() returns a list
+as it was on any day. load_universe() records the lists it reads every time.
+"""
+
+import os
+import sys
+import glob
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+SUFFIX = '.NS'  # Yahoo suffix of NSE listings
+DEFAULT_PATTERN = 'NSE_*.csv'
+UNKNOWN_INDUSTRY = 'Unknown'
+
+
+def to_yahoo(symbols):
+    """NSE symbol(s) as Yahoo tickers: 'SBIN' -> 'SBIN.NS' (already suffixed symbols are kept)."""
+    if isinstance(symbols, str):
+        return symbols if symbols.endswith(SUFFIX) else symbols + SUFFIX
+    if isinstance(symbols, pd.Series):
+        return symbols.where(symbols.str.endswith(SUFFIX), symbols + SUFFIX)
+    return [to_yahoo(symbol) for symbol in symbols]
+
+
+def from_yahoo(symbols):
+    """Yahoo ticker(s) back to NSE symbols: 'SBIN.NS' -> 'SBIN'."""
+    if isinstance(symbols, str):
+        return symbols.removesuffix(SUFFIX)
+    if isinstance(symbols, pd.Series):
+        return symbols.str.removesuffix(SUFFIX)
+    return [symbol.removesuffix(SUFFIX) for symbol in symbols]
+
+
+class SymbolTable:
+    """Interned symbols with dense integer IDs and per-ID columns."""
+
+    def __init__(self):
+        self.symbols = []            # ID -> NSE symbol (interned)
+        self.names = []              # ID -> company name
+        self.isins = []              # ID -> ISIN code
+        self.industries = []         # industry code -> industry name
+        self.ids = {}                # symbol -> ID
+        self.isin_ids = {}           # ISIN -> ID
+        self._industry_codes = {}    # industry name -> code
+        self._industry_of = []       # ID -> industry code
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    def __contains__(self, symbol: str) -> bool:
+        return from_yahoo(symbol) in self.ids
+
+    def add(self, symbol: str, name: str = None, industry: str = None, isin: str = None) -> int:
+        """ID of `symbol`, assigned on first sight. Later sightings fill in missing details."""
+        symbol = sys.intern(from_yahoo(str(symbol).strip()))
+        symbol_id = self.ids.get(symbol)
+        if symbol_id is None:
+            symbol_id = self.ids[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+            self.names.append(None)
+            self.isins.append(None)
+            self._industry_of.append(self._industry_code(UNKNOWN_INDUSTRY))
+        if name and not self.names[symbol_id]:
+            self.names[symbol_id] = name
+        if industry and self.industries[self._industry_of[symbol_id]] == UNKNOWN_INDUSTRY:
+            self._industry_of[symbol_id] = self._industry_code(industry)
+        if isin and not self.isins[symbol_id]:
+            self.isins[symbol_id] = isin
+            self.isin_ids[isin] = symbol_id
+        return symbol_id
+
+    def _industry_code(self, industry: str) -> int:
+        industry = sys.intern(industry)
+        code = self._industry_codes.get(industry)
+        if code is None:
+            code = self._industry_codes[industry] = len(self.industries)
+            self.industries.append(industry)
+        return code
+
+    @property
+    def industry_codes(self) -> np.ndarray:
+        """Industry code per ID (index self.industries for the name)."""
+        return np.asarray(self._industry_of, dtype=np.int16)
+
+    def id_of(self, symbol: str) -> int:
+        """ID of an NSE symbol or Yahoo ticker, KeyError when unknown."""
+        return self.ids[from_yahoo(symbol)]
+
+    def ids_of(self, symbols, missing: int = None) -> np.ndarray:
+        """IDs of many symbols; unknown ones raise KeyError, or get `missing` when given."""
+        if missing is None:
+            return np.fromiter((self.ids[from_yahoo(symbol)] for symbol in symbols), dtype=np.int32)
+        return np.fromiter((self.ids.get(from_yahoo(symbol), missing) for symbol in symbols), dtype=np.int32)
+
+    def frame(self, ids=None) -> pd.DataFrame:
+        """Symbol, Company Name, Industry, ISIN Code per ID (all IDs by default), indexed by ID."""
+        ids = np.arange(len(self)) if ids is None else np.asarray(ids)
+        codes = self.industry_codes
+        return pd.DataFrame({
+            'Symbol': [self.symbols[i] for i in ids],
+            'Company Name': [self.names[i] for i in ids],
+            'Industry': [self.industries[codes[i]] for i in ids],
+            'ISIN Code': [self.isins[i] for i in ids],
+        }, index=pd.Index(ids, name='ID'))
+
+
+class Universe:
+    """One list (or a combination of lists) as a sorted array of symbol IDs."""
+
+    __slots__ = ('name', 'table', 'ids')
+
+    def __init__(self, name: str, table: SymbolTable, ids):
+        self.name = name
+        self.table = table
+        self.ids = np.unique(np.asarray(ids, dtype=np.int32))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __iter__(self):
+        return iter(self.symbols())
+
+    def __contains__(self, symbol: str) -> bool:
+        symbol_id = self.table.ids.get(from_yahoo(symbol))
+        if symbol_id is None:
+            return False
+        position = np.searchsorted(self.ids, symbol_id)
+        return position < len(self.ids) and self.ids[position] == symbol_id
+
+    def __repr__(self) -> str:
+        return f"Universe({self.name!r}, {len(self)} symbols)"
+
+    def _combine(self, other: 'Universe', function, sign: str) -> 'Universe':
+        if other.table is not self.table:
+            raise ValueError("Universes from different symbol tables can't be combined")
+        return Universe(f"{self.name} {sign} {other.name}", self.table, function(self.ids, other.ids))
+
+    def __or__(self, other: 'Universe') -> 'Universe':
+        return self._combine(other, np.union1d, '|')
+
+    def __and__(self, other: 'Universe') -> 'Universe':
+        return self._combine(other, np.intersect1d, '&')
+
+    def __sub__(self, other: 'Universe') -> 'Universe':
+        return self._combine(other, np.setdiff1d, '-')
+
+    def __xor__(self, other: 'Universe') -> 'Universe':
+        return self._combine(other, np.setxor1d, '^')
+
+    def symbols(self) -> list:
+        return [self.table.symbols[i] for i in self.ids]
+
+    def tickers(self) -> list:
+        """Yahoo tickers of the members."""
+        return to_yahoo(self.symbols())
+
+    def mask(self) -> np.ndarray:
+        """Boolean membership over all IDs of the table."""
+        mask = np.zeros(len(self.table), dtype=bool)
+        mask[self.ids] = True
+        return mask
+
+    def industry(self, industry: str) -> 'Universe':
+        """Members in one industry (the CSVs' Industry column)."""
+        code = self.table._industry_codes.get(industry)
+        ids = self.ids[self.table.industry_codes[self.ids] == code] if code is not None else []
+        return Universe(f"{self.name} [{industry}]", self.table, ids)
+
+    def frame(self) -> pd.DataFrame:
+        return self.table.frame(self.ids)
+
+
+class UniverseRegistry:
+    def __init__(self, table: SymbolTable = None):
+        self.table = table or SymbolTable()
+        self.lists = {}     # list name -> Universe
+
+    def __getitem__(self, name: str) -> Universe:
+        return self.lists[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.lists
+
+    def add_list(self, name: str, frame: pd.DataFrame) -> Universe:
+        if 'Symbol' not in frame.columns:
+            raise ValueError("CSV files must contain 'Symbol' column")
+        columns = [frame[column] if column in frame.columns else [None] * len(frame)
+                   for column in ('Symbol', 'Company Name', 'Industry', 'ISIN Code')]
+        ids = []
+        for symbol, *details in zip(*columns):
+            if isinstance(symbol, str) and symbol.strip():
+                # Blank or NaN details count as missing
+                ids.append(self.table.add(symbol, *(value if isinstance(value, str) and value else None
+                                                    for value in details)))
+        universe = self.lists[name] = Universe(name, self.table, ids)
+        return universe
+
+    def read_csv(self, path: str, name: str = None) -> Universe:
+        """Add the list in `path` (name defaults to the file name without .csv)."""
+        if name is None:
+            name = os.path.splitext(os.path.basename(path))[0]
+        return self.add_list(name, pd.read_csv(path, dtype=str, keep_default_na=False))
+
+    @classmethod
+    def load(cls, names=None, directory: str = '.') -> 'UniverseRegistry':
+        """Registry of the named lists ({name}.csv in `directory`), every NSE_*.csv by default."""
+        registry = cls()
+        if names is None:
+            paths = sorted(glob.glob(os.path.join(directory, DEFAULT_PATTERN)))
+        else:
+            paths = [os.path.join(directory, name if name.endswith('.csv') else f"{name}.csv") for name in names]
+        for path in paths:
+            registry.read_csv(path)
+        return registry
+
+    def union(self, names=None) -> Universe:
+        """Members of all the named lists (all lists by default), each symbol once."""
+        names = list(self.lists) if names is None else list(names)
+        ids = np.concatenate([self.lists[name].ids for name in names]) if names else []
+        return Universe(' | '.join(names), self.table, ids)
+
+    def lists_of(self, symbol: str) -> list:
+        """Names of the lists `symbol` belongs to."""
+        return [name for name, universe in self.lists.items() if symbol in universe]
+
+    def record_membership(self, day=None, engine=None) -> dict:
+        """
+        Store today's lists: new members get a row added `day`, members no longer
+        listed get `removed` = `day`. Returns {list: (added, removed)} symbol lists.
+        """
+        from sqlalchemy import text
+        from ohlcv_store import get_engine
+
+        engine = engine or get_engine()
+        init_membership(engine)
+        day = str(day or date.today())
+        changes = {}
+        with engine.begin() as conn:
+            for name, universe in self.lists.items():
+                current = set(universe.symbols())
+                stored = {row[0] for row in conn.execute(text(
+                    "SELECT symbol FROM universe_membership WHERE list_name = :name AND removed IS NULL"),
+                    {'name': name})}
+                added, removed = sorted(current - stored), sorted(stored - current)
+                if added:
+                    conn.execute(text(
+                        "INSERT OR REPLACE INTO universe_membership (list_name, symbol, isin, added, removed) "
+                        "VALUES (:name, :symbol, :isin, :day, NULL)"
+                    ), [{'name': name, 'symbol': symbol, 'isin': self.table.isins[self.table.ids[symbol]],
+                         'day': day} for symbol in added])
+                if removed:
+                    conn.execute(text(
+                        "UPDATE universe_membership SET removed = :day "
+                        "WHERE list_name = :name AND symbol = :symbol AND removed IS NULL"
+                    ), [{'name': name, 'symbol': symbol, 'day': day} for symbol in removed])
+                changes[name] = (added, removed)
+        return changes
+
+
+def init_membership(engine) -> None:
+    from sqlalchemy import text
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS universe_membership (
+                list_name TEXT NOT NULL,
+                symbol TEXT NOT NULL,
+                isin TEXT,
+                added TEXT NOT NULL,
+                removed TEXT,
+                PRIMARY KEY (list_name, symbol, added)
+            ) WITHOUT ROWID
+        """))
+
+
+def members_on(name: str, day=None, engine=None) -> list:
+    """Symbols of list `name` on `day` (default today) according to the recorded history."""
+    from sqlalchemy import text
+    from ohlcv_store import get_engine
+
+    engine = engine or get_engine()
+    init_membership(engine)
+    day = str(day or date.today())
+    with engine.connect() as conn:
+        rows = conn.execute(text(
+            "SELECT symbol FROM universe_membership WHERE list_name = :name AND added <= :day "
+            "AND (removed IS NULL OR removed > :day) ORDER BY symbol"
+        ), {'name': name, 'day': day}).fetchall()
+    return [row[0] for row in rows]
+
+
+def load_universe(csv_files, directory: str = '.', record: bool = True, engine=None) -> pd.DataFrame:
+    """
+    Symbol, Company Name, Industry, ISIN Code of the listed CSV files, each symbol once.
+    With `record` the lists' membership is stored as of today (see record_membership).
+    """
+    registry = UniverseRegistry.load(csv_files, directory)
+    if record:
+        registry.record_membership(engine=engine)
+    return registry.union().frame().reset_index(drop=True)
@@ -0,0 +1,106 @@
+"""
+Volatility Impact Score (VIS)
+
+VIS=(α⋅Volatility+β⋅upward_volatility+γ⋅downward_volatility) / (α + β + γ)
+
+calculate_metrics / calculate_vis / calculate_trend score one price series.
+calculate_vis_panel scores a whole wide (date x symbol) Adj Close matrix in one
+NumPy pass and returns one row per symbol, so a universe scan no longer loops over
+companies and grows a DataFrame with pd.concat on every iteration.
+"""
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import timed
+
+
+# Function to calculate various metrics
+def calculate_metrics(data):
+    daily_returns = data.pct_change().dropna()
+
+    # Proportion of Up and Down Movements
+    upward_volatility = (daily_returns > 0).std()
+    downward_volatility = (daily_returns < 0).std()
+
+    # Volatility
+    volatility = daily_returns.std()
+
+    # Trend
+    trend = daily_returns.sum()
+
+    return {
+        'upward_volatility': upward_volatility,
+        'downward_volatility': downward_volatility,
+        'volatility': volatility,
+        'trend': trend
+    }
+
+# Function to calculate Volatility Impact Score (VIS)
+def calculate_vis(metrics, alpha=2, beta=2, gamma=1):
+    volatility = metrics['volatility']
+    upward_volatility = metrics['upward_volatility']
+    downward_volatility = metrics['downward_volatility']
+    vis = (alpha * volatility + beta * upward_volatility + gamma * downward_volatility) / (alpha + beta + gamma)
+    return vis
+
+def calculate_trend(metrics):
+    if metrics['trend'] == 0:
+        return 'flat'
+    elif metrics['trend'] > 0:
+        return 'up'
+    else:
+        return 'down'
+
+
+def panel_returns(prices: pd.DataFrame) -> np.ndarray:
+    """
+    Daily returns of a date x symbol matrix. Each symbol's return is taken between
+    its own consecutive prices, so gaps from other symbols' trading days don't add
+    zero returns (same as pct_change on the single-symbol series).
+    """
+    values = prices.to_numpy(dtype=float)
+    previous = prices.ffill().to_numpy(dtype=float)
+    previous = np.vstack([np.full((1, values.shape[1]), np.nan), previous[:-1]])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return values / previous - 1
+
+
+def _indicator_std(count: np.ndarray, n: np.ndarray) -> np.ndarray:
+    # Sample std (ddof=1) of a 0/1 series with `count` ones out of `n` values
+    with np.errstate(divide='ignore', invalid='ignore'):
+        std = np.sqrt(count * (n - count) / (n * (n - 1)))
+    return np.where(n > 1, std, np.nan)
+
+
+def calculate_metrics_panel(prices: pd.DataFrame) -> pd.DataFrame:
+    returns = panel_returns(prices)
+    valid = ~np.isnan(returns)
+    n = valid.sum(axis=0)
+    filled = np.where(valid, returns, 0.0)
+
+    upward_volatility = _indicator_std((filled > 0).sum(axis=0), n)
+    downward_volatility = _indicator_std((filled < 0).sum(axis=0), n)
+
+    trend = filled.sum(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = trend / n
+        variance = (np.where(valid, returns - mean, 0.0) ** 2).sum(axis=0) / (n - 1)
+    volatility = np.where(n > 1, np.sqrt(variance), np.nan)
+
+    return pd.DataFrame({
+        'upward_volatility': upward_volatility,
+        'downward_volatility': downward_volatility,
+        'volatility': volatility,
+        'trend': trend,
+    }, index=prices.columns)
+
+
+@timed('compute.vis')
+def calculate_vis_panel(prices: pd.DataFrame, alpha=2, beta=2, gamma=1) -> pd.DataFrame:
+    """Metrics, VIS and Trend ('up'/'down'/'flat') for every column of a price matrix."""
+    metrics = calculate_metrics_panel(prices)
+    metrics['VIS'] = calculate_vis(metrics, alpha=alpha, beta=beta, gamma=gamma)
+    trend = metrics['trend'].to_numpy()
+    metrics['Trend'] = np.select([trend == 0, trend > 0], ['flat', 'up'], default='down')
+    return metrics